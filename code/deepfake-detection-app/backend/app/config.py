@@ -14,17 +14,111 @@ class Config:
     BASE_DIR = Path(__file__).parent.parent
     UPLOAD_FOLDER = BASE_DIR / os.getenv('UPLOAD_FOLDER', 'uploads')
     MODEL_PATH = BASE_DIR / os.getenv('MODEL_PATH', 'app/models/efficientnet-ariq.pth')
+    QUANTIZED_MODEL_PATH = BASE_DIR / os.getenv('QUANTIZED_MODEL_PATH', 'app/models/efficientnet-ariq.int8.pt')
+    
+    # Model Runtime (0 = default runtime thread count)
+    # MODEL_PATH: .pth (PyTorch), .keras/.h5 (Keras), .onnx (ONNX Runtime) atau .pt (TorchScript)
+    INTRA_OP_THREADS = int(os.getenv('INTRA_OP_THREADS', 0))
+    INTER_OP_THREADS = int(os.getenv('INTER_OP_THREADS', 0))
+    # fp32 = MODEL_PATH, int8 = QUANTIZED_MODEL_PATH (hasil quantize_model.py)
+    MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'fp32')
+    # Bobot .pth di-mmap: semua worker berbagi satu salinan lewat page cache
+    MODEL_MMAP = os.getenv('MODEL_MMAP', 'True') == 'True'
+    # Diset oleh gunicorn.conf.py saat preload_app: TensorFlow/ONNX Runtime
+    # (model Keras/ONNX, MTCNN) baru dibuat di tiap worker setelah fork
+    FORK_SERVING = os.getenv('FORK_SERVING', 'False') == 'True'
     
     # Face Detection
+    # Backend: mtcnn (akurat, lambat), opencv_dnn (SSD ResNet-10), haar (paling cepat)
+    FACE_DETECTOR_BACKEND = os.getenv('FACE_DETECTOR_BACKEND', 'mtcnn')
+    FACE_DNN_PROTOTXT = BASE_DIR / os.getenv('FACE_DNN_PROTOTXT', 'app/models/deploy.prototxt')
+    FACE_DNN_MODEL = BASE_DIR / os.getenv('FACE_DNN_MODEL', 'app/models/res10_300x300_ssd_iter_140000.caffemodel')
     FACE_DETECTION_CONFIDENCE = float(os.getenv('FACE_DETECTION_CONFIDENCE', 0.9))
     IMG_SIZE = (int(os.getenv('IMG_SIZE', 224)), int(os.getenv('IMG_SIZE', 224)))
+    # Sisi terpanjang frame saat deteksi (0 = resolusi asli)
+    FACE_DETECTION_SIZE = int(os.getenv('FACE_DETECTION_SIZE', 640))
     
     # Video Processing
     FRAMES_PER_VIDEO = int(os.getenv('FRAMES_PER_VIDEO', 30))
     FRAME_SKIP = int(os.getenv('FRAME_SKIP', 3))
+    DETECTION_BATCH_SIZE = int(os.getenv('DETECTION_BATCH_SIZE', 16))
+    
+    # Video Pipeline (decode -> deteksi -> klasifikasi berjalan bersamaan)
+    DETECTION_WORKERS = int(os.getenv('DETECTION_WORKERS', 2))
+    PIPELINE_QUEUE_DEPTH = int(os.getenv('PIPELINE_QUEUE_DEPTH', 4))
+    
+    # Early Exit (berhenti decode begitu verdict video sudah pasti secara statistik)
+    EARLY_EXIT = os.getenv('EARLY_EXIT', 'False') == 'True'
+    EARLY_EXIT_CONFIDENCE = float(os.getenv('EARLY_EXIT_CONFIDENCE', 0.95))
+    EARLY_EXIT_MIN_FACES = int(os.getenv('EARLY_EXIT_MIN_FACES', 16))
+    
+    # Multi-face (semua wajah per frame dinilai dan digabung per identitas;
+    # verdict video mengikuti identitas yang paling mencurigakan)
+    MULTI_FACE = os.getenv('MULTI_FACE', 'False') == 'True'
+    MAX_FACES_PER_FRAME = int(os.getenv('MAX_FACES_PER_FRAME', 5))
+    MIN_IDENTITY_FACES = int(os.getenv('MIN_IDENTITY_FACES', 3))
+    
+    # Temporal Head (hasil train_temporal_head.py; kosong = rata-rata skor per wajah)
+    # Verdict video dari urutan embedding wajah; butuh model .pth atau Keras
+    TEMPORAL_HEAD_PATH = BASE_DIR / os.getenv('TEMPORAL_HEAD_PATH') if os.getenv('TEMPORAL_HEAD_PATH') else None
+    
+    # Face Tracking (deteksi penuh hanya di keyframe, tracking optical flow di antaranya)
+    FACE_TRACKING = os.getenv('FACE_TRACKING', 'False') == 'True'
+    TRACKING_REDETECT_INTERVAL = int(os.getenv('TRACKING_REDETECT_INTERVAL', 10))
+    TRACKING_MIN_CONFIDENCE = float(os.getenv('TRACKING_MIN_CONFIDENCE', 0.5))
+    # Optical flow hanya antar frame sampel yang berjarak paling banyak sekian frame
+    TRACKING_MAX_FRAME_GAP = int(os.getenv('TRACKING_MAX_FRAME_GAP', 5))
+    
+    # Streaming Upload (POST /api/analyze/stream, butuh ffmpeg)
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 65536))
+    
+    # Inference Batching
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 32))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+    
+    # Test-time Augmentation (mode default; tiap request bisa memilih lewat field `tta`)
+    # off, on (semua wajah) atau borderline (hanya skor dekat 0.5)
+    TTA_MODE = os.getenv('TTA_MODE', 'off')
+    TTA_VIEWS = [view for view in os.getenv('TTA_VIEWS', 'flip,zoom,flip_zoom').split(',') if view]
+    TTA_ZOOM = float(os.getenv('TTA_ZOOM', 0.9))
+    TTA_BORDERLINE_MARGIN = float(os.getenv('TTA_BORDERLINE_MARGIN', 0.15))
+    
+    # Crop Store (crop wajah per video di disk, dipakai ulang oleh server dan training)
+    CROP_STORE_DIR = BASE_DIR / os.getenv('CROP_STORE_DIR') if os.getenv('CROP_STORE_DIR') else None
+    # Batas crop yang ditulis server (0 = tanpa batas); TTL dihitung sejak terakhir dipakai
+    CROP_STORE_MAX_MB = int(os.getenv('CROP_STORE_MAX_MB', 1024))
+    CROP_STORE_TTL = int(os.getenv('CROP_STORE_TTL', 604800))
+    
+    # Metrics (GET /metrics); RESPONSE_TIMINGS menambah waktu per stage (ms) di details
+    RESPONSE_TIMINGS = os.getenv('RESPONSE_TIMINGS', 'False') == 'True'
+    # Folder bersama agar /metrics menjumlah semua worker gunicorn (kosong = hanya proses ini)
+    METRICS_DIR = BASE_DIR / os.getenv('METRICS_DIR') if os.getenv('METRICS_DIR') else None
+    
+    # Result Cache (kosongkan RESULT_CACHE_DIR untuk cache memori saja)
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True') == 'True'
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 512))
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 3600))
+    RESULT_CACHE_DIR = BASE_DIR / os.getenv('RESULT_CACHE_DIR') if os.getenv('RESULT_CACHE_DIR') else None
+    RESULT_CACHE_DISK_MAX_MB = int(os.getenv('RESULT_CACHE_DISK_MAX_MB', 256))
+    RESULT_CACHE_DISK_TTL = int(os.getenv('RESULT_CACHE_DISK_TTL', 86400))
+    
+    # Async Jobs (POST /api/jobs); status job disimpan di JOB_STATE_DIR agar
+    # bisa dibaca oleh semua worker gunicorn
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 16))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 3600))
+    JOB_STATE_DIR = UPLOAD_FOLDER / os.getenv('JOB_STATE_DIR', 'jobs')
+    
+    # Batch Analysis (POST /api/analyze/batch)
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 256))
+    BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 32))
+    BATCH_DECODE_WORKERS = int(os.getenv('BATCH_DECODE_WORKERS', 4))
     
     # File Upload
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 52428800))  # 50MB
+    # Video sampai ukuran ini disimpan di memori (memfd) bukan di UPLOAD_FOLDER
+    VIDEO_MEMORY_SPOOL_THRESHOLD = int(os.getenv('VIDEO_MEMORY_SPOOL_THRESHOLD', 16777216))  # 16MB
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'jpg,jpeg,png,mp4,avi,mov').split(','))
     
     # Ensure upload folder exists
@@ -1,16 +1,13 @@
 from flask import Flask
 from flask_cors import CORS
-from tensorflow.keras.models import load_model
-import torch
-from torchvision import models
 import os
 
 from app.config import Config
 from app.routes.detection import detection_bp, init_detection_routes
-from app.services.face_detector import FaceDetector
-from app.services.image_processor import ImageProcessor
-from app.services.video_processor import VideoProcessor
-from app.utils.file_handler import FileHandler
+from app.routes.metrics import metrics_bp
+from app.services.factory import build_services
+from app.services.job_manager import JobManager
+from app.utils.metrics import share_metrics
 
 def create_app():
     """Application factory"""
@@ -20,50 +17,27 @@ def create_app():
     # Enable CORS
     CORS(app)
     
-    # Load ML model
-    model = None
-    print(f"Loading model from: {Config.MODEL_PATH}")
-    try:
-        is_pytorch = Config.MODEL_PATH.suffix.lower() == '.pth'
-        if is_pytorch:
-            model = torch.load(str(Config.MODEL_PATH), weights_only=False, map_location=torch.device('cpu'))
-            print(f"✅ Model loaded successfully")
-        else:
-            model = load_model(str(Config.MODEL_PATH))
-            print(f"✅ Model loaded successfully")
-            print(f"   Input shape: {model.input_shape}")
-            print(f"   Output shape: {model.output_shape}")
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        print(f"⚠️ Running without model (will return dummy predictions)")
-        model = None
+    # Metrics dijumlah dari semua worker yang memakai folder yang sama
+    share_metrics(Config.METRICS_DIR)
     
-    # Initialize services
-    face_detector = FaceDetector(
-        confidence_threshold=Config.FACE_DETECTION_CONFIDENCE
-    )
-    
-    file_handler = FileHandler(
-        upload_folder=Config.UPLOAD_FOLDER,
-        allowed_extensions=Config.ALLOWED_EXTENSIONS
-    )
-    
-    image_processor = ImageProcessor(
-        face_detector=face_detector,
-        model=model
-    )
+    # Model, detector dan processor (sama dengan bulk scan dan benchmark)
+    services = build_services(Config, fork_safe=Config.FORK_SERVING)
     
-    video_processor = VideoProcessor(
-        face_detector=face_detector,
-        model=model,
-        frame_skip=Config.FRAME_SKIP
+    # Worker pool untuk analisis asinkron (POST /api/jobs)
+    job_manager = JobManager(
+        max_workers=Config.JOB_WORKERS,
+        max_queue=Config.JOB_QUEUE_SIZE,
+        result_ttl=Config.JOB_RESULT_TTL,
+        state_dir=Config.JOB_STATE_DIR
     )
     
     # Initialize routes with dependencies
-    init_detection_routes(file_handler, image_processor, video_processor)
+    init_detection_routes(services.file_handler, services.image_processor, services.video_processor,
+                          services.inference_scheduler, services.result_cache, job_manager)
     
     # Register blueprints
     app.register_blueprint(detection_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
     
     return app
 
@@ -1,19 +1,138 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import tempfile
+import zipfile
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
 from werkzeug.utils import secure_filename
 
+from app.config import Config
+from app.utils.content_hash import content_hash, new_content_hasher
+from app.utils.metrics import current_timer, request_timer, stage
+from app.utils.stream_decoder import FFmpegFrameStream, UploadTooLarge
+from app.utils.tta import TTA_MODES
+
 detection_bp = Blueprint('detection', __name__)
 
 # These will be injected by main.py
 file_handler = None
 image_processor = None
 video_processor = None
+inference_scheduler = None
+result_cache = None
+job_manager = None
 
-def init_detection_routes(fh, ip, vp):
+def init_detection_routes(fh, ip, vp, scheduler, cache=None, jobs=None):
     """Initialize route dependencies"""
-    global file_handler, image_processor, video_processor
+    global file_handler, image_processor, video_processor, inference_scheduler, result_cache, job_manager
     file_handler = fh
     image_processor = ip
     video_processor = vp
+    inference_scheduler = scheduler
+    result_cache = cache
+    job_manager = jobs
+
+def _get_upload():
+    """Return (file, None) for a valid upload or (None, error response)"""
+    # Check if file is present
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No file provided'}), 400)
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return None, (jsonify({'error': 'No file selected'}), 400)
+    
+    if not file_handler.allowed_file(file.filename):
+        return None, (jsonify({'error': 'File type not allowed'}), 400)
+    
+    return file, None
+
+def _get_tta():
+    """Return (tta mode, None) from the `tta` form/query field or (None, error response)"""
+    tta = request.values.get('tta') or Config.TTA_MODE
+    if tta not in TTA_MODES:
+        return None, (jsonify({'error': f"Invalid tta mode, choose from: {', '.join(TTA_MODES)}"}), 400)
+    # Tanpa TTA di scheduler semua mode berarti 'off' (juga untuk key cache)
+    return (tta if inference_scheduler.tta is not None else 'off'), None
+
+def _cache_kind(kind, tta):
+    """Cache key kind; TTA results are cached separately"""
+    return kind if tta == 'off' else f"{kind}:tta-{tta}"
+
+def _needs_content_hash(is_video):
+    """Uploads are hashed when the result cache or (for videos) the crop store needs a key"""
+    return result_cache is not None or (is_video and video_processor.crop_store is not None)
+
+def _cache_lookup(file, tta='off'):
+    """
+    Return (cache_key, cached_response, content_hash)
+    
+    The upload is hashed once; the crop store reuses the hash for videos.
+    All three are None when neither cache is enabled, the first two when only
+    the crop store is.
+    """
+    is_video = file_handler.is_video(file.filename)
+    if not _needs_content_hash(is_video):
+        return None, None, None
+    with stage('cache_lookup'):
+        digest = content_hash(file.stream)
+        if result_cache is None:
+            return None, None, digest
+        cache_key = result_cache.key_for_hash(digest, _cache_kind('video' if is_video else 'image', tta))
+        return cache_key, result_cache.get(cache_key), digest
+
+def _with_timings(response):
+    """Add the stage timings of the current request to `details` when RESPONSE_TIMINGS is on"""
+    timer = current_timer()
+    # Config dipakai langsung karena job berjalan di luar app context
+    if timer is None or not Config.RESPONSE_TIMINGS:
+        return response
+    return {**response, 'details': {**(response.get('details') or {}), 'timings': timer.as_dict()}}
+
+def _load_upload(file):
+    """
+    Bring an upload into a form the processors can read
+    
+    Images are decoded in memory; videos are spooled to a unique (memory-backed
+    when small) file. Returns (kind, payload), payload is None on failure.
+    """
+    if file_handler.is_video(file.filename):
+        return 'video', file_handler.spool_file(file)
+    return 'image', file_handler.read_image(file)
+
+def _analyze_upload(kind, payload, cache_key=None, progress=None, tta=None, digest=None):
+    """
+    Run image/video analysis on a loaded upload and release it afterwards
+    
+    `digest` is the content hash of the upload from _cache_lookup, if any.
+    
+    Returns:
+        (response dict, None) on success or (None, error message)
+    """
+    try:
+        # Determine file type and process
+        if kind == 'video':
+            result = video_processor.predict_video(payload, progress=progress, tta=tta, content_hash=digest)
+        else:
+            result = image_processor.predict_image_array(payload, tta)
+    finally:
+        # Clean up spooled video
+        if kind == 'video':
+            file_handler.delete_file(payload)
+    
+    if not result['success']:
+        return None, result['error']
+    
+    response = {
+        'isFake': result['isFake'],
+        'confidence': round(result['confidence'], 2),
+        'type': result['type'],
+        'details': result['details']
+    }
+    if cache_key is not None:
+        result_cache.set(cache_key, response)
+    return _with_timings(response), None
 
 @detection_bp.route('/health', methods=['GET'])
 def health_check():
@@ -23,47 +142,285 @@ def health_check():
         'message': 'Deepfake Detection API is running'
     })
 
+@detection_bp.route('/stats', methods=['GET'])
+def stats():
+    """Runtime statistics (inference batching, result cache, job queue)"""
+    return jsonify({
+        'inference': inference_scheduler.get_stats(),
+        'cache': result_cache.get_stats() if result_cache else None,
+        'jobs': job_manager.get_stats() if job_manager else None
+    })
+
 @detection_bp.route('/analyze', methods=['POST'])
 def analyze_file():
-    """Analyze uploaded file for deepfake detection"""
-    try:
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+    """
+    Analyze uploaded file for deepfake detection
+    
+    Optional `tta` field (form or query): off, on or borderline (default
+    TTA_MODE), see TestTimeAugmentation.
+    """
+    with request_timer('analyze'):
+        try:
+            file, error = _get_upload()
+            if error:
+                return error
+            tta, error = _get_tta()
+            if error:
+                return error
+            
+            # Upload yang sama (isi file + konfigurasi model) langsung dari cache
+            cache_key, cached, digest = _cache_lookup(file, tta)
+            if cached is not None:
+                return jsonify(_with_timings(cached))
+            
+            kind, payload = _load_upload(file)
+            
+            if kind == 'video' and payload is None:
+                return jsonify({'error': 'Failed to save file'}), 500
+            
+            response, error = _analyze_upload(kind, payload, cache_key, tta=tta, digest=digest)
+            
+            # Return result
+            if error is None:
+                return jsonify(response)
+            else:
+                return jsonify({'error': error}), 400
         
-        if not file_handler.allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+@detection_bp.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """
+    Analyze a video sent as the raw request body while it is still uploading
+    
+    Send the video bytes as the body (not multipart), e.g.
+    `curl -T clip.mp4 -H 'Content-Type: video/mp4' .../api/analyze/stream?filename=clip.mp4`.
+    Frames are decoded and faces detected while later bytes are still arriving.
+    
+    Because the length of the video is unknown while it streams, this endpoint
+    samples the first FRAMES_PER_VIDEO frames (every FRAME_SKIP-th), i.e. the
+    first seconds of the clip, whereas /analyze spreads the same budget over
+    the whole video. Verdicts of the two endpoints can therefore differ for
+    the same file, and streamed verdicts are not cached. Only when the body
+    cannot be decoded from the pipe (MP4 without faststart) the complete file
+    is analyzed like /analyze, sharing its cache entries.
+    """
+    with request_timer('analyze_stream'):
+        return _analyze_stream()
+
+def _analyze_stream():
+    filename = request.args.get('filename', 'upload.mp4')
+    if not file_handler.allowed_file(filename) or not file_handler.is_video(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    tta, error = _get_tta()
+    if error:
+        return error
+    
+    config = current_app.config
+    # Hash isi sama dengan /analyze; hanya dipakai untuk fallback file lengkap
+    hasher = new_content_hasher() if _needs_content_hash(True) else None
+    
+    # Salinan body untuk fallback (MP4 tanpa faststart tidak bisa didecode dari pipe)
+    fd, tee_path = tempfile.mkstemp(suffix='.' + filename.rsplit('.', 1)[1].lower(), dir=file_handler.upload_folder)
+    
+    try:
+        with os.fdopen(fd, 'wb') as tee:
+            decoder = FFmpegFrameStream(
+                request.stream,
+                frame_skip=config['FRAME_SKIP'],
+                max_frames=config['FRAMES_PER_VIDEO'],
+                ffmpeg_binary=config['FFMPEG_BINARY'],
+                chunk_size=config['STREAM_CHUNK_SIZE'],
+                max_bytes=config['MAX_FILE_SIZE'],
+                tee=tee,
+                hasher=hasher
+            )
+            try:
+                result = video_processor.predict_video_stream(decoder.iter_frames(), tta=tta)
+            finally:
+                decoder.close()
         
-        # Save file
-        filepath = file_handler.save_file(file)
+        cache_key = None
+        if decoder.frames_decoded == 0:
+            # ffmpeg tidak bisa membaca dari pipe, pakai file lengkap (sama seperti /analyze)
+            digest = hasher.hexdigest() if hasher is not None else None
+            if result_cache is not None:
+                cache_key = result_cache.key_for_hash(digest, _cache_kind('video', tta))
+                with stage('cache_lookup'):
+                    cached = result_cache.get(cache_key)
+                if cached is not None:
+                    details = {**(cached.get('details') or {}), 'bytesReceived': decoder.bytes_received}
+                    return jsonify(_with_timings({**cached, 'details': details}))
+            result = video_processor.predict_video(tee_path, tta=tta, content_hash=digest)
         
-        if filepath is None:
-            return jsonify({'error': 'Failed to save file'}), 500
+        if not result['success']:
+            return jsonify({'error': result['error']}), 400
         
-        # Determine file type and process
-        if file_handler.is_video(file.filename):
-            result = video_processor.predict_video(filepath)
+        response = {
+            'isFake': result['isFake'],
+            'confidence': round(result['confidence'], 2),
+            'type': result['type'],
+            'details': result['details']
+        }
+        # Hasil stream (hanya awal video) tidak di-cache: /analyze tidak bisa memakainya
+        if cache_key is not None:
+            result_cache.set(cache_key, response)
+        return jsonify(_with_timings({**response, 'details': {**result['details'], 'bytesReceived': decoder.bytes_received}}))
+    
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        file_handler.delete_file(tee_path)
+
+def _batch_items():
+    """
+    Collect the images of a batch request as (filename, reader) pairs
+    
+    Accepts several `files` parts (or repeated `file` parts) and/or zip
+    archives of images. Readers are called later on the decode pool.
+    
+    Returns:
+        (items, None) or (None, error response)
+    """
+    config = current_app.config
+    items = []
+    
+    def too_many():
+        return len(items) > config['BATCH_MAX_ITEMS']
+    
+    for file in request.files.getlist('files') + request.files.getlist('file'):
+        if file.filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                return None, (jsonify({'error': f"Invalid zip archive: {file.filename}"}), 400)
+            for info in archive.infolist():
+                if info.is_dir() or not file_handler.allowed_file(info.filename) or not file_handler.is_image(info.filename):
+                    continue
+                # Ukuran asli dicek supaya zip bomb tidak didekompresi ke memori
+                if info.file_size > config['MAX_FILE_SIZE']:
+                    items.append((info.filename, _failing_reader('File too large')))
+                else:
+                    items.append((info.filename, lambda archive=archive, info=info: archive.read(info)))
+        elif file_handler.allowed_file(file.filename) and file_handler.is_image(file.filename):
+            items.append((file.filename, file.read))
         else:
-            result = image_processor.predict_image(filepath)
+            items.append((file.filename, _failing_reader('File type not allowed')))
         
-        # Clean up uploaded file
-        file_handler.delete_file(filepath)
-        
-        # Return result
+        if too_many():
+            break
+    
+    if not items:
+        return None, (jsonify({'error': 'No images provided'}), 400)
+    if too_many():
+        return None, (jsonify({'error': f"Too many images, at most {config['BATCH_MAX_ITEMS']} per request"}), 413)
+    return items, None
+
+def _failing_reader(message):
+    def read():
+        raise ValueError(message)
+    return read
+
+@detection_bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many images in one request
+    
+    Upload images as repeated `files` parts and/or as zip archives. The
+    response is NDJSON: one line per image as soon as its chunk is scored,
+    then a summary line. A failing image only fails its own line.
+    """
+    items, error = _batch_items()
+    if error:
+        return error
+    tta, error = _get_tta()
+    if error:
+        return error
+    
+    def generate():
+        with request_timer('analyze_batch'):
+            yield from _batch_lines(items, tta)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _batch_lines(items, tta=None):
+    """NDJSON lines of a batch request, see analyze_batch()"""
+    succeeded = 0
+    for index, result in image_processor.predict_images([read for _, read in items], tta):
+        line = {'index': index, 'filename': items[index][0], 'success': result['success']}
         if result['success']:
-            return jsonify({
+            succeeded += 1
+            line.update({
                 'isFake': result['isFake'],
                 'confidence': round(result['confidence'], 2),
                 'type': result['type'],
                 'details': result['details']
             })
         else:
-            return jsonify({'error': result['error']}), 400
+            line['error'] = result['error']
+        yield json.dumps(line) + '\n'
+    
+    yield json.dumps({'summary': {'items': len(items), 'succeeded': succeeded, 'failed': len(items) - succeeded}}) + '\n'
+
+@detection_bp.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue an uploaded file for background analysis and return its job id"""
+    try:
+        file, error = _get_upload()
+        if error:
+            return error
+        
+        tta, error = _get_tta()
+        if error:
+            return error
+        
+        filename = secure_filename(file.filename)
+        
+        cache_key, cached, digest = _cache_lookup(file, tta)
+        if cached is not None:
+            kind = 'video' if file_handler.is_video(file.filename) else 'image'
+            job = job_manager.create_finished(filename, kind, cached)
+            return jsonify(job.to_dict()), 200
+        
+        # Upload harus dibaca sebelum request selesai
+        kind, payload = _load_upload(file)
+        
+        if kind == 'video' and payload is None:
+            return jsonify({'error': 'Failed to save file'}), 500
+        
+        def run(job):
+            with request_timer('job'):
+                response, error = _analyze_upload(kind, payload, cache_key, progress=job.set_progress, tta=tta, digest=digest)
+            if error is not None:
+                raise RuntimeError(error)
+            return response
+        
+        job = job_manager.submit(run, filename, kind)
+        
+        if job is None:
+            # Antrian penuh: tolak sekarang daripada menumpuk pekerjaan
+            if kind == 'video':
+                file_handler.delete_file(payload)
+            response = jsonify({'error': 'Too many jobs in progress, retry later'})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+        
+        return jsonify({
+            'jobId': job.id,
+            'status': job.status,
+            'statusUrl': url_for('detection.get_job', job_id=job.id)
+        }), 202
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@detection_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status, progress counters and (when done) the analysis result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
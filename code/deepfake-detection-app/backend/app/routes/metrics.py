@@ -0,0 +1,17 @@
+from flask import Blueprint, Response
+
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics of this process (stage latencies, batch sizes, faces
+    per video, cache lookups)
+
+    With METRICS_DIR set (gunicorn.conf.py does so) every worker writes its
+    metrics to that folder and the response is the sum over all workers, so
+    a scrape can land on any of them.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -1,66 +1,194 @@
+import os
+import threading
+
 import cv2
 import numpy as np
-from mtcnn import MTCNN
+
+from app.services.face_detector_backends import DETECTOR_BACKENDS, create_detector_backend
+from app.utils.metrics import stage
 
 class FaceDetector:
-    def __init__(self, confidence_threshold=0.7):
-        """Initialize MTCNN face detector"""
-        self.detector = MTCNN()
+    def __init__(self, confidence_threshold=0.7, detection_size=640, backend='mtcnn', backend_options=None,
+                 per_process=False, crop_size=(224, 224)):
+        """
+        Initialize face detector
+
+        Args:
+            confidence_threshold: Minimum detection confidence
+            detection_size: Frames are downscaled so their longest side is at most
+                this many pixels before detection (0 disables downscaling)
+            backend: Registered detector backend ('mtcnn', 'opencv_dnn', 'haar')
+            backend_options: Extra keyword arguments for the backend
+            per_process: Create the backend on first use in every process
+                (for a preloaded gunicorn master; MTCNN starts TensorFlow
+                threads that do not survive a fork)
+            crop_size: (width, height) of the face crops fed to the model (IMG_SIZE)
+        """
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self._detector = None
+        self._detector_pid = None
+        self._lock = threading.Lock()
+        if per_process:
+            if backend not in DETECTOR_BACKENDS:
+                raise ValueError(f"Unknown face detector backend '{backend}', choose from: {', '.join(sorted(DETECTOR_BACKENDS))}")
+        else:
+            self._detector = create_detector_backend(backend, **self.backend_options)
+            self._detector_pid = os.getpid()
         self.confidence_threshold = confidence_threshold
-    
-    def extract_face_from_frame(self, frame, margin=5):
+        self.detection_size = detection_size
+        self.crop_size = tuple(crop_size)
+
+    @property
+    def detector(self):
+        """Detector backend of the current process"""
+        with self._lock:
+            if self._detector is None or self._detector_pid != os.getpid():
+                self._detector = create_detector_backend(self.backend, **self.backend_options)
+                self._detector_pid = os.getpid()
+            return self._detector
+
+    def _downscale(self, frame):
+        """Resize frame for detection, returns (small_frame, scale)"""
+        longest = max(frame.shape[:2])
+        if self.detection_size <= 0 or longest <= self.detection_size:
+            return frame, 1.0
+
+        scale = self.detection_size / longest
+        size = (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+    def detect_batch(self, frames):
         """
-        Extract face region from a frame using MTCNN
-        
+        Detect the best face in each of several frames
+
         Args:
-            frame: Input frame (RGB format)
-            margin: Pixel margin around detected face
-        
+            frames: List of frames (RGB format), may have different sizes
+
         Returns:
-            Extracted face region or None if no face detected
+            List with, per frame, (x, y, w, h, confidence) in original frame
+            coordinates or None if no face passes the confidence threshold
         """
-        # Detect faces
-        detections = self.detector.detect_faces(frame)
-        
-        if len(detections) == 0:
-            return None
-        
         # Get the face with highest confidence
-        best_detection = max(detections, key=lambda x: x['confidence'])
-        
-        # Check confidence threshold
-        if best_detection['confidence'] < self.confidence_threshold:
-            return None
-        
-        # Extract bounding box
-        x, y, w, h = best_detection['box']
-        
+        return [faces[0] if faces else None for faces in self.detect_batch_all(frames, max_faces=1)]
+
+    def detect_batch_all(self, frames, max_faces=None):
+        """
+        Detect every face above the confidence threshold in each of several frames
+
+        Args:
+            frames: List of frames (RGB format), may have different sizes
+            max_faces: Keep at most this many faces per frame (None: all)
+
+        Returns:
+            List with, per frame, a list of (x, y, w, h, confidence) in original
+            frame coordinates, highest confidence first
+        """
+        if len(frames) == 0:
+            return []
+
+        with stage('detect'):
+            small_frames, scales = zip(*(self._downscale(frame) for frame in frames))
+            results = self.detector.detect(list(small_frames))
+
+        faces = []
+        for detections, scale in zip(results, scales):
+            # Check confidence threshold
+            kept = sorted((d for d in detections if d[4] >= self.confidence_threshold), key=lambda d: d[4], reverse=True)
+            if max_faces is not None:
+                kept = kept[:max_faces]
+
+            frame_faces = []
+            for detection in kept:
+                # Kembalikan box ke koordinat frame asli
+                x, y, w, h = (np.asarray(detection[:4], dtype=np.float64) / scale).round().astype(int)
+                frame_faces.append((int(x), int(y), int(w), int(h), float(detection[4])))
+            faces.append(frame_faces)
+
+        return faces
+
+    def crop_face(self, frame, box, margin=5):
+        """Extract the face region of a (x, y, w, h, ...) box with a pixel margin"""
+        x, y, w, h = box[:4]
+
         # Add margin
         x1 = max(0, x - margin)
         y1 = max(0, y - margin)
         x2 = min(frame.shape[1], x + w + margin)
         y2 = min(frame.shape[0], y + h + margin)
-        
+
         # Extract face region
-        face = frame[y1:y2, x1:x2]
-        
-        return face
-    
-    def preprocess_face(self, face, target_size=(224, 224)):
+        return frame[y1:y2, x1:x2]
+
+    def crop_faces(self, frames, boxes, target_size=None, margin=5):
+        """
+        Crop and resize several faces into one preallocated uint8 batch
+
+        Every face region is a view of its frame and is resized straight into
+        its row of the batch (cv2.resize with dst), so no array per face is
+        allocated.
+
+        Args:
+            frames: Frame (RGB format) of each box; a frame may appear several times
+            boxes: (x, y, w, h, ...) per face
+            target_size: Crop size (width, height); None uses crop_size
+            margin: Pixel margin around each face
+
+        Returns:
+            (crops, kept): uint8 array (N, height, width, 3) and the indices of
+            the boxes with a non-empty region, i.e. the boxes of the rows of `crops`
+        """
+        target_size = tuple(target_size or self.crop_size)
+        regions = [self.crop_face(frame, box, margin) for frame, box in zip(frames, boxes)]
+        kept = [i for i, region in enumerate(regions) if region.size > 0]
+
+        crops = np.empty((len(kept), target_size[1], target_size[0], 3), dtype=np.uint8)
+        with stage('preprocess'):
+            for row, i in enumerate(kept):
+                cv2.resize(regions[i], target_size, dst=crops[row])
+        return crops, kept
+
+    def extract_faces_batch(self, frames, margin=5):
+        """
+        Extract the best face region of each frame with one batched detection call
+
+        Returns:
+            List of face regions (or None) aligned with `frames`
+        """
+        return [
+            None if box is None else self.crop_face(frame, box, margin)
+            for frame, box in zip(frames, self.detect_batch(frames))
+        ]
+
+    def extract_face_from_frame(self, frame, margin=5):
+        """
+        Extract face region from a frame using the configured detector backend
+
+        Args:
+            frame: Input frame (RGB format)
+            margin: Pixel margin around detected face
+
+        Returns:
+            Extracted face region or None if no face detected
+        """
+        return self.extract_faces_batch([frame], margin)[0]
+
+    def preprocess_face(self, face, target_size=None):
         """
         Preprocess face for model input
-        
+
         Args:
             face: Face region (RGB format)
-            target_size: Target size for resizing
-        
+            target_size: Target size for resizing (None: crop_size)
+
         Returns:
             Preprocessed face ready for model input
         """
         if face is None or face.size == 0:
             return None
-        
+
         # Resize to target size
-        face_resized = cv2.resize(face, target_size)
-        
-        return face_resized
\ No newline at end of file
+        with stage('preprocess'):
+            face_resized = cv2.resize(face, tuple(target_size or self.crop_size))
+
+        return face_resized
@@ -0,0 +1,164 @@
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Nama backend -> class, diisi oleh @register_detector_backend
+DETECTOR_BACKENDS = {}
+
+
+def register_detector_backend(name):
+    """Class decorator that makes a detector backend selectable by name"""
+    def decorator(cls):
+        DETECTOR_BACKENDS[name] = cls
+        cls.name = name
+        return cls
+    return decorator
+
+
+def create_detector_backend(name, **options):
+    """Instantiate the registered detector backend `name`"""
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown face detector backend '{name}', choose from: {', '.join(sorted(DETECTOR_BACKENDS))}")
+    return DETECTOR_BACKENDS[name](**options)
+
+
+class DetectorBackend:
+    """
+    Common interface of the face detector backends
+
+    detect() takes a list of RGB images and returns, per image, a list of
+    (x, y, w, h, confidence) tuples in that image's pixel coordinates.
+    """
+
+    name = None
+
+    def detect(self, images):
+        raise NotImplementedError
+
+
+@register_detector_backend('mtcnn')
+class MTCNNBackend(DetectorBackend):
+    """MTCNN (accurate, slowest; pulls in TensorFlow)"""
+
+    def __init__(self, **options):
+        from mtcnn import MTCNN
+
+        self.detector = MTCNN()
+        self._supports_batch = True
+
+    def detect(self, images):
+        results = None
+        if self._supports_batch and len(images) > 1:
+            try:
+                # mtcnn>=1.0 menjalankan tahap P/R/O-Net untuk semua gambar sekaligus
+                results = self.detector.detect_faces(images)
+                if len(results) != len(images) or not all(isinstance(r, list) for r in results):
+                    results = None
+            except (TypeError, ValueError, AttributeError):
+                results = None
+            if results is None:
+                # Versi mtcnn lama hanya menerima satu gambar
+                self._supports_batch = False
+
+        if results is None:
+            results = [self.detector.detect_faces(image) for image in images]
+
+        return [
+            [(*(int(v) for v in d['box']), float(d['confidence'])) for d in detections]
+            for detections in results
+        ]
+
+
+@register_detector_backend('opencv_dnn')
+class OpenCVDNNBackend(DetectorBackend):
+    """
+    OpenCV DNN SSD ResNet-10 face model (res10_300x300_ssd_iter_140000)
+
+    Needs the Caffe `deploy.prototxt` and `.caffemodel` files from the OpenCV
+    face detector sample; paths come from Config.
+    """
+
+    def __init__(self, prototxt=None, model=None, input_size=300, **options):
+        if not prototxt or not model or not Path(prototxt).exists() or not Path(model).exists():
+            raise FileNotFoundError(
+                f"OpenCV DNN face model not found (prototxt={prototxt}, model={model})"
+            )
+        self.prototxt = str(prototxt)
+        self.model = str(model)
+        self.input_size = input_size
+        # cv2.dnn.Net tidak thread-safe: satu net per thread detektor
+        self._local = threading.local()
+        self._local.net = cv2.dnn.readNetFromCaffe(self.prototxt, self.model)
+
+    @property
+    def net(self):
+        net = getattr(self._local, 'net', None)
+        if net is None:
+            net = self._local.net = cv2.dnn.readNetFromCaffe(self.prototxt, self.model)
+        return net
+
+    def detect(self, images):
+        if len(images) == 0:
+            return []
+
+        # Satu forward pass untuk semua gambar; model dilatih dengan BGR
+        blob = cv2.dnn.blobFromImages(
+            images, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0), swapRB=True, crop=False
+        )
+        net = self.net
+        net.setInput(blob)
+        output = net.forward().reshape(-1, 7)
+
+        results = [[] for _ in images]
+        for image_id, _, confidence, x1, y1, x2, y2 in output:
+            image_id = int(image_id)
+            if image_id < 0 or image_id >= len(images) or confidence <= 0:
+                continue
+            height, width = images[image_id].shape[:2]
+            x1, x2 = np.clip([x1 * width, x2 * width], 0, width)
+            y1, y2 = np.clip([y1 * height, y2 * height], 0, height)
+            if x2 - x1 < 1 or y2 - y1 < 1:
+                continue
+            results[image_id].append((int(x1), int(y1), int(x2 - x1), int(y2 - y1), float(confidence)))
+
+        return results
+
+
+@register_detector_backend('haar')
+class HaarCascadeBackend(DetectorBackend):
+    """
+    OpenCV Haar cascade (fastest, lowest recall)
+
+    Haar cascades give no calibrated score, so every detection is reported
+    with confidence 1.0 and the confidence threshold does not filter them.
+    """
+
+    def __init__(self, cascade=None, scale_factor=1.1, min_neighbors=5, min_size=40, **options):
+        self.cascade = str(cascade or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # CascadeClassifier tidak thread-safe: satu classifier per thread detektor
+        self._local = threading.local()
+        if self.classifier.empty():
+            raise FileNotFoundError(f"Cannot load Haar cascade {self.cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+
+    @property
+    def classifier(self):
+        classifier = getattr(self._local, 'classifier', None)
+        if classifier is None:
+            classifier = self._local.classifier = cv2.CascadeClassifier(self.cascade)
+        return classifier
+
+    def detect(self, images):
+        classifier = self.classifier
+        results = []
+        for image in images:
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            boxes = classifier.detectMultiScale(
+                gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+            )
+            results.append([(int(x), int(y), int(w), int(h), 1.0) for x, y, w, h in boxes])
+        return results
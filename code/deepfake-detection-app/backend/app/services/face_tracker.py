@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+
+class FaceTracker:
+    def __init__(self, max_points=60, min_points=8, max_fb_error=1.5):
+        """
+        Propagate a face box between frames with sparse Lucas-Kanade optical flow
+
+        Feature points inside the box are tracked forward and backward; points
+        whose forward-backward error is too large are dropped. The box moves by
+        the median point shift and scales by the median change in spread.
+
+        Args:
+            max_points: Maximum number of feature points tracked inside the box
+            min_points: Tracking fails when fewer points survive
+            max_fb_error: Maximum forward-backward error (pixels) of a kept point
+        """
+        self.max_points = max_points
+        self.min_points = min_points
+        self.max_fb_error = max_fb_error
+        self.lk_params = dict(
+            winSize=(21, 21),
+            maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked face"""
+        self.box = None
+        self.points = None
+        self.prev_gray = None
+
+    @property
+    def active(self):
+        return self.box is not None
+
+    def start(self, frame, box):
+        """
+        Start tracking `box` (x, y, w, h, ...) in `frame` (RGB format)
+
+        Returns:
+            True if enough feature points were found inside the box
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        x, y, w, h = [int(v) for v in box[:4]]
+
+        mask = np.zeros_like(gray)
+        mask[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = 255
+        points = cv2.goodFeaturesToTrack(gray, self.max_points, qualityLevel=0.01, minDistance=5, mask=mask)
+
+        if points is None or len(points) < self.min_points:
+            self.reset()
+            return False
+
+        self.box = np.array([x, y, w, h], dtype=np.float64)
+        self.points = points.astype(np.float32)
+        self.prev_gray = gray
+        return True
+
+    def update(self, frame):
+        """
+        Move the tracked box to `frame`
+
+        Returns:
+            (box, confidence): box as (x, y, w, h) ints or None when tracking is
+            lost; confidence is the fraction of feature points that survived
+        """
+        if not self.active:
+            return None, 0.0
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.points, None, **self.lk_params)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, new_points, None, **self.lk_params)
+
+        fb_error = np.linalg.norm((self.points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.max_fb_error)
+        confidence = float(good.sum()) / len(self.points)
+
+        if good.sum() < self.min_points:
+            self.reset()
+            return None, confidence
+
+        old = self.points.reshape(-1, 2)[good]
+        new = new_points.reshape(-1, 2)[good]
+
+        # Geser box dengan median pergeseran titik
+        shift = np.median(new - old, axis=0)
+
+        # Skala = median perbandingan jarak titik ke pusatnya
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+        x, y, w, h = self.box
+        cx, cy = x + w / 2.0 + shift[0], y + h / 2.0 + shift[1]
+        w, h = w * scale, h * scale
+        self.box = np.array([cx - w / 2.0, cy - h / 2.0, w, h])
+
+        self.points = new.reshape(-1, 1, 2).astype(np.float32)
+        self.prev_gray = gray
+
+        return tuple(int(round(v)) for v in self.box), confidence
@@ -0,0 +1,168 @@
+import json
+
+from app.services.face_detector import FaceDetector
+from app.services.image_processor import ImageProcessor
+from app.services.inference_backend import load_backend
+from app.services.inference_scheduler import InferenceScheduler
+from app.services.video_processor import VideoProcessor
+from app.utils.crop_store import CropStore, crop_namespace
+from app.utils.file_handler import FileHandler
+from app.utils.result_cache import ResultCache
+from app.utils.tta import TestTimeAugmentation
+
+
+class Services:
+    """Model, detector and processors built from one Config, shared by a process"""
+
+    def __init__(self, backend, face_detector, file_handler, inference_scheduler, image_processor,
+                 video_processor, crop_store=None, temporal_head=None, result_cache=None):
+        self.backend = backend
+        self.face_detector = face_detector
+        self.file_handler = file_handler
+        self.inference_scheduler = inference_scheduler
+        self.image_processor = image_processor
+        self.video_processor = video_processor
+        self.crop_store = crop_store
+        self.temporal_head = temporal_head
+        self.result_cache = result_cache
+
+
+def build_services(config, intra_op_threads=None, detection_workers=None, decode_workers=None,
+                   fork_safe=False, result_cache=True, strict=False):
+    """
+    Build every analysis service from a Config class
+
+    The API server (create_app), bulk scan workers and the benchmark suite all
+    use this factory, so they analyze files with the same settings.
+
+    Args:
+        config: Config class
+        intra_op_threads: Model runtime threads (None: config.INTRA_OP_THREADS)
+        detection_workers: Detector threads per video (None: config.DETECTION_WORKERS)
+        decode_workers: Image decode threads of batch requests (None: config.BATCH_DECODE_WORKERS)
+        fork_safe: Processes are forked after building (gunicorn preload_app)
+        result_cache: Build the ResultCache when config.RESULT_CACHE_ENABLED
+        strict: Raise when the model cannot be loaded instead of falling back
+            to dummy scores (see load_backend)
+
+    Returns:
+        Services
+    """
+    # Load ML model (sekali saja, dipakai bersama oleh semua processor)
+    model_path = config.QUANTIZED_MODEL_PATH if config.MODEL_PRECISION == 'int8' else config.MODEL_PATH
+    backend = load_backend(
+        model_path,
+        intra_op_threads=config.INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads,
+        inter_op_threads=config.INTER_OP_THREADS,
+        mmap=config.MODEL_MMAP,
+        fork_safe=fork_safe,
+        strict=strict
+    )
+
+    # Temporal head membaca embedding backbone (tidak ada di export TorchScript/ONNX)
+    temporal_head = None
+    if config.TEMPORAL_HEAD_PATH:
+        if backend.supports_embeddings:
+            from app.services.temporal_head import TemporalHeadScorer
+            temporal_head = TemporalHeadScorer.load(config.TEMPORAL_HEAD_PATH, backend.identity)
+        else:
+            print(f"Warning: {backend.framework} models do not expose embeddings, TEMPORAL_HEAD_PATH is ignored")
+
+    face_detector = FaceDetector(
+        confidence_threshold=config.FACE_DETECTION_CONFIDENCE,
+        detection_size=config.FACE_DETECTION_SIZE,
+        backend=config.FACE_DETECTOR_BACKEND,
+        backend_options={
+            'prototxt': config.FACE_DNN_PROTOTXT,
+            'model': config.FACE_DNN_MODEL
+        },
+        per_process=fork_safe,
+        crop_size=config.IMG_SIZE
+    )
+
+    file_handler = FileHandler(
+        upload_folder=config.UPLOAD_FOLDER,
+        allowed_extensions=config.ALLOWED_EXTENSIONS,
+        memory_spool_threshold=config.VIDEO_MEMORY_SPOOL_THRESHOLD
+    )
+
+    # Satu scheduler untuk semua request, supaya crop dari request berbeda
+    # bisa digabung dalam satu batch
+    inference_scheduler = InferenceScheduler(
+        backend=backend,
+        max_batch_size=config.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=config.INFERENCE_MAX_WAIT_MS,
+        tta=TestTimeAugmentation(config.TTA_VIEWS, config.TTA_ZOOM, config.TTA_BORDERLINE_MARGIN) if config.TTA_VIEWS else None,
+        tta_mode=config.TTA_MODE
+    )
+
+    image_processor = ImageProcessor(
+        face_detector=face_detector,
+        inference_scheduler=inference_scheduler,
+        batch_chunk_size=config.BATCH_CHUNK_SIZE,
+        decode_workers=config.BATCH_DECODE_WORKERS if decode_workers is None else decode_workers
+    )
+
+    # Crop wajah disimpan per video supaya video yang sama tidak didecode ulang
+    crop_store = None
+    if config.CROP_STORE_DIR:
+        crop_store = CropStore(
+            config.CROP_STORE_DIR,
+            crop_namespace(config),
+            max_bytes=config.CROP_STORE_MAX_MB * 1024 * 1024,
+            max_age=config.CROP_STORE_TTL
+        )
+        # Peta video dari extract_crops.py dibaca sekarang, bukan saat request pertama
+        print(f"Crop store {config.CROP_STORE_DIR}: {crop_store.load_offline_videos()} videos extracted offline")
+
+    video_processor = VideoProcessor(
+        face_detector=face_detector,
+        inference_scheduler=inference_scheduler,
+        frames_per_video=config.FRAMES_PER_VIDEO,
+        frame_skip=config.FRAME_SKIP,
+        detection_batch_size=config.DETECTION_BATCH_SIZE,
+        tracking=config.FACE_TRACKING,
+        redetect_interval=config.TRACKING_REDETECT_INTERVAL,
+        min_tracking_confidence=config.TRACKING_MIN_CONFIDENCE,
+        max_tracking_gap=config.TRACKING_MAX_FRAME_GAP,
+        detection_workers=config.DETECTION_WORKERS if detection_workers is None else detection_workers,
+        queue_depth=config.PIPELINE_QUEUE_DEPTH,
+        early_exit=config.EARLY_EXIT,
+        early_exit_confidence=config.EARLY_EXIT_CONFIDENCE,
+        early_exit_min_faces=config.EARLY_EXIT_MIN_FACES,
+        crop_store=crop_store,
+        multi_face=config.MULTI_FACE,
+        max_faces_per_frame=config.MAX_FACES_PER_FRAME,
+        min_identity_faces=config.MIN_IDENTITY_FACES,
+        temporal_head=temporal_head
+    )
+
+    # Cache hasil analisis; namespace berubah bila model atau konfigurasi berubah
+    cache = None
+    if result_cache and config.RESULT_CACHE_ENABLED:
+        cache = ResultCache(
+            namespace=json.dumps({
+                'model': backend.identity,
+                'imgSize': config.IMG_SIZE,
+                'framesPerVideo': config.FRAMES_PER_VIDEO,
+                'frameSkip': config.FRAME_SKIP,
+                'detector': config.FACE_DETECTOR_BACKEND,
+                'detectionSize': config.FACE_DETECTION_SIZE,
+                'detectionConfidence': config.FACE_DETECTION_CONFIDENCE,
+                'tracking': [config.FACE_TRACKING, config.TRACKING_REDETECT_INTERVAL, config.TRACKING_MIN_CONFIDENCE,
+                             config.TRACKING_MAX_FRAME_GAP],
+                'earlyExit': [config.EARLY_EXIT, config.EARLY_EXIT_CONFIDENCE, config.EARLY_EXIT_MIN_FACES],
+                'multiFace': [config.MULTI_FACE, config.MAX_FACES_PER_FRAME, config.MIN_IDENTITY_FACES],
+                # Mode TTA masuk ke key cache per request, di sini hanya pengaturan view
+                'tta': [config.TTA_VIEWS, config.TTA_ZOOM, config.TTA_BORDERLINE_MARGIN],
+                'temporalHead': temporal_head.identity if temporal_head is not None else None,
+            }, sort_keys=True),
+            max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.RESULT_CACHE_TTL,
+            disk_dir=config.RESULT_CACHE_DIR,
+            disk_max_bytes=config.RESULT_CACHE_DISK_MAX_MB * 1024 * 1024,
+            disk_ttl_seconds=config.RESULT_CACHE_DISK_TTL
+        )
+
+    return Services(backend, face_detector, file_handler, inference_scheduler, image_processor,
+                    video_processor, crop_store, temporal_head, cache)
@@ -1,41 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
-# Import TensorFlow dan PyTorch untuk mengecek jenis objek model
-import tensorflow as tf
-import torch 
+
+from app.utils.metrics import stage
 
 class ImageProcessor:
-    def __init__(self, face_detector, model):
+    def __init__(self, face_detector, inference_scheduler, batch_chunk_size=32, decode_workers=4):
         self.face_detector = face_detector
-        self.model = model
-        
-        # Tentukan framework model saat inisialisasi
-        self.framework = self._determine_framework()
-
-    def _determine_framework(self):
-        """Menentukan framework (Keras atau PyTorch) dari objek model yang dimuat."""
-        if self.model is None:
-            return None
-        # Cek apakah objek model adalah Keras Model
-        elif isinstance(self.model, tf.keras.Model):
-            return 'keras'
-        # Cek apakah objek model adalah PyTorch nn.Module
-        elif isinstance(self.model, torch.nn.Module):
-            # Penting: Set model PyTorch ke mode evaluasi
-            self.model.eval() 
-            return 'pytorch'
-        else:
-            return 'unknown'
+        self.inference_scheduler = inference_scheduler
+        # Batch analysis: jumlah gambar per deteksi/submit, thread untuk decode
+        self.batch_chunk_size = max(1, batch_chunk_size)
+        self._decode_pool = ThreadPoolExecutor(max_workers=max(1, decode_workers), thread_name_prefix='image-decode')
     
-    def predict_image(self, image_path):
+    def predict_image(self, image_path, tta=None):
+        """
+        Predict if an image file is real or fake (see predict_image_array)
         """
-        Predict if an image is real or fake using face detection, 
-        supporting both Keras/TensorFlow and PyTorch models.
+        return self.predict_image_array(cv2.imread(str(image_path)), tta)
+    
+    def predict_image_array(self, image, tta=None):
+        """
+        Predict if an image is real or fake using face detection.
+        The face crop is scored through the shared InferenceScheduler.
+        
+        Args:
+            image: Decoded image in BGR format (None if decoding failed)
+            tta: Test-time augmentation mode ('off', 'on', 'borderline'; None: scheduler default)
         """
         try:
-            # Read image
-            image = cv2.imread(str(image_path))
-            
             if image is None:
                 return {
                     'success': False,
@@ -72,41 +65,9 @@ class ImageProcessor:
                     'type': 'image'
                 }
             
-            # --- PREDIKSI BERDASARKAN FRAMEWORK ---
-            prediction = 0.0
-
-            if self.framework == 'keras':
-                # Keras/TensorFlow: (HWC) -> Normalisasi (0-1) -> Tambah dimensi batch (NHWC)
-                face_array = np.expand_dims(face_processed / 255.0, axis=0).astype(np.float32)
-                
-                # Gunakan metode .predict()
-                output = self.model.predict(face_array, verbose=0)
-                prediction = float(output[0][0])
-            
-            elif self.framework == 'pytorch':
-                # PyTorch: (HWC) -> Normalisasi (0-1)
-                face_normalized = face_processed / 255.0
-                
-                # Ubah bentuk dan konversi ke Tensor: (H, W, C) -> (C, H, W) -> (1, C, H, W) (NCHW)
-                face_tensor = torch.from_numpy(face_normalized).permute(2, 0, 1).unsqueeze(0).float()
-                
-                # Gunakan panggilan objek model (model(input))
-                with torch.no_grad():
-                    output = self.model(face_tensor)
-                    
-                    # Asumsi klasifikasi biner, terapkan Sigmoid untuk probabilitas
-                    probabilities = torch.softmax(output, dim=1)
-                    prediction_tensor = probabilities[0, 1]
-                    prediction = prediction_tensor.item()
-            
-            else:
-                return {
-                    'success': False,
-                    'error': f"Model not loaded or unrecognized framework: {self.framework}.",
-                    'isFake': None,
-                    'confidence': 0.0,
-                    'type': 'image'
-                }
+            # Skor dihitung bersama crop dari request lain (micro-batching)
+            with stage('infer_wait'):
+                prediction = float(self.inference_scheduler.predict(face_processed[np.newaxis], tta=tta)[0])
 
             # Determine label (0 = fake, 1 = real)
             is_fake = prediction <= 0.5
@@ -127,4 +88,109 @@ class ImageProcessor:
                 'isFake': None,
                 'confidence': 0.0,
                 'type': 'image'
-            }
\ No newline at end of file
+            }
+    
+    @staticmethod
+    def _decode(read):
+        """Read and decode one image; returns (BGR image or None, error message)"""
+        try:
+            data = read()
+            with stage('decode'):
+                image = cv2.imdecode(np.frombuffer(memoryview(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+            return image, None if image is not None else 'Cannot read image'
+        except Exception as e:
+            return None, str(e)
+    
+    @staticmethod
+    def _error(message):
+        return {
+            'success': False,
+            'error': message,
+            'isFake': None,
+            'confidence': 0.0,
+            'type': 'image'
+        }
+    
+    def predict_images(self, readers, tta=None):
+        """
+        Predict many images, yielding each result as soon as its chunk is scored
+        
+        Images are processed in chunks of `batch_chunk_size`: the chunk is
+        read and decoded on the decode pool, its faces are detected with one
+        detector call and all crops are submitted to the scheduler as one
+        batch. The next chunk is decoded and detected while the previous one
+        is being scored. A failing item only fails its own result.
+        
+        Args:
+            readers: List of callables returning the encoded bytes of one image
+            tta: Test-time augmentation mode (see predict_image_array)
+        
+        Yields:
+            (index, result) with result shaped like predict_image_array()
+        """
+        pending = None
+        
+        for start in range(0, len(readers), self.batch_chunk_size):
+            chunk = readers[start:start + self.batch_chunk_size]
+            results = {}
+            future = None
+            scored = []
+            
+            try:
+                decoded = list(self._decode_pool.map(self._decode, chunk))
+                
+                valid = []
+                for offset, (image, error) in enumerate(decoded):
+                    if image is None:
+                        results[start + offset] = self._error(error)
+                    else:
+                        valid.append((start + offset, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+                
+                faces = self.face_detector.extract_faces_batch([image for _, image in valid])
+                crops = []
+                for (index, _), face in zip(valid, faces):
+                    face_processed = self.face_detector.preprocess_face(face) if face is not None else None
+                    if face_processed is None:
+                        results[index] = self._error('No face detected in image')
+                        continue
+                    scored.append(index)
+                    crops.append(face_processed)
+                
+                # Satu batch untuk semua crop chunk ini
+                if crops:
+                    future = self.inference_scheduler.submit(np.stack(crops), tta)
+            except Exception as e:
+                for index in range(start, start + len(chunk)):
+                    results.setdefault(index, self._error(str(e)))
+                scored, future = [], None
+            
+            # Chunk sebelumnya sudah dinilai sementara chunk ini didecode dan dideteksi
+            if pending is not None:
+                yield from self._finish_chunk(*pending)
+            pending = (start, len(chunk), results, scored, future)
+        
+        if pending is not None:
+            yield from self._finish_chunk(*pending)
+    
+    def _finish_chunk(self, start, size, results, scored, future):
+        """Wait for the scores of a chunk and yield its results in order"""
+        if future is not None:
+            try:
+                predictions = future.result()
+                for index, prediction in zip(scored, predictions):
+                    prediction = float(prediction)
+                    is_fake = prediction <= 0.5
+                    confidence = (1 - prediction) if is_fake else prediction
+                    results[index] = {
+                        'success': True,
+                        'isFake': bool(is_fake),
+                        'confidence': float(confidence * 100),
+                        'type': 'image',
+                        'details': None
+                    }
+            except Exception as e:
+                for index in scored:
+                    results[index] = self._error(str(e))
+        
+        for index in range(start, start + size):
+            yield index, results[index]
@@ -0,0 +1,408 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# torch, tensorflow dan onnxruntime di-import saat model dimuat, hanya
+# framework milik file model yang ikut masuk ke proses
+
+# Framework per ekstensi file model; ekstensi lain dimuat dengan Keras
+MODEL_FRAMEWORKS = {
+    '.pth': 'pytorch',
+    '.pt': 'torchscript',
+    '.onnx': 'onnx',
+}
+
+
+def _determine_framework(model):
+    """
+    Framework of a model file path or of an in-memory model object
+
+    Paths are resolved by suffix. Objects are only compared against the
+    frameworks that are already imported (a torch model cannot exist without
+    torch in sys.modules), so the check never imports the other framework.
+    """
+    if isinstance(model, (str, Path)):
+        return MODEL_FRAMEWORKS.get(Path(model).suffix.lower(), 'keras')
+
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        if isinstance(model, torch.jit.ScriptModule):
+            return 'torchscript'
+        if isinstance(model, torch.nn.Module):
+            return 'pytorch'
+
+    # tf.keras adalah Keras 3, jadi cukup cek modul keras
+    keras = sys.modules.get('keras')
+    if keras is not None and isinstance(model, keras.Model):
+        return 'keras'
+
+    ort = sys.modules.get('onnxruntime')
+    if ort is not None and isinstance(model, ort.InferenceSession):
+        return 'onnx'
+
+    raise TypeError(f"Unsupported model type {type(model).__name__}")
+
+
+def logits_to_scores(outputs):
+    """Convert classifier outputs to the probability of real (softmax or sigmoid)"""
+    import torch
+
+    if outputs.dim() == 2 and outputs.shape[1] > 1:
+        return torch.softmax(outputs, dim=1)[:, 1]
+    return torch.sigmoid(outputs).reshape(-1)
+
+
+class InferenceBackend:
+    """
+    Common interface of every classifier backend
+
+    predict_batch() takes uint8 face crops in NHWC/RGB layout and returns one
+    float32 score per crop: the probability that the face is real.
+    Backends with `supports_embeddings` also return the penultimate-layer
+    features of every crop from the same forward pass
+    (predict_batch_with_embeddings()).
+    """
+
+    framework = None
+    supports_embeddings = False
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path
+
+    @property
+    def identity(self):
+        """String identifying the served model (framework + weights file and its version)"""
+        try:
+            stat = Path(self.model_path).stat()
+            version = f"{stat.st_size}:{int(stat.st_mtime)}"
+        except (TypeError, OSError):
+            version = 'missing'
+        return f"{self.framework}:{self.model_path}:{version}"
+
+    def predict_batch(self, faces):
+        """
+        Score a batch of face crops
+
+        Args:
+            faces: uint8 array (N, H, W, C) in RGB
+
+        Returns:
+            float32 array of N scores
+        """
+        faces = self._check_batch(faces)
+        if len(faces) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        return self._forward(self.preprocess(faces))
+
+    def predict_batch_with_embeddings(self, faces):
+        """
+        Score a batch of face crops and return their embeddings as well
+
+        Returns:
+            (scores, embeddings): float32 arrays (N,) and (N, D), the
+            embeddings being the input of the final classification layer
+        """
+        faces = self._check_batch(faces)
+        if len(faces) == 0:
+            return np.empty(0, dtype=np.float32), np.empty((0, 0), dtype=np.float32)
+
+        return self._forward_with_embeddings(self.preprocess(faces))
+
+    @staticmethod
+    def _check_batch(faces):
+        faces = np.asarray(faces)
+        if faces.ndim != 4:
+            raise ValueError(f"Expected a (N, H, W, C) batch, got shape {faces.shape}")
+        return faces
+
+    @staticmethod
+    def preprocess(faces):
+        """Normalize uint8 NHWC to float32 [0, 1] in a single vectorized pass"""
+        return np.multiply(faces, np.float32(1.0 / 255.0), dtype=np.float32)
+
+    def _forward(self, batch):
+        raise NotImplementedError
+
+    def _forward_with_embeddings(self, batch):
+        raise NotImplementedError(f"The {self.framework} backend does not expose embeddings")
+
+
+class KerasBackend(InferenceBackend):
+    framework = 'keras'
+    supports_embeddings = True
+
+    def __init__(self, model, model_path=None):
+        super().__init__(model_path)
+        self.model = model
+        self._embedding_model = None
+
+    @classmethod
+    def from_path(cls, model_path):
+        import tensorflow as tf
+
+        model = tf.keras.models.load_model(str(model_path))
+        print(f"   Input shape: {model.input_shape}")
+        print(f"   Output shape: {model.output_shape}")
+        return cls(model, model_path)
+
+    def _forward(self, batch):
+        # Model Keras sudah NHWC dan keluarannya sudah berupa probabilitas
+        predictions = self.model.predict(batch, verbose=0)
+        return np.asarray(predictions, dtype=np.float32).reshape(len(batch), -1)[:, 0]
+
+    def _forward_with_embeddings(self, batch):
+        if self._embedding_model is None:
+            import tensorflow as tf
+
+            # Sub-model dengan dua output: skor dan input layer Dense terakhir
+            self._embedding_model = tf.keras.Model(self.model.inputs, [self.model.output, self.model.layers[-1].input])
+        predictions, embeddings = self._embedding_model.predict(batch, verbose=0)
+        return (
+            np.asarray(predictions, dtype=np.float32).reshape(len(batch), -1)[:, 0],
+            np.asarray(embeddings, dtype=np.float32).reshape(len(batch), -1)
+        )
+
+
+class PyTorchBackend(InferenceBackend):
+    framework = 'pytorch'
+    supports_embeddings = True
+
+    def __init__(self, model, model_path=None, num_threads=0):
+        super().__init__(model_path)
+        self.model = model
+        self._classifier = None
+        # Penting: Set model PyTorch ke mode evaluasi
+        self.model.eval()
+        if num_threads > 0:
+            import torch
+
+            torch.set_num_threads(num_threads)
+
+    @classmethod
+    def from_path(cls, model_path, num_threads=0, mmap=False):
+        """
+        Load a pickled PyTorch model
+
+        With `mmap` the weight storages stay backed by the file instead of
+        being copied to the heap, so every worker process serving the same
+        file shares one copy through the page cache.
+        """
+        import torch
+
+        try:
+            model = torch.load(str(model_path), weights_only=False, map_location=torch.device('cpu'), mmap=mmap)
+        except RuntimeError as e:
+            if not mmap:
+                raise
+            # File format lama (bukan zip) tidak bisa di-mmap
+            print(f"⚠️ Cannot memory-map {model_path} ({e}), loading into memory")
+            model = torch.load(str(model_path), weights_only=False, map_location=torch.device('cpu'))
+        return cls(model, model_path, num_threads)
+
+    def _forward(self, batch):
+        import torch
+
+        # (N, H, W, C) -> (N, C, H, W) sebagai view tanpa copy; memori tetap
+        # channels_last yang didukung langsung oleh konvolusi PyTorch di CPU
+        faces_tensor = torch.from_numpy(batch).permute(0, 3, 1, 2)
+        with torch.inference_mode():
+            predictions = logits_to_scores(self.model(faces_tensor))
+        return predictions.cpu().numpy().astype(np.float32, copy=False)
+
+    def _forward_with_embeddings(self, batch):
+        # Hook menangkap input layer klasifikasi dalam forward pass yang sama;
+        # backend hanya dipanggil dari satu thread (InferenceScheduler)
+        captured = []
+        handle = self._classifier_layer().register_forward_pre_hook(lambda module, inputs: captured.append(inputs[0]))
+        try:
+            predictions = self._forward(batch)
+        finally:
+            handle.remove()
+        embeddings = captured[-1].reshape(len(batch), -1)
+        return predictions, embeddings.float().cpu().numpy()
+
+    def _classifier_layer(self):
+        """Last registered nn.Linear of the model (e.g. EfficientNet `_fc`)"""
+        import torch
+
+        if self._classifier is None:
+            linears = [module for module in self.model.modules() if isinstance(module, torch.nn.Linear)]
+            if not linears:
+                raise NotImplementedError('Model has no linear classification layer to take embeddings from')
+            self._classifier = linears[-1]
+        return self._classifier
+
+
+class TorchScriptBackend(InferenceBackend):
+    """
+    Serves a graph written by export_model.py
+
+    The exported graph takes float32 NHWC faces and already returns scores.
+    """
+
+    framework = 'torchscript'
+
+    def __init__(self, module, model_path=None, num_threads=0):
+        super().__init__(model_path)
+        self.module = module
+        if num_threads > 0:
+            import torch
+
+            torch.set_num_threads(num_threads)
+
+    @classmethod
+    def from_path(cls, model_path, num_threads=0):
+        import torch
+
+        module = torch.jit.load(str(model_path), map_location=torch.device('cpu'))
+        return cls(module.eval(), model_path, num_threads)
+
+    def _forward(self, batch):
+        import torch
+
+        with torch.inference_mode():
+            predictions = self.module(torch.from_numpy(batch))
+        return predictions.cpu().numpy().astype(np.float32, copy=False).reshape(len(batch), -1)[:, 0]
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    Serves an ONNX graph written by export_model.py through ONNX Runtime
+
+    Args:
+        intra_op_threads: Threads used inside one operator (0 = ONNX Runtime default)
+        inter_op_threads: Threads used to run independent operators (0 = default)
+    """
+
+    framework = 'onnx'
+
+    def __init__(self, session, model_path=None):
+        super().__init__(model_path)
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    @classmethod
+    def from_path(cls, model_path, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        return cls(session, model_path)
+
+    def _forward(self, batch):
+        outputs = self.session.run(None, {self.input_name: batch})
+        return np.asarray(outputs[0], dtype=np.float32).reshape(len(batch), -1)[:, 0]
+
+
+class DummyBackend(InferenceBackend):
+    """
+    Stand-in used when no model could be loaded
+
+    Runs the same preprocessing as the real backends and returns the mean
+    brightness of each crop as its score, so load tests without weights still
+    exercise the full request path.
+    """
+
+    framework = 'dummy'
+    supports_embeddings = True
+
+    def _forward(self, batch):
+        return batch.mean(axis=(1, 2, 3), dtype=np.float32)
+
+    def _forward_with_embeddings(self, batch):
+        # Rata-rata per channel sebagai embedding
+        return self._forward(batch), batch.mean(axis=(1, 2), dtype=np.float32)
+
+
+class ProcessLocalBackend(InferenceBackend):
+    """
+    Loads the wrapped backend on first use, once in every process
+
+    TensorFlow and ONNX Runtime start their thread pools while loading a
+    model, and those threads do not survive a fork. In a preloaded gunicorn
+    master such backends are therefore only created inside each worker.
+    """
+
+    def __init__(self, factory, framework, model_path=None):
+        super().__init__(model_path)
+        self.factory = factory
+        self.framework = framework
+        self._backend = None
+        self._backend_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def supports_embeddings(self):
+        return self.framework == 'keras'
+
+    def _forward(self, batch):
+        return self._get_backend()._forward(batch)
+
+    def _forward_with_embeddings(self, batch):
+        return self._get_backend()._forward_with_embeddings(batch)
+
+    def _get_backend(self):
+        with self._lock:
+            if self._backend is None or self._backend_pid != os.getpid():
+                self._backend = self.factory()
+                self._backend_pid = os.getpid()
+            return self._backend
+
+
+def load_backend(model_path, intra_op_threads=0, inter_op_threads=0, mmap=False, fork_safe=False, strict=False):
+    """
+    Load the model file into the matching backend
+
+    The backend is chosen by file type: `.pth` (pickled PyTorch), `.onnx`
+    (ONNX Runtime), `.pt` (TorchScript), anything else is loaded with Keras.
+    Falls back to DummyBackend when the file cannot be loaded, unless `strict`.
+
+    Args:
+        mmap: Memory-map the weights of `.pth` models
+        fork_safe: The caller forks worker processes after loading (gunicorn
+            preload_app); Keras and ONNX Runtime models are then loaded in
+            each worker instead of in this process
+        strict: Raise when the model cannot be loaded instead of serving dummy
+            scores (offline tools whose results would be meaningless)
+    """
+    framework = _determine_framework(model_path)
+    if fork_safe and not strict and framework in ('keras', 'onnx'):
+        if not Path(model_path).exists():
+            print(f"❌ Model file not found: {model_path}")
+            print(f"⚠️ Running without model (will return dummy predictions)")
+            return DummyBackend(model_path)
+        print(f"Model {model_path} ({framework}) will be loaded in each worker process")
+        return ProcessLocalBackend(
+            lambda: load_backend(model_path, intra_op_threads, inter_op_threads),
+            framework,
+            model_path
+        )
+
+    print(f"Loading model from: {model_path}")
+    try:
+        if framework == 'pytorch':
+            backend = PyTorchBackend.from_path(model_path, intra_op_threads, mmap)
+        elif framework == 'onnx':
+            backend = OnnxRuntimeBackend.from_path(model_path, intra_op_threads, inter_op_threads)
+        elif framework == 'torchscript':
+            backend = TorchScriptBackend.from_path(model_path, intra_op_threads)
+        else:
+            backend = KerasBackend.from_path(model_path)
+        print(f"✅ Model loaded successfully ({backend.framework})")
+        return backend
+    except Exception as e:
+        if strict:
+            raise
+        print(f"❌ Error loading model: {e}")
+        print(f"⚠️ Running without model (will return dummy predictions)")
+        return DummyBackend(model_path)
@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.utils.metrics import INFERENCE_BATCH_SIZE, INFERENCE_QUEUE_SECONDS, STAGE_SECONDS, current_timer
+
+
+class _Request:
+    """Face crops submitted by one caller, possibly split over several batches"""
+
+    def __init__(self, faces, with_embeddings=False, timer=None):
+        self.faces = faces
+        self.scores = np.empty(len(faces), dtype=np.float32)
+        self.with_embeddings = with_embeddings
+        self.embeddings = None  # Dialokasikan saat batch pertama kembali
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.offset = 0      # Crop pertama yang belum masuk batch
+        self.pending = len(faces)  # Crop yang skornya belum kembali
+        # Worker tidak punya context request, jadi timer request dibawa di sini
+        self.timer = timer
+        self.infer_seconds = 0.0  # Bagian waktu forward pass milik crop request ini
+
+
+class InferenceScheduler:
+    def __init__(self, backend, max_batch_size=32, max_wait_ms=5, metrics_window=256, tta=None, tta_mode='off'):
+        """
+        Shared micro-batching scheduler in front of the classifier
+
+        Crops submitted by concurrent requests are collected into one batch until
+        either `max_batch_size` crops are waiting or the oldest crop has waited
+        `max_wait_ms`. Large submissions (e.g. a whole video) are split, so they
+        never hold the model for longer than one batch.
+
+        Args:
+            backend: InferenceBackend that scores the batches
+            max_batch_size: Maximum number of crops per forward pass
+            max_wait_ms: Maximum time a crop waits for the batch to fill up
+            metrics_window: Number of recent batches kept for get_stats()
+            tta: TestTimeAugmentation used by submissions with TTA (None disables TTA)
+            tta_mode: Default TTA mode of submit(): 'off', 'on' or 'borderline'
+        """
+        self.backend = backend
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.tta = tta
+        self.tta_mode = tta_mode if tta is not None else 'off'
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._stopped = False
+
+        self._recent_batches = deque(maxlen=metrics_window)
+        self._total_batches = 0
+        self._total_faces = 0
+
+    def submit(self, faces, tta=None, embeddings=False):
+        """
+        Queue face crops for scoring
+
+        Args:
+            faces: uint8 array (N, H, W, C) in RGB, or a list of such crops
+            tta: 'off', 'on' (score every crop with the TTA views and average)
+                or 'borderline' (only re-score crops whose score is close to
+                0.5); None uses the scheduler's tta_mode
+            embeddings: Also return the penultimate-layer embeddings of the
+                crops (needs backend.supports_embeddings); with TTA the scores
+                are averaged over the views as usual and the embeddings are
+                those of the original crops
+
+        Returns:
+            Future resolving to a float32 array of N scores (probability of
+            real), or to (scores, embeddings (N, D)) with `embeddings`
+        """
+        faces = np.asarray(faces)
+        # Re-score borderline dikirim dari callback di worker, jadi timer diambil sekarang
+        timer = current_timer()
+        mode = (tta or self.tta_mode) if self.tta is not None else 'off'
+        if mode == 'on' and len(faces):
+            # Semua view satu request masuk antrian bersama, jadi ikut satu batch
+            if embeddings:
+                # View asli ada di baris pertama; embedding-nya yang dipakai temporal head
+                return self._then(
+                    self._submit(self.tta.expand(faces), with_embeddings=True, timer=timer),
+                    lambda result: (self.tta.merge(result[0], len(faces)), result[1][:len(faces)])
+                )
+            return self._then(self._submit(self.tta.expand(faces), timer=timer), lambda scores: self.tta.merge(scores, len(faces)))
+        if mode == 'borderline' and len(faces):
+            if embeddings:
+                # View tambahan hanya mengubah skor, embedding tetap dari crop asli
+                def rescore(result):
+                    scores, face_embeddings = result
+                    rescored = self._rescore_borderline(faces, scores, timer)
+                    if isinstance(rescored, Future):
+                        return self._then(rescored, lambda merged: (merged, face_embeddings))
+                    return rescored, face_embeddings
+
+                return self._then(self._submit(faces, with_embeddings=True, timer=timer), rescore)
+            return self._then(self._submit(faces, timer=timer), lambda scores: self._rescore_borderline(faces, scores, timer))
+        return self._submit(faces, with_embeddings=embeddings, timer=timer)
+
+    def _rescore_borderline(self, faces, scores, timer=None):
+        """`scores`, or a Future of them with the borderline crops re-scored with the TTA views"""
+        borderline = self.tta.borderline(scores)
+        if len(borderline) == 0:
+            return scores
+
+        def merge(view_scores):
+            # Skor crop asli sudah ada, hanya view tambahan yang dinilai
+            scores[borderline] = self.tta.merge(view_scores, len(borderline), original=scores[borderline])
+            return scores
+
+        return self._then(self._submit(self.tta.expand(faces[borderline], include_original=False), timer=timer), merge)
+
+    @staticmethod
+    def _then(future, fn):
+        """
+        Future of fn(result of `future`); when fn returns a Future, its result
+
+        Callbacks run on the worker thread, which never holds the queue lock
+        while resolving futures, so fn may submit more crops.
+        """
+        outer = Future()
+
+        def forward(inner, transform):
+            try:
+                result = transform(inner.result())
+            except Exception as e:
+                outer.set_exception(e)
+                return
+            if isinstance(result, Future):
+                result.add_done_callback(lambda chained: forward(chained, lambda value: value))
+            else:
+                outer.set_result(result)
+
+        future.add_done_callback(lambda inner: forward(inner, fn))
+        return outer
+
+    def _submit(self, faces, with_embeddings=False, timer=None):
+        request = _Request(faces, with_embeddings, timer)
+
+        if len(faces) == 0:
+            request.future.set_result(self._result(request))
+            return request.future
+
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError('Inference scheduler has been shut down')
+            self._ensure_worker()
+            self._queue.append(request)
+            self._cond.notify()
+
+        return request.future
+
+    def predict(self, faces, timeout=None, tta=None):
+        """Blocking version of submit()"""
+        return self.submit(faces, tta).result(timeout=timeout)
+
+    @staticmethod
+    def _result(request):
+        if not request.with_embeddings:
+            return request.scores
+        if request.embeddings is None:
+            request.embeddings = np.empty((len(request.faces), 0), dtype=np.float32)
+        return request.scores, request.embeddings
+
+    def shutdown(self):
+        """Stop the worker thread after the queued crops are scored"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def get_stats(self):
+        """Per-batch occupancy and queueing delay of recent batches"""
+        with self._cond:
+            batches = list(self._recent_batches)
+            queued = sum(len(r.faces) - r.offset for r in self._queue)
+            total_batches = self._total_batches
+            total_faces = self._total_faces
+
+        stats = {
+            'backend': self.backend.framework,
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait * 1000.0,
+            'batchesTotal': total_batches,
+            'facesTotal': total_faces,
+            'facesQueued': queued,
+            'recentBatches': len(batches),
+        }
+
+        if batches:
+            sizes = np.array([b['size'] for b in batches], dtype=np.float64)
+            delays = np.array([b['maxQueueDelayMs'] for b in batches], dtype=np.float64)
+            infer = np.array([b['inferenceMs'] for b in batches], dtype=np.float64)
+            stats.update({
+                'avgBatchSize': float(sizes.mean()),
+                'avgOccupancy': float(sizes.mean() / self.max_batch_size),
+                'avgQueueDelayMs': float(np.mean([b['avgQueueDelayMs'] for b in batches])),
+                'p95QueueDelayMs': float(np.percentile(delays, 95)),
+                'avgInferenceMs': float(infer.mean()),
+                'lastBatch': batches[-1],
+            })
+
+        return stats
+
+    def _ensure_worker(self):
+        # Thread tidak ikut ter-fork, jadi start ulang di proses anak
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._worker_pid = os.getpid()
+        self._worker.start()
+
+    def _collect_batch(self):
+        """Wait for crops and take up to max_batch_size of them from the queue"""
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+
+            if not self._queue:
+                return None
+
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while True:
+                queued = sum(len(r.faces) - r.offset for r in self._queue)
+                remaining = deadline - time.perf_counter()
+                if queued >= self.max_batch_size or remaining <= 0 or self._stopped:
+                    break
+                self._cond.wait(remaining)
+
+            pieces = []
+            capacity = self.max_batch_size
+            while self._queue and capacity > 0:
+                request = self._queue[0]
+                count = min(len(request.faces) - request.offset, capacity)
+                pieces.append((request, request.offset, count))
+                request.offset += count
+                capacity -= count
+                if request.offset == len(request.faces):
+                    self._queue.popleft()
+
+            return pieces
+
+    def _run(self):
+        while True:
+            pieces = self._collect_batch()
+            if pieces is None:
+                return
+
+            started = time.perf_counter()
+            delays = [(started - request.enqueued_at) * 1000.0 for request, _, _ in pieces]
+
+            try:
+                if len(pieces) == 1:
+                    request, start, count = pieces[0]
+                    batch = request.faces[start:start + count]
+                else:
+                    batch = np.concatenate([r.faces[s:s + c] for r, s, c in pieces])
+                embeddings = None
+                # Embedding keluar dari forward pass yang sama, tanpa biaya tambahan
+                if any(request.with_embeddings for request, _, _ in pieces):
+                    scores, embeddings = self.backend.predict_batch_with_embeddings(batch)
+                else:
+                    scores = self.backend.predict_batch(batch)
+            except Exception as e:
+                for request, _, _ in pieces:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            inference_ms = (time.perf_counter() - started) * 1000.0
+            STAGE_SECONDS.observe(inference_ms / 1000.0, stage='infer')
+            INFERENCE_BATCH_SIZE.observe(len(batch))
+            for delay in delays:
+                INFERENCE_QUEUE_SECONDS.observe(delay / 1000.0)
+
+            cursor = 0
+            for request, start, count in pieces:
+                request.scores[start:start + count] = scores[cursor:cursor + count]
+                if request.with_embeddings:
+                    if request.embeddings is None:
+                        request.embeddings = np.empty((len(request.faces), embeddings.shape[1]), dtype=np.float32)
+                    request.embeddings[start:start + count] = embeddings[cursor:cursor + count]
+                cursor += count
+                # Waktu batch dibagi ke request sebanding jumlah crop-nya
+                request.infer_seconds += inference_ms / 1000.0 * count / len(batch)
+                request.pending -= count
+                if request.pending == 0 and not request.future.done():
+                    if request.timer is not None:
+                        request.timer.add('infer', request.infer_seconds)
+                    request.future.set_result(self._result(request))
+
+            with self._cond:
+                self._total_batches += 1
+                self._total_faces += len(batch)
+                self._recent_batches.append({
+                    'size': len(batch),
+                    'occupancy': len(batch) / self.max_batch_size,
+                    'requests': len(pieces),
+                    'avgQueueDelayMs': float(np.mean(delays)),
+                    'maxQueueDelayMs': float(np.max(delays)),
+                    'inferenceMs': inference_ms,
+                })
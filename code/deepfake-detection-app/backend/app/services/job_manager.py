@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Progress ditulis ke state_dir paling sering sekali per interval ini (detik)
+PROGRESS_PERSIST_INTERVAL = 1.0
+
+
+class Job:
+    """State of one asynchronous analysis"""
+
+    def __init__(self, filename, kind):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.kind = kind
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._on_progress = None
+
+    def set_progress(self, **counts):
+        """Update progress counters (e.g. framesDecoded, facesFound, batchesScored)"""
+        with self._lock:
+            self.progress.update(counts)
+        if self._on_progress is not None:
+            self._on_progress(self)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'jobId': self.id,
+                'filename': self.filename,
+                'type': self.kind,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'result': self.result,
+                'error': self.error,
+                'createdAt': self.created_at,
+                'startedAt': self.started_at,
+                'finishedAt': self.finished_at,
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers=2, max_queue=16, result_ttl=3600, state_dir=None):
+        """
+        Run analyses in a bounded background worker pool
+
+        Workers are threads, so they share the loaded model and the
+        InferenceScheduler of this process instead of loading their own copy.
+
+        Args:
+            max_workers: Number of jobs processed at the same time
+            max_queue: Number of jobs allowed to wait; submit() refuses more
+            result_ttl: Seconds a finished job stays available
+            state_dir: Optional folder where job state is mirrored as JSON, so
+                any gunicorn worker can answer a status request. Status
+                changes are written immediately, progress at most once per
+                PROGRESS_PERSIST_INTERVAL; files of expired jobs are deleted
+                (also those left by earlier runs, at startup)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.result_ttl = result_ttl
+        self.state_dir = Path(state_dir) if state_dir else None
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._active = 0
+        self._lock = threading.Lock()
+        # Waktu tulis progress terakhir per job
+        self._persisted_at = {}
+        # Snapshot dan penulisan berurutan, tulisan progress lama tidak menimpa status akhir
+        self._persist_lock = threading.Lock()
+
+        if self.state_dir:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            self._sweep_state_dir()
+
+    def submit(self, fn, filename, kind):
+        """
+        Queue `fn(job)` as a new job; its return value becomes the job result
+
+        Returns:
+            The Job, or None when the queue is full (caller should answer 429)
+        """
+        with self._lock:
+            self._purge_expired()
+            if self._active >= self.max_workers + self.max_queue:
+                return None
+            self._active += 1
+            job = Job(filename, kind)
+            job._on_progress = self._persist_progress
+            self._jobs[job.id] = job
+
+        self._persist(job)
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def create_finished(self, filename, kind, result):
+        """Register a job that is already done (e.g. answered from the result cache)"""
+        job = Job(filename, kind)
+        job.status = 'done'
+        job.result = result
+        job.started_at = job.finished_at = job.created_at
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+        self._persist(job)
+        return job
+
+    def get(self, job_id):
+        """Return the job state as a dict, or None if unknown/expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._load(job_id)
+
+    def get_stats(self):
+        with self._lock:
+            active = self._active
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'maxWorkers': self.max_workers,
+            'maxQueue': self.max_queue,
+            'running': statuses.count('running'),
+            'queued': statuses.count('queued'),
+            'active': active,
+        }
+
+    def _run(self, job, fn):
+        with job._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+        self._persist(job)
+
+        try:
+            result = fn(job)
+            with job._lock:
+                job.result = result
+                job.status = 'done'
+        except Exception as e:
+            with job._lock:
+                job.error = str(e)
+                job.status = 'failed'
+        finally:
+            with job._lock:
+                job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+                self._persisted_at.pop(job.id, None)
+            self._persist(job)
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._persisted_at.pop(job_id, None)
+            self._delete_state(job_id)
+
+    def _sweep_state_dir(self):
+        # File dari run sebelumnya (atau worker lain) yang sudah kedaluwarsa;
+        # job yang belum selesai tapi lama tidak ditulis dianggap ditinggal proses yang mati
+        now = time.time()
+        removed = 0
+        for path in self.state_dir.iterdir():
+            try:
+                if path.suffix == '.tmp':
+                    stale = now - path.stat().st_mtime > self.result_ttl
+                elif path.suffix == '.json':
+                    state = json.loads(path.read_text())
+                    finished_at = state.get('finishedAt') or path.stat().st_mtime
+                    stale = now - finished_at > self.result_ttl
+                else:
+                    continue
+            except ValueError:
+                stale = True
+            except OSError:
+                continue
+            if stale:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            print(f"Removed {removed} expired job state files from {self.state_dir}")
+
+    def _delete_state(self, job_id):
+        if self.state_dir is not None:
+            (self.state_dir / f"{job_id}.json").unlink(missing_ok=True)
+
+    def _persist_progress(self, job):
+        if self.state_dir is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._persisted_at.get(job.id, float('-inf')) < PROGRESS_PERSIST_INTERVAL:
+                return
+            self._persisted_at[job.id] = now
+        self._persist(job)
+
+    def _persist(self, job):
+        if self.state_dir is None:
+            return
+        path = self.state_dir / f"{job.id}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with self._persist_lock:
+                tmp_path.write_text(json.dumps(job.to_dict()))
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing job state: {e}")
+
+    def _load(self, job_id):
+        if self.state_dir is None or not job_id.isalnum():
+            return None
+        path = self.state_dir / f"{job_id}.json"
+        try:
+            state = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get('finishedAt') and time.time() - state['finishedAt'] > self.result_ttl:
+            path.unlink(missing_ok=True)
+            return None
+        return state
@@ -0,0 +1,142 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _head_class():
+    # torch baru di-import saat head dipakai, deployment Keras/ONNX tidak memuatnya
+    import torch
+    from torch import nn
+
+    class TemporalHead(nn.Module):
+        def __init__(self, embedding_dim, hidden_dim=128, kernel_size=3, dropout=0.1):
+            """
+            Lightweight video classifier over a sequence of face embeddings
+
+            The backbone embeddings of the sampled faces (in frame order) are
+            projected to `hidden_dim`, mixed over time by a residual 1D
+            convolution and pooled with learned attention. Besides the weighted
+            mean, the weighted standard deviation over time is pooled as well:
+            it captures how much the face changes between frames, the temporal
+            inconsistency that a mean of per-frame probabilities ignores.
+
+            Args:
+                embedding_dim: Size of the backbone embeddings
+                hidden_dim: Size of the projected features
+                kernel_size: Frames seen by the temporal convolution
+                dropout: Dropout on the projected features (training only)
+            """
+            super().__init__()
+            self.config = {
+                'embedding_dim': embedding_dim,
+                'hidden_dim': hidden_dim,
+                'kernel_size': kernel_size,
+                'dropout': dropout,
+            }
+            self.project = nn.Sequential(
+                nn.LayerNorm(embedding_dim),
+                nn.Linear(embedding_dim, hidden_dim),
+                nn.GELU(),
+                nn.Dropout(dropout),
+            )
+            self.temporal = nn.Conv1d(hidden_dim, hidden_dim, kernel_size, padding=kernel_size // 2)
+            self.attention = nn.Linear(hidden_dim, 1)
+            self.classifier = nn.Linear(2 * hidden_dim, 1)
+
+        def forward(self, embeddings, mask=None):
+            """
+            Args:
+                embeddings: float tensor (B, T, D)
+                mask: Optional bool tensor (B, T), False for padding
+
+            Returns:
+                (logits (B,), attention weights (B, T)); sigmoid(logits) is the
+                probability that the video is real, like the backbone scores
+            """
+            features = self.project(embeddings)
+            if mask is not None:
+                # Padding tidak boleh ikut masuk ke konvolusi
+                features = features * mask[..., None]
+            features = features + torch.relu(self.temporal(features.transpose(1, 2))).transpose(1, 2)
+
+            attention = self.attention(features).squeeze(-1)
+            if mask is not None:
+                attention = attention.masked_fill(~mask, float('-inf'))
+            weights = torch.softmax(attention, dim=1)
+
+            mean = torch.einsum('bt,btd->bd', weights, features)
+            variance = torch.einsum('bt,btd->bd', weights, (features - mean[:, None]) ** 2)
+            pooled = torch.cat([mean, torch.sqrt(variance + 1e-6)], dim=1)
+            return self.classifier(pooled).squeeze(-1), weights
+
+    return TemporalHead
+
+
+def __getattr__(name):
+    # `from app.services.temporal_head import TemporalHead` tetap bisa dipakai (train_temporal_head.py)
+    if name == 'TemporalHead':
+        return _head_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def save_head(head, path, backbone=None):
+    """Save a TemporalHead with its config and the identity of the backbone it was trained on"""
+    import torch
+    torch.save({'config': head.config, 'state_dict': head.state_dict(), 'backbone': backbone}, path)
+
+
+class TemporalHeadScorer:
+    def __init__(self, head, path=None, backbone=None):
+        """Serve a trained TemporalHead: one sequence of face embeddings per call"""
+        self.head = head.eval()
+        self.path = path
+        self.backbone = backbone
+        # Head sangat kecil; satu lock cukup untuk semua thread request
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, backbone=None):
+        """
+        Load a head saved by save_head() (see train_temporal_head.py)
+
+        Args:
+            path: Checkpoint path
+            backbone: Identity of the served backbone (InferenceBackend.identity);
+                a warning is printed when the head was trained on the embeddings
+                of another model or of other weights
+        """
+        import torch
+        checkpoint = torch.load(path, map_location='cpu', weights_only=True)
+        head = _head_class()(**checkpoint['config'])
+        head.load_state_dict(checkpoint['state_dict'])
+
+        trained_on = checkpoint.get('backbone')
+        if backbone is not None and trained_on is not None and trained_on != backbone:
+            print(f"Warning: temporal head {path} was trained on {trained_on}, serving {backbone}")
+        return cls(head, path, trained_on)
+
+    @property
+    def identity(self):
+        """Head file and its version, for cache namespaces"""
+        try:
+            stat = Path(self.path).stat()
+            return f"{self.path}:{stat.st_size}:{int(stat.st_mtime)}"
+        except (TypeError, OSError):
+            return f"{self.path}:missing"
+
+    def score(self, embeddings):
+        """
+        Probability that a face sequence is real
+
+        Args:
+            embeddings: float array (T, D) in frame order
+        """
+        import torch
+        sequence = torch.from_numpy(np.ascontiguousarray(embeddings, dtype=np.float32))[None]
+        with self._lock, torch.inference_mode():
+            logits, _ = self.head(sequence)
+        return float(torch.sigmoid(logits)[0])
+
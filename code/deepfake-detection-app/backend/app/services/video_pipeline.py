@@ -0,0 +1,476 @@
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from app.services.face_tracker import FaceTracker
+from app.utils.metrics import observe_stage, stage
+
+# Penanda akhir stream di antrian
+_DONE = object()
+
+
+class VideoPipeline:
+    def __init__(self, face_detector, inference_scheduler, detection_batch_size=16, detection_workers=2,
+                 queue_depth=4, tracking=False, redetect_interval=10, min_tracking_confidence=0.5,
+                 max_tracking_gap=5, multi_face=False, max_faces=5):
+        """
+        Decode -> detect -> classify pipeline for one video at a time
+
+        The three stages run concurrently and are connected by bounded queues:
+
+        - a decoder thread converts sampled frames to RGB and groups them in
+          chunks of `detection_batch_size`
+        - `detection_workers` threads detect, crop and resize the faces of a
+          chunk with one detector call
+        - the calling thread packs crops into fixed-size batches of the
+          scheduler's `max_batch_size` and submits them as soon as they fill up
+
+        At most `queue_depth` items wait between two stages and at most
+        `queue_depth` inference batches are in flight, so peak memory depends
+        on these settings and not on the length of the video. Only the scores
+        are kept.
+
+        In tracking mode a single detector worker is used, because the tracker
+        has to see the frames in order. Multi-face mode keeps every face above
+        the detector threshold (up to `max_faces` per frame) and always runs
+        full detection, so it disables tracking.
+
+        Args:
+            face_detector: FaceDetector instance
+            inference_scheduler: InferenceScheduler scoring the crops
+            detection_batch_size: Frames per detector call
+            detection_workers: Number of detector threads
+            queue_depth: Capacity of each inter-stage queue
+            tracking: Detect on keyframes only and follow the face with FaceTracker
+            redetect_interval: Sampled frames between keyframes in tracking mode
+            min_tracking_confidence: Tracker confidence below which a frame is re-detected
+            max_tracking_gap: Largest frame distance between two sampled frames
+                that is still tracked; frames further apart are detected
+            multi_face: Score every detected face instead of the most confident one
+            max_faces: Maximum faces per frame in multi-face mode
+        """
+        self.face_detector = face_detector
+        self.inference_scheduler = inference_scheduler
+        self.detection_batch_size = max(1, detection_batch_size)
+        self.multi_face = multi_face
+        self.max_faces = max(1, max_faces)
+        self.tracking = tracking and not multi_face
+        self.detection_workers = 1 if self.tracking else max(1, detection_workers)
+        self.queue_depth = max(1, queue_depth)
+        self.redetect_interval = max(1, redetect_interval)
+        self.min_tracking_confidence = min_tracking_confidence
+        self.max_tracking_gap = max(1, max_tracking_gap)
+
+    def run(self, frames, progress=None, stop_rule=None, collect=None, tta=None, embeddings=False):
+        """
+        Run the pipeline over an iterable of (frame_idx, frame) pairs (BGR format)
+
+        Args:
+            frames: E.g. SequentialFrameSampler.iter_frames() or FFmpegFrameStream.iter_frames();
+                it is consumed (and closed) on the decoder thread
+            progress: Optional callable receiving framesDecoded, facesFound,
+                batchesScored and batchesTotal counts
+            stop_rule: Optional object whose update(scores) is called with every
+                scored batch (e.g. SequentialMeanTest). Decoding then runs at
+                most a few batches ahead of the scores and stops once it
+                returns True; faces already detected are still scored
+            collect: Optional callable receiving (frame_indices, boxes, crops) for
+                every detected chunk, from the detector threads (e.g. to fill a CropStore)
+            tta: Test-time augmentation mode passed to the scheduler
+            embeddings: Also keep the backbone embedding of every scored face
+                (needs a backend with supports_embeddings; with TTA, of the original crop)
+
+        Returns:
+            (predictions, frames_extracted, stats, faces) where
+            frames_extracted counts the frames that went through detection
+            (after an early exit, decoded frames that were not detected are
+            left out), stats holds
+            detectionsRun, detectionsSkipped and earlyExit, and faces is
+            (frame_indices, boxes, embeddings) of the scored faces, aligned with
+            predictions (boxes as float array (N, 5) of x, y, w, h, confidence;
+            embeddings as float32 array (N, D), or None without `embeddings`)
+        """
+        return _PipelineRun(self, frames, progress, stop_rule, collect, tta, embeddings).execute()
+
+    def new_tracking_state(self):
+        """Tracker state for detect_chunk() over one video, None when tracking is off"""
+        if not self.tracking:
+            return None
+        return {'tracker': FaceTracker(), 'framesSinceDetection': 0, 'previousFrame': None}
+
+    def detect_chunk(self, frames, detection_stats, tracking_state=None, frame_indices=None):
+        """
+        Detect, crop and resize the faces of a chunk of RGB frames
+
+        `frame_indices` (video frame number of every frame) decides which
+        frames are close enough to be tracked; None means consecutive frames.
+
+        Returns:
+            (positions, boxes, crops): position in the chunk and
+            (x, y, w, h, confidence) of every face, and the preprocessed crops
+            as one uint8 array (N, H, W, 3)
+        """
+        if tracking_state is not None:
+            if frame_indices is None:
+                frame_indices = range(len(frames))
+            positions, boxes = self._detect_tracked(frames, frame_indices, detection_stats, tracking_state)
+        else:
+            if self.multi_face:
+                detections = self.face_detector.detect_batch_all(frames, self.max_faces)
+            else:
+                detections = [[] if box is None else [box] for box in self.face_detector.detect_batch(frames)]
+            positions = [position for position, faces in enumerate(detections) for _ in faces]
+            boxes = [box for faces in detections for box in faces]
+            detection_stats['detectionsRun'] += len(frames)
+
+        # Semua crop chunk ini langsung di-resize ke satu buffer batch
+        crops, kept = self.face_detector.crop_faces([frames[position] for position in positions], boxes)
+        return [positions[i] for i in kept], [boxes[i] for i in kept], crops
+
+    def _detect_tracked(self, frames, frame_indices, detection_stats, state):
+        """
+        Detect-then-track over a chunk of frames; `state` carries the tracker between chunks
+
+        Optical flow assumes small motion, so a frame is only tracked when it
+        is at most `max_tracking_gap` frames after the previous one; frames
+        sampled further apart (e.g. FRAMES_PER_VIDEO spread over a long video)
+        are all keyframes. The keyframes of a chunk are detected in one
+        batched call; a frame whose track is lost is detected on its own.
+
+        Returns:
+            (positions, boxes) of the faces found
+        """
+        # Jadwal keyframe: tiap redetect_interval frame, atau bila jarak antar frame terlalu jauh
+        keyframes = []
+        since = state['framesSinceDetection']
+        previous = state['previousFrame']
+        for position, frame_idx in enumerate(frame_indices):
+            if previous is None or frame_idx - previous > self.max_tracking_gap or since >= self.redetect_interval:
+                keyframes.append(position)
+                since = 0
+            else:
+                since += 1
+            previous = frame_idx
+        state['framesSinceDetection'] = since
+        state['previousFrame'] = previous
+
+        detected = {}
+        if keyframes:
+            detected = dict(zip(keyframes, self.face_detector.detect_batch([frames[position] for position in keyframes])))
+            detection_stats['detectionsRun'] += len(keyframes)
+
+        positions, boxes = [], []
+        tracker = state['tracker']
+        for position, frame_rgb in enumerate(frames):
+            if position in detected:
+                box = detected[position]
+            else:
+                if tracker.active:
+                    box, confidence = tracker.update(frame_rgb)
+                    if box is not None and confidence >= self.min_tracking_confidence:
+                        detection_stats['detectionsSkipped'] += 1
+                        positions.append(position)
+                        boxes.append((*box[:4], confidence))
+                        continue
+
+                # Tracking hilang: deteksi penuh untuk frame ini saja
+                box = self.face_detector.detect_batch([frame_rgb])[0]
+                detection_stats['detectionsRun'] += 1
+
+            # Keyframe: mulai tracking ulang dari box hasil deteksi
+            tracker.reset()
+            if box is not None:
+                tracker.start(frame_rgb, box)
+                positions.append(position)
+                boxes.append(box)
+
+        return positions, boxes
+
+
+class _PipelineRun:
+    """Queues, threads and counters of one VideoPipeline.run() call"""
+
+    def __init__(self, pipeline, frames, progress, stop_rule=None, collect=None, tta=None, embeddings=False):
+        self.pipeline = pipeline
+        self.frames = frames
+        self.progress = progress
+        self.stop_rule = stop_rule
+        self.collect = collect
+        self.tta = tta
+        self.embeddings = embeddings
+        self.early_exit = False
+
+        scheduler_batch = pipeline.inference_scheduler.max_batch_size
+        self.batch_size = scheduler_batch
+        self.chunk_size = pipeline.detection_batch_size
+        self.lookahead = None
+        if stop_rule is not None:
+            # Early exit butuh skor secepatnya: batch dikirim begitu cukup wajah
+            # untuk satu keputusan, tidak menunggu batch penuh
+            self.batch_size = max(1, min(scheduler_batch, getattr(stop_rule, 'min_samples', scheduler_batch)))
+            self.chunk_size = min(self.chunk_size, self.batch_size)
+            # Decode hanya boleh mendahului skor sejauh dua batch
+            self.lookahead = 2 * self.batch_size
+
+        self.frame_queue = queue.Queue(maxsize=pipeline.queue_depth)
+        self.crop_queue = queue.Queue(maxsize=pipeline.queue_depth)
+        # stop: batalkan semua stage (error); exhausted: early exit, tidak ada frame baru
+        self.stop = threading.Event()
+        self.exhausted = threading.Event()
+        self.errors = []
+        self.lock = threading.Lock()
+        # Frame yang sudah selesai (skor wajahnya kembali, atau tanpa wajah), untuk lookahead decode
+        self.settled = threading.Condition()
+        self.frames_settled = 0
+
+        self.frames_decoded = 0
+        self.frames_detected = 0
+        self.faces_found = 0
+        # Frame dan box tiap crop, dalam urutan crop masuk ke batch
+        self.face_frames = []
+        self.face_boxes = []
+        self.face_embeddings = []
+        self.detection_stats = {'detectionsRun': 0, 'detectionsSkipped': 0}
+
+    def execute(self):
+        # Tiap thread membawa salinan context supaya waktu stage masuk ke timer request
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(self._decode,),
+                                    name='video-decode', daemon=True)]
+        threads += [
+            threading.Thread(target=contextvars.copy_context().run, args=(self._detect,),
+                             name=f"video-detect-{i}", daemon=True)
+            for i in range(self.pipeline.detection_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            predictions = self._classify()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            # Hentikan stage lain bila classifier berhenti lebih awal
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self.errors:
+            raise self.errors[0]
+        # Skor sejajar dengan urutan crop di antrian (dipotong hanya bila ada error)
+        faces = (
+            np.asarray(self.face_frames[:len(predictions)], dtype=np.int64),
+            np.asarray(self.face_boxes[:len(predictions)], dtype=np.float64).reshape(-1, 5),
+            self._embeddings(len(predictions)) if self.embeddings else None
+        )
+        return predictions, self.frames_detected, {**self.detection_stats, 'earlyExit': self.early_exit}, faces
+
+    def _embeddings(self, count):
+        if not self.face_embeddings:
+            return np.empty((count, 0), dtype=np.float32)
+        return np.concatenate(self.face_embeddings)[:count]
+
+    def _fail(self, error):
+        with self.lock:
+            self.errors.append(error)
+        self.stop.set()
+
+    def _report(self, **counts):
+        if self.progress is not None:
+            self.progress(**counts)
+
+    def _put(self, q, item):
+        """Blocking put that gives up when the run is stopped"""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """Blocking get that returns _DONE when the run is stopped"""
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _settle(self, frames):
+        with self.settled:
+            self.frames_settled += frames
+            self.settled.notify_all()
+
+    def _wait_for_scores(self):
+        """Block the decoder while it is `lookahead` frames ahead of the scores; False when stopped"""
+        with self.settled:
+            while self.frames_decoded - self.frames_settled >= self.lookahead:
+                if self.stop.is_set() or self.exhausted.is_set():
+                    return False
+                self.settled.wait(0.1)
+        return not (self.stop.is_set() or self.exhausted.is_set())
+
+    def _decode(self):
+        chunk = []
+        # Waktu decode per chunk, tanpa waktu menunggu antrian penuh
+        started = time.perf_counter()
+        try:
+            for frame_idx, frame in self.frames:
+                if self.stop.is_set() or self.exhausted.is_set():
+                    break
+                # Convert BGR to RGB
+                chunk.append((frame_idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+                self.frames_decoded += 1
+
+                if len(chunk) >= self.chunk_size:
+                    observe_stage('decode', time.perf_counter() - started)
+                    self._put(self.frame_queue, chunk)
+                    chunk = []
+                    self._report(framesDecoded=self.frames_decoded)
+                    if self.lookahead is not None and not self._wait_for_scores():
+                        break
+                    started = time.perf_counter()
+
+            observe_stage('decode', time.perf_counter() - started)
+            if chunk and not self.stop.is_set() and not self.exhausted.is_set():
+                self._put(self.frame_queue, chunk)
+            self._report(framesDecoded=self.frames_decoded)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            close = getattr(self.frames, 'close', None)
+            if close is not None:
+                close()
+            for _ in range(self.pipeline.detection_workers):
+                self._put(self.frame_queue, _DONE)
+
+    def _detect(self):
+        tracking_state = self.pipeline.new_tracking_state()
+        try:
+            while True:
+                chunk = self._get(self.frame_queue)
+                if chunk is _DONE:
+                    break
+                if self.exhausted.is_set():
+                    # Sudah diputuskan: frame yang masih antre tidak dideteksi
+                    continue
+
+                stats = {'detectionsRun': 0, 'detectionsSkipped': 0}
+                positions, boxes, crops = self.pipeline.detect_chunk(
+                    [frame for _, frame in chunk], stats, tracking_state, [frame_idx for frame_idx, _ in chunk]
+                )
+                frame_indices = [chunk[position][0] for position in positions]
+                if self.collect is not None and len(crops):
+                    self.collect(frame_indices, boxes, crops)
+                with self.lock:
+                    for key, value in stats.items():
+                        self.detection_stats[key] += value
+                    self.frames_detected += len(chunk)
+                    self.faces_found += len(crops)
+                    faces_found = self.faces_found
+                self._report(facesFound=faces_found)
+                # Frame tanpa wajah langsung selesai; frame berwajah setelah skornya kembali
+                self._settle(len(chunk) - len(set(positions)))
+
+                if len(crops):
+                    self._put(self.crop_queue, (crops, frame_indices, boxes))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.crop_queue, _DONE)
+
+    def _classify(self):
+        """Pack crops into fixed-size batches, keep up to queue_depth of them in flight"""
+        scheduler = self.pipeline.inference_scheduler
+        batch_size = self.batch_size
+        batch = None
+        filled = 0
+        in_flight = deque()
+        predictions = []
+        batches_submitted = 0
+        workers_done = 0
+
+        def collect():
+            with stage('infer_wait'):
+                scores = in_flight.popleft().result()
+            if self.embeddings:
+                scores, embeddings = scores
+                self.face_embeddings.append(embeddings)
+            predictions.append(scores)
+            self._report(batchesScored=len(predictions))
+            if self.stop_rule is not None and not self.early_exit and self.stop_rule.update(scores):
+                # Keputusan sudah pasti: tidak ada frame baru yang didecode atau dideteksi,
+                # wajah yang sudah dideteksi tetap dinilai
+                self.early_exit = True
+                self.exhausted.set()
+
+        def drain():
+            # Batch yang sudah selesai di depan antrian dinilai tanpa menunggu,
+            # supaya stop rule melihat skor selagi decode masih berjalan
+            while self.stop_rule is not None and in_flight and in_flight[0].done() and not self.early_exit:
+                collect()
+
+        def submit(faces):
+            nonlocal batches_submitted
+            if len(in_flight) >= self.pipeline.queue_depth:
+                collect()
+            future = scheduler.submit(faces, self.tta, self.embeddings)
+            if self.lookahead is not None:
+                future.add_done_callback(lambda _, count=len(faces): self._settle(count))
+            in_flight.append(future)
+            batches_submitted += 1
+            drain()
+
+        def next_item():
+            # Selagi menunggu crop, skor yang kembali tetap diperiksa oleh stop rule
+            while not self.stop.is_set():
+                try:
+                    return self.crop_queue.get(timeout=0.02 if self.stop_rule is not None and in_flight else 0.1)
+                except queue.Empty:
+                    drain()
+            return _DONE
+
+        while workers_done < self.pipeline.detection_workers:
+            item = next_item()
+            drain()
+            if item is _DONE:
+                if self.stop.is_set():
+                    break
+                workers_done += 1
+                continue
+            crops, frame_indices, boxes = item
+            self.face_frames.extend(frame_indices)
+            self.face_boxes.extend(boxes)
+
+            start = 0
+            while start < len(crops) and not self.stop.is_set():
+                if batch is None:
+                    batch = np.empty((batch_size,) + crops.shape[1:], dtype=crops.dtype)
+                    filled = 0
+                count = min(batch_size - filled, len(crops) - start)
+                batch[filled:filled + count] = crops[start:start + count]
+                filled += count
+                start += count
+
+                if filled == batch_size:
+                    submit(batch)
+                    batch = None
+
+        if self.errors:
+            return np.empty(0, dtype=np.float32)
+
+        if batch is not None and filled:
+            submit(batch[:filled])
+        self._report(batchesTotal=batches_submitted)
+        while in_flight:
+            collect()
+
+        if not predictions:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(predictions)
@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+import time
+from pathlib import Path
+
+from app.config import Config
+
+# Kolom hasil scan, sama untuk JSONL, CSV dan Parquet
+SCAN_COLUMNS = ['path', 'type', 'success', 'isFake', 'confidence', 'faces', 'error', 'seconds']
+
+# Processor milik proses worker, dibuat oleh init_worker
+_worker = {}
+
+
+def collect_files(paths, extensions):
+    """
+    Expand files and directory trees into a sorted list of scannable files
+
+    Args:
+        paths: Files or directories
+        extensions: Allowed lowercase extensions without dot
+    """
+    files = set()
+    for path in map(Path, paths):
+        candidates = path.rglob('*') if path.is_dir() else [path]
+        for candidate in candidates:
+            if candidate.is_file() and candidate.suffix.lower().lstrip('.') in extensions:
+                files.add(str(candidate))
+    return sorted(files)
+
+
+class ScanCheckpoint:
+    def __init__(self, path):
+        """
+        Append-only result file that makes a scan resumable
+
+        Rows are written as JSONL or CSV (chosen by the file suffix) and
+        flushed after every file, so a killed scan loses at most the files
+        that were in flight. A half-written last line is ignored on resume.
+        """
+        self.path = Path(path)
+        self.format = 'csv' if self.path.suffix.lower() == '.csv' else 'jsonl'
+        self._file = None
+        self._writer = None
+
+    def load(self):
+        """Return the rows already in the checkpoint"""
+        if not self.path.exists():
+            return []
+
+        rows = []
+        with open(self.path, newline='') as f:
+            if self.format == 'csv':
+                for row in csv.DictReader(f):
+                    if row.get('seconds'):
+                        rows.append(self._parse_csv_row(row))
+            else:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # Baris terakhir terpotong saat proses dimatikan
+                        continue
+        return rows
+
+    @staticmethod
+    def _parse_csv_row(row):
+        """CSV stores everything as text; restore the JSONL value types"""
+        parsed = {key: (value if value != '' else None) for key, value in row.items()}
+        for key in ('success', 'isFake'):
+            if parsed.get(key) is not None:
+                parsed[key] = parsed[key] == 'True'
+        for key, cast in (('confidence', float), ('seconds', float), ('faces', int)):
+            if parsed.get(key) is not None:
+                parsed[key] = cast(parsed[key])
+        return parsed
+
+    def completed_paths(self):
+        return {row['path'] for row in self.load()}
+
+    def append(self, row):
+        if self._file is None:
+            self._open()
+        if self.format == 'csv':
+            self._writer.writerow({key: row.get(key) for key in SCAN_COLUMNS})
+        else:
+            self._file.write(json.dumps({key: row.get(key) for key in SCAN_COLUMNS}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Buang sisa baris terpotong supaya baris baru tidak tersambung ke sana
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                if not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, 'a', newline='')
+        if self.format == 'csv':
+            self._writer = csv.DictWriter(self._file, fieldnames=SCAN_COLUMNS)
+            if is_new:
+                self._writer.writeheader()
+
+
+def write_parquet(rows, path):
+    """Write scan rows to Parquet (needs pandas with pyarrow or fastparquet)"""
+    import pandas as pd
+
+    pd.DataFrame(rows, columns=SCAN_COLUMNS).to_parquet(path, index=False)
+
+
+def init_worker(threads):
+    """
+    Build the detector and processors once per worker process
+
+    Raises when the model cannot be loaded: dummy verdicts would be written
+    to the checkpoint and never redone on resume.
+    """
+    from app.services.factory import build_services
+
+    # Paralelisme datang dari proses, jadi satu thread deteksi/decode per proses
+    services = build_services(Config, intra_op_threads=threads, detection_workers=1, decode_workers=1,
+                              result_cache=False, strict=True)
+    _worker['files'] = services.file_handler
+    _worker['image'] = services.image_processor
+    _worker['video'] = services.video_processor
+
+
+def scan_file(path):
+    """Analyze one file in a worker process and return its result row"""
+    started = time.perf_counter()
+    row = {'path': path, 'type': None, 'success': False, 'isFake': None, 'confidence': None, 'faces': 0, 'error': None}
+    try:
+        if _worker['files'].is_video(path):
+            result = _worker['video'].predict_video(path)
+            details = result.get('details') or {}
+            faces = details.get('facesAnalyzed') or round(details.get('faceDetected', 0.0) * details.get('framesExtracted', 0) / 100)
+        else:
+            result = _worker['image'].predict_image(path)
+            faces = 1 if result['success'] else 0
+        row.update({
+            'type': result['type'],
+            'success': result['success'],
+            'isFake': result['isFake'],
+            'confidence': round(result['confidence'], 2) if result['success'] else None,
+            'faces': faces if result['success'] else 0,
+            'error': result.get('error'),
+        })
+    except Exception as e:
+        row['error'] = str(e)
+    row['seconds'] = round(time.perf_counter() - started, 4)
+    return row
+
+
+def worker_threads(workers):
+    """Intra-op threads per worker process so the pool does not oversubscribe the cores"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
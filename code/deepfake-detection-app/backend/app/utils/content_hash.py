@@ -0,0 +1,31 @@
+import hashlib
+
+
+def new_content_hasher():
+    """Hash object for upload bytes; its hexdigest() is the content hash"""
+    return hashlib.sha256()
+
+
+def content_hash(stream, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a binary stream, read chunk by chunk, rewound afterwards
+
+    Uploads are hashed once; the result cache and the crop store derive
+    their keys from this hash (see derive_key) instead of re-reading the file.
+    """
+    digest = new_content_hasher()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """content_hash() of a file on disk"""
+    with open(path, 'rb') as f:
+        return content_hash(f, chunk_size)
+
+
+def derive_key(namespace, digest, kind=''):
+    """Key of a content hash within a namespace (and an optional kind, e.g. 'video')"""
+    return hashlib.sha256(f"{namespace}\0{kind}\0{digest}".encode('utf-8')).hexdigest()
@@ -0,0 +1,402 @@
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.content_hash import derive_key, file_content_hash
+
+# Chunk satu video (put_video) diberi prefix ini; hanya chunk ini yang dibatasi ukuran/umurnya
+VIDEO_CHUNK_PREFIX = 'video-'
+
+# Satu baris index per crop
+INDEX_DTYPE = np.dtype([
+    ('video_id', 'U64'),
+    ('frame_idx', np.int32),
+    ('box', np.int32, (4,)),
+    ('confidence', np.float32),
+    ('label', np.int8),
+    ('frames_total', np.int32),
+    ('frames_sampled', np.int32),
+])
+
+
+def make_index(video_id, frame_indices, boxes, confidences=None, label=-1, frames_total=-1, frames_sampled=-1):
+    """Index rows for the crops of one video (frame counts of the video are repeated per row)"""
+    index = np.zeros(len(frame_indices), dtype=INDEX_DTYPE)
+    index['video_id'] = video_id
+    index['frame_idx'] = frame_indices
+    index['box'] = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    index['confidence'] = 1.0 if confidences is None else confidences
+    index['label'] = label
+    index['frames_total'] = frames_total
+    index['frames_sampled'] = frames_sampled
+    return index
+
+
+class CropStore:
+    def __init__(self, root, namespace='', max_bytes=0, max_age=0, prune_interval=60):
+        """
+        On-disk store of face crops that can be memory-mapped
+
+        The store is a folder of chunks. A chunk is `<name>.npy` with uint8
+        (N, H, W, 3) RGB crops and `<name>.index.npy` with one INDEX_DTYPE row
+        per crop (video id, frame index, x/y/w/h box, detector confidence,
+        label: 1 real, 0 fake, -1 unknown, and the frame count and number of
+        sampled frames of the video); crops of one video are stored in
+        consecutive rows. Chunks are written atomically and never modified,
+        so several processes can share a store.
+
+        Video ids are keys of the content hash of the video and `namespace`
+        (see key_for_hash), which should describe everything that changes the
+        crops (frame sampling, detector and crop size). Crops are the
+        detector boxes (plus margin) resized to IMG_SIZE, exactly what the
+        served model scores; faces are not landmark-aligned, since not every
+        detector backend returns landmarks and the model was trained on box
+        crops.
+
+        The server stores every analyzed video as its own chunk (put_video),
+        found by its name. Videos of chunks written offline (CropStoreWriter,
+        see extract_crops.py) are found through a video id -> rows map that
+        is read once (load_offline_videos) and not rebuilt by put_video, so
+        a lookup never scans the store; offline chunks added later are seen
+        after refresh() or a restart. Only the per-video chunks are limited
+        by `max_bytes` and `max_age`; offline chunks are kept.
+
+        Args:
+            root: Store folder
+            namespace: String mixed into every video key
+            max_bytes: Maximum total size of the per-video chunks (0: no limit)
+            max_age: Seconds a per-video chunk is kept after its last use (0: no limit)
+            prune_interval: Minimum seconds between two prune() runs of put_video
+        """
+        self.root = Path(root)
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._chunks = {}
+        self._offline_videos = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def key_for_file(self, path, chunk_size=1024 * 1024):
+        """Video id of a file (hashes the file, see key_for_hash)"""
+        return self.key_for_hash(file_content_hash(path, chunk_size))
+
+    def key_for_hash(self, digest):
+        """Video id from the content hash of the video (see app.utils.content_hash)"""
+        return derive_key(self.namespace, digest)
+
+    def write_chunk(self, crops, index, name=None, refresh=True):
+        """
+        Write crops and their index rows as a new chunk
+
+        Args:
+            crops: uint8 array (N, H, W, 3)
+            index: INDEX_DTYPE array of N rows
+            name: Chunk name (default: random)
+            refresh: Rebuild the global index on its next use so the chunk shows up there
+
+        Returns:
+            Chunk name
+        """
+        crops = np.ascontiguousarray(crops, dtype=np.uint8)
+        index = np.asarray(index, dtype=INDEX_DTYPE)
+        if crops.ndim != 4 or len(crops) != len(index):
+            raise ValueError(f"Expected (N, H, W, 3) crops with N index rows, got {crops.shape} and {len(index)}")
+
+        name = name or uuid.uuid4().hex
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        # Index ditulis terakhir: chunk baru terlihat setelah datanya lengkap
+        for path, array in ((self._crops_path(name), crops), (self._index_path(name), index)):
+            tmp_path = path.with_name(path.name + suffix)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+
+        if refresh:
+            self.refresh()
+        return name
+
+    def put_video(self, video_id, crops, frame_indices, boxes, confidences=None, label=-1,
+                  frames_total=-1, frames_sampled=-1):
+        """Store the crops of one video as a chunk named after the video id"""
+        index = make_index(video_id, frame_indices, boxes, confidences, label, frames_total, frames_sampled)
+        # get_video menemukan chunk ini lewat namanya, index global tidak perlu dibangun ulang
+        name = self.write_chunk(crops, index, name=VIDEO_CHUNK_PREFIX + video_id, refresh=False)
+        if self.max_bytes or self.max_age:
+            now = time.time()
+            with self._lock:
+                due = now - self._last_prune >= self.prune_interval
+                if due:
+                    self._last_prune = now
+            if due:
+                self.prune()
+        return name
+
+    def get_video(self, video_id, indexed=True):
+        """
+        Crops of one video without decoding or copying
+
+        Args:
+            video_id: Video id (key_for_hash / key_for_file)
+            indexed: Also look in the chunks of CropStoreWriter (see
+                load_offline_videos); False only checks the chunk of put_video
+
+        Returns:
+            (crops, index) where crops is a read-only memory-mapped view, or
+            None when the video is not in the store
+        """
+        # Chunk satu video dicek langsung lewat namanya, tanpa disimpan di
+        # cache mmap karena jumlahnya terus bertambah
+        name = VIDEO_CHUNK_PREFIX + video_id
+        try:
+            index = np.load(self._index_path(name))
+            crops = np.load(self._crops_path(name), mmap_mode='r')
+        except FileNotFoundError:
+            # Belum ada, atau baru saja dihapus oleh prune()
+            pass
+        else:
+            if self.max_age:
+                # Umur dihitung sejak terakhir dipakai
+                try:
+                    os.utime(self._index_path(name))
+                except OSError:
+                    pass
+            return crops, index
+        if not indexed:
+            return None
+
+        location = self._offline().get(video_id)
+        if location is None:
+            return None
+        name, start, stop = location
+        try:
+            crops, index = self._chunk(name)
+        except FileNotFoundError:
+            return None
+        return crops[start:stop], index[start:stop]
+
+    def load_offline_videos(self):
+        """
+        Read the video id -> rows map of the offline chunks, if not read yet
+
+        Returns:
+            Number of videos in offline chunks
+        """
+        return len(self._offline())
+
+    def _offline(self):
+        with self._lock:
+            if self._offline_videos is None:
+                self._offline_videos = self._build_offline_videos()
+            return self._offline_videos
+
+    def prune(self):
+        """
+        Delete per-video chunks unused for more than max_age seconds, then the
+        least recently used ones until they fit in max_bytes
+
+        Returns:
+            Number of deleted chunks
+        """
+        chunks = []
+        for path in self.root.glob(f"{VIDEO_CHUNK_PREFIX}*.index.npy"):
+            name = path.name[:-len('.index.npy')]
+            try:
+                used_at = path.stat().st_mtime
+                size = path.stat().st_size + self._crops_path(name).stat().st_size
+            except OSError:
+                continue
+            chunks.append((used_at, size, name))
+        chunks.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in chunks)
+        deleted = 0
+        for used_at, size, name in chunks:
+            expired = self.max_age and now - used_at > self.max_age
+            if not expired and (not self.max_bytes or total <= self.max_bytes):
+                break
+            # Index dihapus dulu supaya chunk tidak terlihat setengah terhapus;
+            # memmap yang sedang dibaca tetap valid setelah unlink
+            self._index_path(name).unlink(missing_ok=True)
+            self._crops_path(name).unlink(missing_ok=True)
+            total -= size
+            deleted += 1
+        return deleted
+
+    def refresh(self):
+        """Forget the index so chunks written since (e.g. by another process) are seen"""
+        with self._lock:
+            self._index = None
+            self._offline_videos = None
+
+    @property
+    def index(self):
+        """
+        Index rows of all crops, with the chunk name and row of every crop
+
+        Returns:
+            (index, chunk_names, rows) aligned arrays
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            return self._index
+
+    def __len__(self):
+        return len(self.index[0])
+
+    def crop(self, i):
+        """Crop number `i` of the global index as a memory-mapped view"""
+        _, chunk_names, rows = self.index
+        return self._chunk(chunk_names[i])[0][rows[i]]
+
+    def crop_shapes(self, indices=None):
+        """
+        Crop shapes (H, W, 3) in the store, or among the crops of `indices`
+
+        Only the .npy headers are read (the chunks are memory-mapped).
+
+        Returns:
+            Dict shape -> sorted names of the chunks with that shape
+        """
+        _, chunk_names, _ = self.index
+        names = chunk_names if indices is None else chunk_names[np.asarray(indices, dtype=np.int64)]
+        shapes = {}
+        for name in np.unique(names) if len(names) else []:
+            shapes.setdefault(tuple(self._chunk(name)[0].shape[1:]), []).append(str(name))
+        return shapes
+
+    def crops(self, indices, out=None):
+        """
+        Copy several crops of the global index into one array
+
+        The crops are gathered chunk by chunk in row order, so a shuffled batch
+        turns into a few forward reads per memory-mapped chunk.
+
+        Args:
+            indices: Global crop numbers
+            out: Optional uint8 array (len(indices), H, W, 3) to fill, e.g. pinned memory
+
+        Returns:
+            uint8 array (len(indices), H, W, 3) in the order of `indices`
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        _, chunk_names, rows = self.index
+        names = chunk_names[indices]
+        for name in np.unique(names):
+            members = np.flatnonzero(names == name)
+            members = members[np.argsort(rows[indices[members]], kind='stable')]
+            chunk = self._chunk(name)[0]
+            if out is None:
+                out = np.empty((len(indices),) + chunk.shape[1:], dtype=np.uint8)
+            out[members] = chunk[rows[indices[members]]]
+        if out is None:
+            out = np.empty((0, 0, 0, 3), dtype=np.uint8)
+        return out
+
+    def _build_offline_videos(self):
+        videos = {}
+        for path in sorted(self.root.glob('*.index.npy')):
+            name = path.name[:-len('.index.npy')]
+            # Chunk per video sudah dicari lewat namanya (dan bisa dihapus prune)
+            if name.startswith(VIDEO_CHUNK_PREFIX):
+                continue
+            # Rentang baris per video (baris satu video berurutan)
+            ids, starts, counts = np.unique(np.load(path)['video_id'], return_index=True, return_counts=True)
+            for video_id, start, count in zip(ids, starts, counts):
+                videos[str(video_id)] = (name, int(start), int(start + count))
+        return videos
+
+    def _build_index(self):
+        indexes, chunk_names, rows = [], [], []
+        for path in sorted(self.root.glob('*.index.npy')):
+            name = path.name[:-len('.index.npy')]
+            index = np.load(path)
+            indexes.append(index)
+            chunk_names.append(np.full(len(index), name, dtype=object))
+            rows.append(np.arange(len(index)))
+
+        if not indexes:
+            return np.zeros(0, dtype=INDEX_DTYPE), np.zeros(0, dtype=object), np.zeros(0, dtype=np.int64)
+        return np.concatenate(indexes), np.concatenate(chunk_names), np.concatenate(rows)
+
+    def _chunk(self, name):
+        with self._lock:
+            chunk = self._chunks.get(name)
+            if chunk is None:
+                crops = np.load(self._crops_path(name), mmap_mode='r')
+                index = np.load(self._index_path(name))
+                chunk = self._chunks[name] = (crops, index)
+            return chunk
+
+    def _crops_path(self, name):
+        return self.root / f"{name}.npy"
+
+    def _index_path(self, name):
+        return self.root / f"{name}.index.npy"
+
+
+class CropStoreWriter:
+    def __init__(self, store, chunk_size=512):
+        """
+        Buffer crops of many videos and write them to a CropStore in chunks
+
+        Meant for offline extraction; a video is never split across chunks.
+
+        Args:
+            store: CropStore
+            chunk_size: Crops per chunk (a chunk may exceed it by one video)
+        """
+        self.store = store
+        self.chunk_size = chunk_size
+        self._crops = []
+        self._indexes = []
+        self._count = 0
+
+    def add_video(self, video_id, crops, frame_indices, boxes, confidences=None, label=-1,
+                  frames_total=-1, frames_sampled=-1):
+        if len(crops) == 0:
+            return
+        self._crops.append(np.asarray(crops, dtype=np.uint8))
+        self._indexes.append(make_index(video_id, frame_indices, boxes, confidences, label, frames_total, frames_sampled))
+        self._count += len(crops)
+        if self._count >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._crops:
+            return
+        self.store.write_chunk(np.concatenate(self._crops), np.concatenate(self._indexes))
+        self._crops, self._indexes, self._count = [], [], 0
+
+    def close(self):
+        self.flush()
+
+
+def crop_namespace(config):
+    """
+    Namespace of everything that changes the crops, taken from a Config class
+
+    The server, extract_crops.py and train_temporal_head.py all use it, so
+    offline tools read crops taken exactly like the server takes them.
+    """
+    return json.dumps({
+        'framesPerVideo': config.FRAMES_PER_VIDEO,
+        'frameSkip': config.FRAME_SKIP,
+        'detector': config.FACE_DETECTOR_BACKEND,
+        'detectionSize': config.FACE_DETECTION_SIZE,
+        'detectionConfidence': config.FACE_DETECTION_CONFIDENCE,
+        'tracking': [config.FACE_TRACKING, config.TRACKING_REDETECT_INTERVAL, config.TRACKING_MIN_CONFIDENCE, config.TRACKING_MAX_FRAME_GAP],
+        'imgSize': list(config.IMG_SIZE),
+        'multiFace': [config.MULTI_FACE, config.MAX_FACES_PER_FRAME],
+    }, sort_keys=True)
@@ -0,0 +1,54 @@
+import math
+from statistics import NormalDist
+
+
+class SequentialMeanTest:
+    def __init__(self, confidence=0.95, min_samples=16, threshold=0.5):
+        """
+        Decide early whether the mean face score lies above or below `threshold`
+
+        After every inference batch the running mean and its standard error
+        are updated; the decision is settled once the one-sided confidence
+        bound at `confidence` no longer crosses the threshold, i.e.
+        |mean - threshold| > z * std / sqrt(n).
+
+        Frames of one video are correlated, so the bound is optimistic;
+        `min_samples` keeps a few lucky batches from ending the analysis.
+
+        Args:
+            confidence: Confidence level of the bound (e.g. 0.95)
+            min_samples: Minimum number of scored faces before stopping
+            threshold: Decision threshold of the mean score (<= threshold: fake)
+        """
+        self.z = NormalDist().inv_cdf(confidence)
+        self.min_samples = max(2, min_samples)
+        self.threshold = threshold
+
+        self.count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    @property
+    def mean(self):
+        return self._sum / self.count if self.count else 0.0
+
+    def update(self, scores):
+        """
+        Add a batch of scores
+
+        Returns:
+            True when the verdict is statistically settled
+        """
+        for score in scores:
+            score = float(score)
+            self._sum += score
+            self._sum_sq += score * score
+        self.count += len(scores)
+
+        if self.count < self.min_samples:
+            return False
+
+        mean = self.mean
+        variance = max(0.0, (self._sum_sq - self.count * mean * mean) / (self.count - 1))
+        margin = self.z * math.sqrt(variance / self.count)
+        return abs(mean - self.threshold) > margin
@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Intersection over union of every pair of (x, y, w, h) boxes
+
+    Returns:
+        float array (len(boxes_a), len(boxes_b))
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def assign_tracks(frame_indices, boxes, iou_threshold=0.3, max_gap=None):
+    """
+    Group face detections of a video into identities by linking boxes over time
+
+    Frames are visited in order; every face is matched greedily (highest IoU
+    first) to the last box of an open track, or starts a new track. A track
+    is closed when it has not been matched for more than `max_gap` frames.
+
+    Args:
+        frame_indices: Frame index of every face (any order)
+        boxes: (x, y, w, h, ...) of every face
+        iou_threshold: Minimum IoU with the last box of a track
+        max_gap: Maximum frame distance to the last box of a track (None: no limit)
+
+    Returns:
+        int array with the track id of every face, numbered by first appearance
+    """
+    frame_indices = np.asarray(frame_indices)
+    track_ids = np.full(len(frame_indices), -1, dtype=np.int64)
+    if len(frame_indices) == 0:
+        return track_ids
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(len(frame_indices), -1)[:, :4]
+
+    last_boxes = []
+    last_frames = []
+
+    order = np.argsort(frame_indices, kind='stable')
+    frames, starts = np.unique(frame_indices[order], return_index=True)
+    for frame_idx, members in zip(frames, np.split(order, starts[1:])):
+        if last_boxes:
+            iou = box_iou(boxes[members], np.array(last_boxes))
+            if max_gap is not None:
+                # Track yang terlalu lama hilang tidak disambung lagi
+                iou[:, frame_idx - np.array(last_frames) > max_gap] = 0.0
+
+            while iou.size and iou.max() >= iou_threshold:
+                face, track = np.unravel_index(np.argmax(iou), iou.shape)
+                track_ids[members[face]] = track
+                last_boxes[track] = boxes[members[face]]
+                last_frames[track] = frame_idx
+                iou[face, :] = -1.0
+                iou[:, track] = -1.0
+
+        for face in members:
+            if track_ids[face] < 0:
+                track_ids[face] = len(last_boxes)
+                last_boxes.append(boxes[face])
+                last_frames.append(frame_idx)
+
+    return track_ids
@@ -1,12 +1,34 @@
 import os
+import shutil
+import tempfile
+import threading
+import uuid
 from pathlib import Path
+
+import cv2
+import numpy as np
 from werkzeug.utils import secure_filename
 
+from app.utils.metrics import stage
+
 class FileHandler:
-    def __init__(self, upload_folder, allowed_extensions):
+    def __init__(self, upload_folder, allowed_extensions, memory_spool_threshold=0):
+        """
+        Args:
+            upload_folder: Folder for uploads spooled to disk
+            allowed_extensions: Allowed file extensions
+            memory_spool_threshold: Videos up to this many bytes are spooled into
+                an anonymous in-memory file (memfd) instead of the upload folder
+                (0 disables it; only available on Linux)
+        """
         self.upload_folder = Path(upload_folder)
         self.allowed_extensions = allowed_extensions
+        self.memory_spool_threshold = memory_spool_threshold if hasattr(os, 'memfd_create') else 0
         self.upload_folder.mkdir(exist_ok=True)
+        
+        # Path /proc/self/fd/N -> fd untuk file memfd yang masih terbuka
+        self._memory_files = {}
+        self._lock = threading.Lock()
     
     def allowed_file(self, filename):
         """Check if file extension is allowed"""
@@ -22,20 +44,87 @@ class FileHandler:
         return filename.rsplit('.', 1)[1].lower() in {'jpg', 'jpeg', 'png', 'bmp'}
     
     def save_file(self, file):
-        """Save uploaded file and return path"""
+        """Save uploaded file under a unique name and return path"""
         if file and self.allowed_file(file.filename):
-            filename = secure_filename(file.filename)
+            # Prefix unik supaya upload bersamaan dengan nama sama tidak saling menimpa
+            filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
             filepath = self.upload_folder / filename
             file.save(str(filepath))
             return filepath
         return None
     
+    def read_image(self, file):
+        """
+        Decode an uploaded image straight from the request stream (no disk write)
+        
+        Returns:
+            Image in BGR format or None if it cannot be decoded
+        """
+        with stage('upload'):
+            data = file.stream.read()
+        if not data:
+            return None
+        with stage('decode'):
+            return cv2.imdecode(np.frombuffer(memoryview(data), dtype=np.uint8), cv2.IMREAD_COLOR)
+    
+    def spool_file(self, file):
+        """
+        Spool an upload (e.g. a video) to a unique file that OpenCV can open
+        
+        Small uploads go to an anonymous memfd, larger ones to a unique
+        temporary file in the upload folder. Release it with delete_file().
+        
+        Returns:
+            Path of the spooled file or None on failure
+        """
+        if not file or not self.allowed_file(file.filename):
+            return None
+        
+        stream = file.stream
+        size = None
+        try:
+            stream.seek(0, os.SEEK_END)
+            size = stream.tell()
+            stream.seek(0)
+        except (AttributeError, OSError):
+            pass
+        
+        suffix = '.' + file.filename.rsplit('.', 1)[1].lower()
+        
+        with stage('upload'):
+            return self._spool(stream, size, suffix)
+    
+    def _spool(self, stream, size, suffix):
+        try:
+            if size is not None and 0 < size <= self.memory_spool_threshold:
+                fd = os.memfd_create(f"upload{suffix}")
+                with os.fdopen(os.dup(fd), 'wb') as out:
+                    shutil.copyfileobj(stream, out, 1024 * 1024)
+                filepath = f"/proc/self/fd/{fd}"
+                with self._lock:
+                    self._memory_files[filepath] = fd
+                return filepath
+            
+            fd, filepath = tempfile.mkstemp(suffix=suffix, dir=self.upload_folder)
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(stream, out, 1024 * 1024)
+            return Path(filepath)
+        except OSError as e:
+            print(f"Error spooling file: {e}")
+            return None
+    
     def delete_file(self, filepath):
-        """Delete file safely"""
+        """Delete file safely (also releases in-memory spooled files)"""
+        with self._lock:
+            fd = self._memory_files.pop(str(filepath), None)
+        if fd is not None:
+            os.close(fd)
+            return True
+        
         try:
             if filepath and Path(filepath).exists():
                 os.remove(filepath)
                 return True
         except Exception as e:
             print(f"Error deleting file: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,342 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+# Batas bucket default (detik) untuk latensi
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        """Monotonic counter, optionally split by labels (name should end in _total)"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        """Values as JSON-serialisable [labels, value] pairs"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def render(self, snapshots=None):
+        """Text format lines of this counter, or of the sum of several snapshot() results"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        values = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """
+        Prometheus histogram: cumulative bucket counts, sum and count per label set
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names, values are passed to observe() as keywords
+            buckets: Upper bounds of the buckets (+Inf is added)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [jumlah per bucket (tidak kumulatif, + Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def snapshot(self):
+        """Series as JSON-serialisable [labels, bucket counts, sum] triples"""
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._series.items()]
+
+    def render(self, snapshots=None):
+        """Text format lines of this histogram, or of the sum of several snapshot() results"""
+        if snapshots is None:
+            snapshots = [self.snapshot()]
+        merged = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                series = merged.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+                # Snapshot dengan bucket lain (kode berbeda) tidak bisa dijumlah
+                if len(counts) != len(series[0]):
+                    continue
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Metrics of this process, rendered in the Prometheus text format"""
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """Current values of every metric, by metric name (JSON-serialisable)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self, snapshots=None):
+        """
+        Text format of this registry, or of the sum of several snapshot()
+        results (e.g. one per worker process, see SharedMetricsDir)
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            if snapshots is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render([snapshot.get(metric.name, []) for snapshot in snapshots]))
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+
+class SharedMetricsDir:
+    def __init__(self, directory, registry, flush_interval=2.0):
+        """
+        Metrics of several worker processes (gunicorn) summed into one scrape
+
+        Every process writes the snapshot of its registry to its own JSON
+        file in `directory`, from a background thread every `flush_interval`
+        seconds and when it renders. render() sums the files of all
+        processes, so a scrape that lands on any worker returns the totals.
+        Files of workers that exited are kept, so counters never go
+        backwards when gunicorn replaces a worker; clear the folder when the
+        server (re)starts (see gunicorn.conf.py).
+
+        Args:
+            directory: Folder shared by the worker processes
+            registry: MetricsRegistry of this process
+            flush_interval: Seconds between two snapshot writes
+        """
+        self.directory = Path(directory)
+        self.registry = registry
+        self.flush_interval = flush_interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._flusher = None
+        self._flusher_pid = None
+        self._name = None
+        self._lock = threading.Lock()
+
+    def write(self):
+        """Write the snapshot of this process (atomically)"""
+        # Folder bisa dikosongkan saat server start (gunicorn on_starting)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self._process_name()
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.registry.snapshot()))
+        os.replace(tmp_path, path)
+
+    def render(self):
+        self.ensure_flusher()
+        self.write()
+        snapshots = []
+        for path in sorted(self.directory.glob('*.json')):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return self.registry.render(snapshots)
+
+    def ensure_flusher(self):
+        """Start the flush thread of this process (threads do not survive a fork)"""
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    def _process_name(self):
+        # pid bisa dipakai ulang oleh worker baru, jadi nama file juga memuat id acak
+        with self._lock:
+            if self._name is None or not self._name.startswith(f"{os.getpid()}-"):
+                self._name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+            return self._name
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'deepfake_request_seconds', 'End-to-end latency of analysis requests', ['endpoint']
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    'deepfake_stage_seconds',
+    'Time spent per analysis stage (upload, decode, detect, preprocess, infer, infer_wait, cache_lookup)',
+    ['stage']
+)
+INFERENCE_BATCH_SIZE = REGISTRY.histogram(
+    'deepfake_inference_batch_size', 'Face crops per model forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+INFERENCE_QUEUE_SECONDS = REGISTRY.histogram(
+    'deepfake_inference_queue_seconds', 'Time a crop waits in the inference scheduler before its batch runs'
+)
+FACES_PER_VIDEO = REGISTRY.histogram(
+    'deepfake_faces_per_video', 'Face crops scored per analyzed video',
+    buckets=(0, 1, 5, 10, 20, 30, 50, 100, 200, 500)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'deepfake_cache_lookups_total', 'Result cache and crop store lookups', ['cache', 'result']
+)
+
+# Timer request yang sedang berjalan; thread pipeline menyalin context-nya
+_current_timer = contextvars.ContextVar('stage_timer', default=None)
+
+# Folder metrics bersama antar worker (None: hanya metrics proses ini)
+_shared = None
+
+
+def share_metrics(directory, flush_interval=2.0):
+    """Sum the metrics of all processes using `directory` in render_metrics() (see SharedMetricsDir)"""
+    global _shared
+    _shared = SharedMetricsDir(directory, REGISTRY, flush_interval) if directory else None
+
+
+def render_metrics():
+    """Text format of the metrics of this process, or of all processes sharing a folder"""
+    if _shared is None:
+        return REGISTRY.render()
+    return _shared.render()
+
+
+class StageTimer:
+    def __init__(self):
+        """
+        Seconds spent per stage by one request
+
+        Stages that run on several threads at once (e.g. detection workers)
+        are summed, so the total can exceed the wall-clock time.
+        """
+        self._seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+
+    def as_dict(self):
+        """Milliseconds per stage"""
+        with self._lock:
+            return {stage: round(seconds * 1000.0, 2) for stage, seconds in self._seconds.items()}
+
+
+def current_timer():
+    """StageTimer of the request being handled, or None"""
+    return _current_timer.get()
+
+
+def observe_stage(stage, seconds):
+    """Record time spent in a stage in the histogram and the current request timer"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(stage, seconds)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage `name` (see observe_stage)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+@contextmanager
+def request_timer(endpoint):
+    """
+    Give the enclosed request a StageTimer and record its total latency
+
+    Threads started inside should run with contextvars.copy_context() so their
+    stages are added to the same timer.
+    """
+    if _shared is not None:
+        # Worker hasil fork belum punya thread flush
+        _shared.ensure_flusher()
+    timer = StageTimer()
+    token = _current_timer.set(timer)
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
@@ -0,0 +1,151 @@
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from app.services.inference_backend import (
+    KerasBackend,
+    OnnxRuntimeBackend,
+    PyTorchBackend,
+    TorchScriptBackend,
+    _determine_framework,
+    logits_to_scores,
+)
+
+
+class ScoreHead(torch.nn.Module):
+    """
+    Wrap a PyTorch classifier so the exported graph has the serving contract
+
+    Input: float32 faces (N, H, W, C) in [0, 1]. Output: probability of real (N,).
+    The NHWC -> NCHW transpose and the softmax/sigmoid are part of the graph, so
+    ONNX Runtime and TorchScript can fuse them with the network.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, faces):
+        return logits_to_scores(self.model(faces.permute(0, 3, 1, 2)))
+
+
+def export_pytorch(model_path, output_dir, img_size=(224, 224), formats=('onnx', 'torchscript'), opset=17):
+    """
+    Export a pickled PyTorch model (.pth) to ONNX and/or TorchScript
+
+    Returns:
+        (reference backend, dict mapping format name to the written file path)
+    """
+    reference = PyTorchBackend.from_path(model_path)
+    head = ScoreHead(reference.model).eval()
+    example = torch.rand(2, img_size[1], img_size[0], 3)
+    output_dir = Path(output_dir)
+    stem = Path(model_path).stem
+    exported = {}
+
+    if 'onnx' in formats:
+        onnx_path = output_dir / f"{stem}.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                head, (example,), str(onnx_path),
+                input_names=['faces'],
+                output_names=['scores'],
+                dynamic_axes={'faces': {0: 'batch'}, 'scores': {0: 'batch'}},
+                opset_version=opset,
+                do_constant_folding=True,
+            )
+        exported['onnx'] = onnx_path
+
+    if 'torchscript' in formats:
+        ts_path = output_dir / f"{stem}.pt"
+        with torch.no_grad():
+            traced = torch.jit.trace(head, example)
+            # Freeze: bobot jadi konstanta sehingga conv+bn bisa digabung
+            traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+        traced.save(str(ts_path))
+        exported['torchscript'] = ts_path
+
+    return reference, exported
+
+
+def export_keras(model_path, output_dir, img_size=(224, 224), formats=('onnx',), opset=17):
+    """
+    Export a Keras model to ONNX (requires the optional `tf2onnx` package)
+
+    Returns:
+        (reference backend, dict mapping format name to the written file path)
+    """
+    if 'torchscript' in formats:
+        print("⚠️ TorchScript export is only available for PyTorch models, skipping")
+
+    reference = KerasBackend.from_path(model_path)
+    exported = {}
+
+    if 'onnx' in formats:
+        try:
+            import tensorflow as tf
+            import tf2onnx
+        except ImportError as e:
+            raise ImportError("Exporting Keras models to ONNX requires `pip install tf2onnx`") from e
+
+        onnx_path = Path(output_dir) / f"{Path(model_path).stem}.onnx"
+        spec = (tf.TensorSpec((None, img_size[1], img_size[0], 3), tf.float32, name='faces'),)
+        tf2onnx.convert.from_keras(reference.model, input_signature=spec, opset=opset, output_path=str(onnx_path))
+        exported['onnx'] = onnx_path
+
+    return reference, exported
+
+
+def check_parity(reference, candidate, img_size=(224, 224), samples=8, atol=1e-4, seed=0):
+    """
+    Compare the scores of two backends on the same random face batch
+
+    Returns:
+        Dict with the maximum and mean absolute score difference and a `passed` flag
+    """
+    rng = np.random.default_rng(seed)
+    faces = rng.integers(0, 256, size=(samples, img_size[1], img_size[0], 3), dtype=np.uint8)
+
+    expected = reference.predict_batch(faces)
+    actual = candidate.predict_batch(faces)
+    diff = np.abs(expected.astype(np.float64) - actual.astype(np.float64))
+
+    return {
+        'maxAbsDiff': float(diff.max()),
+        'meanAbsDiff': float(diff.mean()),
+        'passed': bool(diff.max() <= atol),
+    }
+
+
+def export_model(model_path, output_dir=None, img_size=(224, 224), formats=('onnx', 'torchscript'),
+                 opset=17, atol=1e-4):
+    """
+    Export `model_path` and check every exported graph against the original model
+
+    Returns:
+        Dict mapping format name to {'path': ..., 'parity': ...}
+    """
+    model_path = Path(model_path)
+    output_dir = Path(output_dir) if output_dir else model_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if _determine_framework(model_path) == 'pytorch':
+        reference, exported = export_pytorch(model_path, output_dir, img_size, formats, opset)
+    else:
+        reference, exported = export_keras(model_path, output_dir, img_size, formats, opset)
+
+    loaders = {
+        'onnx': OnnxRuntimeBackend.from_path,
+        'torchscript': TorchScriptBackend.from_path,
+    }
+
+    report = {}
+    for fmt, path in exported.items():
+        candidate = loaders[fmt](path)
+        report[fmt] = {
+            'path': str(path),
+            'parity': check_parity(reference, candidate, img_size, atol=atol),
+        }
+
+    return report
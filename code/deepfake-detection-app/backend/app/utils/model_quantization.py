@@ -0,0 +1,241 @@
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from app.services.inference_backend import InferenceBackend, PyTorchBackend, _determine_framework
+from app.utils.model_export import ScoreHead
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+# Nama folder -> label (1 = real, sama dengan arti skor model)
+LABELS = {'real': 1, 'fake': 0}
+
+
+def _folder_label(path):
+    return next((LABELS[p.name.lower()] for p in path.parents if p.name.lower() in LABELS), -1)
+
+
+def sample_paths(paths, limit, seed=0):
+    """
+    Seeded sample of `limit` crop paths, stratified by label
+
+    The classes are taken in turn from their shuffled lists, so a limit
+    keeps both `real/` and `fake/` (instead of the first folder in sort
+    order) and the same seed gives the same sample.
+    """
+    rng = np.random.default_rng(seed)
+    groups = {}
+    for path in paths:
+        groups.setdefault(_folder_label(path), []).append(path)
+
+    queues = []
+    for label in sorted(groups):
+        group = groups[label]
+        queues.append([group[i] for i in rng.permutation(len(group))])
+
+    # Round-robin antar kelas sampai limit tercapai
+    sample = []
+    for position in range(max(len(queue) for queue in queues) if queues else 0):
+        for queue in queues:
+            if position < len(queue):
+                sample.append(queue[position])
+    return sample[:limit]
+
+
+def load_face_folder(folder, img_size=(224, 224), limit=None, seed=0):
+    """
+    Load face crops from a folder into one uint8 NHWC batch
+
+    Labels are taken from a `real`/`fake` parent folder when present,
+    e.g. `eval/real/001.jpg`; crops without one get label -1. With a
+    limit, a seeded sample stratified by label is loaded (see sample_paths).
+
+    Returns:
+        (faces, labels) with faces (N, H, W, 3) RGB and labels (N,) int
+    """
+    paths = sorted(p for p in Path(folder).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit and limit < len(paths):
+        paths = sample_paths(paths, limit, seed)
+
+    faces = np.empty((len(paths), img_size[1], img_size[0], 3), dtype=np.uint8)
+    labels = np.full(len(paths), -1, dtype=np.int64)
+    count = 0
+
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        cv2.resize(image, img_size, dst=faces[count])
+        labels[count] = _folder_label(path)
+        count += 1
+
+    return faces[:count], labels[:count]
+
+
+def _prepare_for_quantization(model):
+    # Swish memory-efficient (autograd.Function) dari efficientnet_pytorch
+    # tidak bisa di-trace/quantize, ganti dengan versi biasa
+    if hasattr(model, 'set_swish'):
+        model.set_swish(memory_efficient=False)
+    return model.eval()
+
+
+def quantize_dynamic(model):
+    """
+    Dynamic INT8 quantization (weights INT8, activations quantized on the fly)
+
+    Only Linear layers are covered by PyTorch, so the speedup on a conv
+    network is limited; use static quantization for the conv layers.
+    """
+    model = _prepare_for_quantization(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model, calibration_faces, batch_size=32, engine='x86'):
+    """
+    Static INT8 quantization with observers calibrated on face crops (FX graph mode)
+
+    Args:
+        model: fp32 PyTorch classifier
+        calibration_faces: uint8 NHWC face crops used to calibrate the observers
+        engine: Quantized engine ('x86', 'fbgemm' or 'qnnpack')
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = engine
+    model = _prepare_for_quantization(model)
+    example = torch.rand(1, 3, calibration_faces.shape[1], calibration_faces.shape[2])
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example,))
+
+    with torch.inference_mode():
+        for start in range(0, len(calibration_faces), batch_size):
+            batch = InferenceBackend.preprocess(calibration_faces[start:start + batch_size])
+            prepared(torch.from_numpy(batch).permute(0, 3, 1, 2))
+
+    return convert_fx(prepared)
+
+
+def save_torchscript(model, output_path, img_size=(224, 224)):
+    """Save a (quantized) classifier as a TorchScript graph served by TorchScriptBackend"""
+    example = torch.rand(2, img_size[1], img_size[0], 3)
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(ScoreHead(model).eval(), example))
+    traced.save(str(output_path))
+    return Path(output_path)
+
+
+def quantize_onnx(model_path, output_path, mode, calibration_faces=None):
+    """Quantize an exported ONNX graph with ONNX Runtime (covers conv layers too)"""
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic as ort_quantize_dynamic,
+        quantize_static as ort_quantize_static,
+    )
+
+    if mode == 'dynamic':
+        ort_quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QInt8)
+        return Path(output_path)
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self, faces, batch_size=16):
+            self.batches = iter([
+                {'faces': InferenceBackend.preprocess(faces[i:i + batch_size])}
+                for i in range(0, len(faces), batch_size)
+            ])
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    ort_quantize_static(
+        str(model_path), str(output_path), FaceReader(calibration_faces),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+    )
+    return Path(output_path)
+
+
+def quantize_model(model_path, output_path, mode='static', calibration_faces=None, img_size=(224, 224)):
+    """
+    Produce the INT8 variant of `model_path` (.pth or exported .onnx)
+
+    Returns:
+        Path of the written model (.pt TorchScript or .onnx)
+    """
+    model_path = Path(model_path)
+    if mode == 'static' and (calibration_faces is None or len(calibration_faces) == 0):
+        raise ValueError('Static quantization needs a non-empty calibration set')
+
+    framework = _determine_framework(model_path)
+    if framework == 'onnx':
+        return quantize_onnx(model_path, output_path, mode, calibration_faces)
+
+    if framework != 'pytorch':
+        raise ValueError('Quantization supports .pth models or .onnx files from export_model.py; '
+                         'export Keras models to ONNX first')
+
+    model = PyTorchBackend.from_path(model_path).model
+    if mode == 'dynamic':
+        quantized = quantize_dynamic(model)
+    else:
+        quantized = quantize_static(model, calibration_faces)
+
+    return save_torchscript(quantized, output_path, img_size)
+
+
+def roc_auc(labels, scores):
+    """ROC AUC of `scores` for binary `labels` (Mann-Whitney U, ties averaged)"""
+    labels = np.asarray(labels)
+    scores = np.asarray(scores, dtype=np.float64)
+    positives = int((labels == 1).sum())
+    negatives = int((labels == 0).sum())
+    if positives == 0 or negatives == 0:
+        return float('nan')
+
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    # Rank rata-rata untuk nilai yang sama
+    upper = np.cumsum(counts)
+    ranks = (upper - (counts - 1) / 2.0)[inverse]
+
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2.0) / (positives * negatives))
+
+
+def evaluate_backend(backend, faces, labels, batch_size=32, warmup=1):
+    """
+    Latency/throughput and accuracy of a backend on a labelled crop set
+
+    Returns:
+        Dict with per-batch latency percentiles, faces/sec, AUC and accuracy
+    """
+    for _ in range(warmup):
+        backend.predict_batch(faces[:batch_size])
+
+    scores = np.empty(len(faces), dtype=np.float32)
+    latencies = []
+    started = time.perf_counter()
+
+    for start in range(0, len(faces), batch_size):
+        batch_started = time.perf_counter()
+        scores[start:start + batch_size] = backend.predict_batch(faces[start:start + batch_size])
+        latencies.append((time.perf_counter() - batch_started) * 1000.0)
+
+    elapsed = time.perf_counter() - started
+    labelled = labels >= 0
+
+    return {
+        'backend': backend.identity,
+        'faces': int(len(faces)),
+        'batchSize': batch_size,
+        'latencyP50Ms': float(np.percentile(latencies, 50)),
+        'latencyP95Ms': float(np.percentile(latencies, 95)),
+        'facesPerSec': float(len(faces) / elapsed) if elapsed > 0 else 0.0,
+        'auc': roc_auc(labels[labelled], scores[labelled]),
+        'accuracy': float(np.mean((scores[labelled] > 0.5) == (labels[labelled] == 1))) if labelled.any() else float('nan'),
+    }
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from app.utils.content_hash import content_hash, derive_key
+from app.utils.metrics import CACHE_LOOKUPS
+
+
+class ResultCache:
+    def __init__(self, namespace='', max_entries=512, ttl_seconds=3600, disk_dir=None,
+                 disk_max_bytes=256 * 1024 * 1024, disk_ttl_seconds=86400):
+        """
+        Analysis result cache keyed by upload content
+
+        Keys are derived from the SHA-256 of the upload bytes and `namespace`,
+        which should describe everything that changes the result (model
+        identity, frame sampling, image size, detector settings). Results live in an in-memory
+        LRU tier and, when `disk_dir` is set, in a JSON file tier on disk.
+
+        Args:
+            namespace: String mixed into every key
+            max_entries: Maximum number of results kept in memory
+            ttl_seconds: Lifetime of an in-memory result
+            disk_dir: Folder of the on-disk tier (None disables it)
+            disk_max_bytes: Maximum total size of the on-disk tier
+            disk_ttl_seconds: Lifetime of an on-disk result
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_ttl = disk_ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'memoryHits': 0, 'diskHits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, stream, kind='', chunk_size=1024 * 1024):
+        """
+        Hash an upload stream chunk by chunk and rewind it
+
+        Args:
+            stream: Readable binary file object (e.g. FileStorage.stream)
+            kind: Extra key part, e.g. 'image' or 'video'
+
+        Returns:
+            Hex digest identifying the content within this cache namespace
+        """
+        return self.key_for_hash(content_hash(stream, chunk_size), kind)
+
+    def key_for_hash(self, digest, kind=''):
+        """Key of an upload from its content hash (see app.utils.content_hash)"""
+        return derive_key(self.namespace, digest, kind)
+
+    def get(self, key):
+        """Return the cached result for `key` or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memoryHits'] += 1
+                    CACHE_LOOKUPS.inc(cache='result', result='hit')
+                    return result
+                del self._memory[key]
+
+        result = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self._stats['misses'] += 1
+                CACHE_LOOKUPS.inc(cache='result', result='miss')
+                return None
+            self._stats['hits'] += 1
+            self._stats['diskHits'] += 1
+        CACHE_LOOKUPS.inc(cache='result', result='hit')
+
+        # Naikkan ke tier memori
+        self._memory_set(key, result, now)
+        return result
+
+    def set(self, key, result):
+        """Store a JSON-serialisable result under `key`"""
+        now = time.time()
+        self._memory_set(key, result, now)
+        self._disk_set(key, result)
+        with self._lock:
+            self._stats['stores'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memoryEntries'] = len(self._memory)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['diskEnabled'] = self.disk_dir is not None
+        return stats
+
+    def _memory_set(self, key, result, now):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (now + self.ttl, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key, now):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            if now - path.stat().st_mtime > self.disk_ttl:
+                path.unlink(missing_ok=True)
+                return None
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _disk_set(self, key, result):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(result))
+            # Rename atomik supaya worker lain tidak membaca file setengah jadi
+            os.replace(tmp_path, path)
+            self._disk_evict()
+        except OSError as e:
+            print(f"Error writing result cache: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def _disk_evict(self):
+        """Drop expired files, then the oldest ones until the tier fits its size limit"""
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self.disk_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.disk_ttl:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self._stats['evictions'] += 1
@@ -0,0 +1,146 @@
+import struct
+import subprocess
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class FFmpegFrameStream:
+    def __init__(self, source, frame_skip=3, max_frames=30, ffmpeg_binary='ffmpeg', chunk_size=64 * 1024,
+                 max_bytes=None, tee=None, hasher=None):
+        """
+        Decode a video while it is still being uploaded
+
+        The request body is piped into an ffmpeg process as chunks arrive;
+        ffmpeg keeps every `frame_skip`-th frame and writes it back as BMP
+        images, which are decoded as soon as they are complete. Because the
+        total frame count is unknown while streaming, the first `max_frames`
+        sampled frames are used.
+
+        Containers that need seeking (MP4/MOV without "faststart", i.e. moov
+        atom at the end) cannot be decoded from a pipe; pass `tee` to keep a
+        copy of the body so the caller can fall back to the file path.
+
+        Args:
+            source: Readable binary stream (e.g. flask.request.stream)
+            frame_skip: Keep every `frame_skip`-th frame
+            max_frames: Stop after this many sampled frames (<= 0: no limit)
+            ffmpeg_binary: ffmpeg executable
+            chunk_size: Bytes read from `source` per chunk
+            max_bytes: Abort when the body grows beyond this size
+            tee: Optional writable file receiving a copy of the body
+            hasher: Optional hashlib object updated with the body (e.g. for ResultCache)
+        """
+        self.source = source
+        self.frame_skip = max(1, int(frame_skip))
+        self.max_frames = int(max_frames)
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.tee = tee
+        self.hasher = hasher
+
+        self.bytes_received = 0
+        self.frames_decoded = 0
+        self.error = None
+        self._stderr_tail = deque(maxlen=20)
+
+        self.process = subprocess.Popen(
+            [
+                ffmpeg_binary, '-hide_banner', '-loglevel', 'error', '-nostdin',
+                '-i', 'pipe:0',
+                '-vf', f"select=not(mod(n\\,{self.frame_skip}))", '-vsync', 'vfr',
+                '-f', 'image2pipe', '-vcodec', 'bmp', 'pipe:1',
+            ],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+
+        self._feeder = threading.Thread(target=self._feed, name='ffmpeg-feeder', daemon=True)
+        self._stderr_reader = threading.Thread(target=self._read_stderr, name='ffmpeg-stderr', daemon=True)
+        self._feeder.start()
+        self._stderr_reader.start()
+
+    def _feed(self):
+        """Copy the upload into ffmpeg's stdin; keep reading the body if ffmpeg quits early"""
+        ffmpeg_open = True
+        try:
+            for chunk in iter(lambda: self.source.read(self.chunk_size), b''):
+                self.bytes_received += len(chunk)
+                if self.max_bytes and self.bytes_received > self.max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                if self.hasher is not None:
+                    self.hasher.update(chunk)
+                if self.tee is not None:
+                    self.tee.write(chunk)
+                if ffmpeg_open:
+                    try:
+                        self.process.stdin.write(chunk)
+                    except (BrokenPipeError, OSError, ValueError):
+                        # ffmpeg sudah berhenti (cukup frame / error); body tetap dibaca habis
+                        ffmpeg_open = False
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.decode('utf-8', 'replace').strip())
+
+    def _read_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.process.stdout.read(size - len(data))
+            if not chunk:
+                return None
+            data.extend(chunk)
+        return data
+
+    def iter_frames(self):
+        """Yield (frame_idx, frame) in BGR format as soon as ffmpeg emits them"""
+        while self.max_frames <= 0 or self.frames_decoded < self.max_frames:
+            # Header BMP: 'BM' + ukuran file (uint32 little endian)
+            header = self._read_exact(6)
+            if header is None or header[:2] != b'BM':
+                return
+            size = struct.unpack('<I', bytes(header[2:6]))[0]
+            body = self._read_exact(size - 6)
+            if body is None:
+                return
+
+            frame = cv2.imdecode(np.frombuffer(bytes(header + body), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+
+            yield self.frames_decoded * self.frame_skip, frame
+            self.frames_decoded += 1
+
+    def close(self):
+        """
+        Stop ffmpeg and wait until the whole body has been read
+
+        Raises:
+            UploadTooLarge or the read error of the upload stream, if any
+        """
+        if self.process.poll() is None:
+            self.process.kill()
+        self._feeder.join()
+        self.process.wait()
+        self._stderr_reader.join(timeout=1)
+        self.process.stdout.close()
+
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def decoder_error(self):
+        """Last lines written by ffmpeg to stderr"""
+        return '\n'.join(self._stderr_tail)
@@ -0,0 +1,105 @@
+import numpy as np
+
+# Mode TTA per request
+TTA_MODES = ('off', 'on', 'borderline')
+
+# View tambahan selain crop asli
+TTA_VIEWS = ('flip', 'zoom', 'flip_zoom')
+
+
+class TestTimeAugmentation:
+    def __init__(self, views=TTA_VIEWS, zoom=0.9, borderline_margin=0.15):
+        """
+        Extra views of face crops for test-time augmentation
+
+        Every view is computed for the whole uint8 NHWC batch at once with
+        numpy indexing (no per-image loop): `flip` mirrors the crops
+        horizontally, `zoom` takes a centered crop of `zoom` times the size and
+        resizes it back bilinearly, `flip_zoom` does both. The views of a batch
+        are scored together with the original crops and the scores averaged,
+        so K views cost about K times the crops of one pass.
+
+        Args:
+            views: Names of the extra views (subset of TTA_VIEWS)
+            zoom: Relative size of the centered crop of the zoom views
+            borderline_margin: In 'borderline' mode only crops whose score is
+                within this distance of 0.5 get the extra views
+        """
+        unknown = set(views) - set(TTA_VIEWS)
+        if unknown:
+            raise ValueError(f"Unknown TTA views {sorted(unknown)}, choose from: {', '.join(TTA_VIEWS)}")
+        self.views = tuple(views)
+        self.zoom = zoom
+        self.borderline_margin = borderline_margin
+        self._zoom_maps = {}
+
+    @property
+    def num_views(self):
+        """Number of scored views per crop, the original included"""
+        return len(self.views) + 1
+
+    def expand(self, faces, include_original=True):
+        """
+        Stack the views of a batch view by view
+
+        Args:
+            faces: uint8 array (N, H, W, C)
+            include_original: Put the unchanged crops first
+
+        Returns:
+            uint8 array (V * N, H, W, C)
+        """
+        faces = np.asarray(faces)
+        zoomed = self._zoom(faces) if {'zoom', 'flip_zoom'} & set(self.views) else None
+
+        views = [faces] if include_original else []
+        for name in self.views:
+            if name == 'flip':
+                views.append(faces[:, :, ::-1])
+            elif name == 'zoom':
+                views.append(zoomed)
+            else:
+                views.append(zoomed[:, :, ::-1])
+        return np.concatenate(views)
+
+    @staticmethod
+    def merge(scores, n, original=None):
+        """
+        Average the scores of expand() back to one score per crop
+
+        Args:
+            scores: Scores of V * N views, view by view
+            n: Number of crops
+            original: Scores of the original crops when they were not part of `scores`
+        """
+        views = np.asarray(scores, dtype=np.float32).reshape(-1, n)
+        if original is None:
+            return views.mean(axis=0)
+        return (views.sum(axis=0) + original) / np.float32(len(views) + 1)
+
+    def borderline(self, scores):
+        """Indices of the scores close enough to 0.5 to be re-scored with the extra views"""
+        return np.flatnonzero(np.abs(np.asarray(scores) - 0.5) < self.borderline_margin)
+
+    def _zoom(self, faces):
+        """Centered crop of `zoom` times the size, resized back (bilinear) for the whole batch"""
+        n, h, w = faces.shape[:3]
+        (y0, y1, wy), (x0, x1, wx) = self._zoom_map(h), self._zoom_map(w)
+
+        # Interpolasi terpisah: baris dulu, lalu kolom
+        top = faces[:, y0].astype(np.float32)
+        rows = top + (faces[:, y1] - top) * wy[None, :, None, None]
+        left = rows[:, :, x0]
+        out = left + (rows[:, :, x1] - left) * wx[None, None, :, None]
+        return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+    def _zoom_map(self, size):
+        """Source indices and weights of the zoom resize along one axis (cached per size)"""
+        cached = self._zoom_maps.get(size)
+        if cached is None:
+            source = (np.arange(size) + 0.5) * self.zoom + size * (1 - self.zoom) / 2 - 0.5
+            source = np.clip(source, 0, size - 1)
+            low = np.floor(source).astype(np.int64)
+            high = np.minimum(low + 1, size - 1)
+            cached = self._zoom_maps[size] = (low, high, (source - low).astype(np.float32))
+        return cached
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class SequentialFrameSampler:
+    def __init__(self, frame_skip=3, max_frames=30):
+        """
+        Sample frames from a video by decoding it once, front to back
+
+        Args:
+            frame_skip: Minimum distance between two sampled frames
+            max_frames: Maximum number of frames sampled per video (<= 0 disables the budget)
+        """
+        self.frame_skip = max(1, int(frame_skip))
+        self.max_frames = int(max_frames)
+
+    def sample_indices(self, total_frames):
+        """
+        Pick the frame indices to keep
+
+        Every `frame_skip`-th frame is a candidate. When there are more candidates
+        than `max_frames`, they are thinned out evenly over the whole video so a
+        long clip costs the same number of frames as a short one.
+        """
+        candidates = np.arange(0, max(0, int(total_frames)), self.frame_skip)
+
+        if self.max_frames > 0 and len(candidates) > self.max_frames:
+            picks = np.linspace(0, len(candidates) - 1, self.max_frames).round().astype(int)
+            candidates = candidates[np.unique(picks)]
+
+        return candidates.tolist()
+
+    def iter_frames(self, cap, total_frames):
+        """
+        Yield (frame_idx, frame) for the sampled frames of an opened cv2.VideoCapture
+
+        Skipped frames are only grabbed (demuxed and decoded without the colour
+        conversion and copy of retrieve()), so the stream is never seeked.
+        """
+        position = 0
+
+        for frame_idx in self.sample_indices(total_frames):
+            # Lewati frame yang tidak diambil tanpa seek
+            while position < frame_idx:
+                if not cap.grab():
+                    return
+                position += 1
+
+            if not cap.grab():
+                return
+            position += 1
+
+            ret, frame = cap.retrieve()
+            if ret:
+                yield frame_idx, frame
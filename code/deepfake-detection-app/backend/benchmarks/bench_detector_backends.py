@@ -0,0 +1,97 @@
+"""
+Latency and recall of the face detector backends on a labelled image folder
+
+The folder must contain a `face/` subfolder (images with at least one face)
+and optionally a `no_face/` subfolder (used for the false positive rate).
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_detector_backends --images data/detector-eval --backends mtcnn opencv_dnn haar
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.config import Config
+from app.services.face_detector import FaceDetector
+from app.services.face_detector_backends import DETECTOR_BACKENDS
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def load_images(folder):
+    images = []
+    for path in sorted(Path(folder).rglob('*')) if Path(folder).exists() else []:
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            image = cv2.imread(str(path))
+            if image is not None:
+                images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return images
+
+
+def evaluate(detector, face_images, no_face_images):
+    latencies = []
+
+    def detect_all(images):
+        found = 0
+        for image in images:
+            started = time.perf_counter()
+            box = detector.detect_batch([image])[0]
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            found += box is not None
+        return found
+
+    # Warm-up (inisialisasi model tidak ikut terukur)
+    detector.detect_batch([face_images[0]])
+
+    faces_found = detect_all(face_images)
+    false_positives = detect_all(no_face_images)
+
+    return {
+        'images': len(face_images) + len(no_face_images),
+        'latencyP50Ms': float(np.percentile(latencies, 50)),
+        'latencyP95Ms': float(np.percentile(latencies, 95)),
+        'imagesPerSec': float(1000.0 / np.mean(latencies)),
+        'recall': faces_found / len(face_images),
+        'falsePositiveRate': false_positives / len(no_face_images) if no_face_images else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face detector backends')
+    parser.add_argument('--images', required=True, help='Folder with face/ and optional no_face/ subfolders')
+    parser.add_argument('--backends', nargs='+', default=sorted(DETECTOR_BACKENDS))
+    parser.add_argument('--detection-size', type=int, default=Config.FACE_DETECTION_SIZE)
+    parser.add_argument('--confidence', type=float, default=Config.FACE_DETECTION_CONFIDENCE)
+    parser.add_argument('--output', default=None, help='Optional JSON output file')
+    args = parser.parse_args()
+
+    face_images = load_images(Path(args.images) / 'face')
+    no_face_images = load_images(Path(args.images) / 'no_face')
+    if not face_images:
+        parser.error(f"No images found in {Path(args.images) / 'face'}")
+
+    results = {}
+    for name in args.backends:
+        try:
+            detector = FaceDetector(
+                confidence_threshold=args.confidence,
+                detection_size=args.detection_size,
+                backend=name,
+                backend_options={'prototxt': Config.FACE_DNN_PROTOTXT, 'model': Config.FACE_DNN_MODEL}
+            )
+        except Exception as e:
+            print(f"⚠️ Skipping backend {name}: {e}")
+            continue
+        results[name] = evaluate(detector, face_images, no_face_images)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
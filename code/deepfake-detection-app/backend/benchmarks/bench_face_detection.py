@@ -0,0 +1,63 @@
+"""
+Compare per-frame and batched face detection on a synthetic clip
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_face_detection --frames 64 --width 1280 --height 720
+"""
+import argparse
+import json
+import time
+
+from app.config import Config
+from app.services.face_detector import FaceDetector
+from benchmarks.synthetic import make_frames
+
+
+def run(detector, frames, batch_size):
+    started = time.perf_counter()
+    if batch_size <= 1:
+        faces = [detector.extract_face_from_frame(frame) for frame in frames]
+    else:
+        faces = []
+        for start in range(0, len(frames), batch_size):
+            faces.extend(detector.extract_faces_batch(frames[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'batchSize': batch_size,
+        'seconds': elapsed,
+        'msPerFrame': elapsed * 1000.0 / len(frames),
+        'facesFound': sum(face is not None for face in faces),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--batch-size', type=int, default=Config.DETECTION_BATCH_SIZE)
+    parser.add_argument('--detection-size', type=int, default=Config.FACE_DETECTION_SIZE)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.width, args.height)
+
+    # Baseline: resolusi penuh, satu frame per panggilan (perilaku lama)
+    full_res = FaceDetector(Config.FACE_DETECTION_CONFIDENCE, detection_size=0)
+    batched = FaceDetector(Config.FACE_DETECTION_CONFIDENCE, detection_size=args.detection_size)
+
+    # Warm-up supaya inisialisasi TensorFlow tidak ikut terukur
+    full_res.extract_face_from_frame(frames[0])
+    batched.extract_faces_batch(frames[:2])
+
+    results = {
+        'perFrameFullRes': run(full_res, frames, 1),
+        'perFrameDownscaled': run(batched, frames, 1),
+        'batchedDownscaled': run(batched, frames, args.batch_size),
+    }
+    results['speedup'] = results['perFrameFullRes']['seconds'] / results['batchedDownscaled']['seconds']
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
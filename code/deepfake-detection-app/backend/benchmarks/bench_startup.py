@@ -0,0 +1,88 @@
+"""
+Measure app startup time and memory per model framework
+
+Every configuration starts a fresh interpreter that runs create_app() with
+MODEL_PATH pointing at a model of that type, and reports the time spent, the
+peak RSS and which ML frameworks ended up imported. The `eager` row imports
+torch and tensorflow up front, like the app did before imports were deferred.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_startup --model app/models/efficientnet-ariq.pth --detector haar
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.config import Config
+
+FRAMEWORK_MODULES = ('torch', 'tensorflow', 'keras', 'onnxruntime', 'mtcnn')
+
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+for name in {preload!r}:
+    __import__(name)
+from app.main import create_app
+create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'maxRssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'frameworks': [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(model_path, detector, preload=()):
+    env = dict(os.environ, MODEL_PATH=str(model_path), MODEL_PRECISION='fp32', FACE_DETECTOR_BACKEND=detector)
+    script = CHILD_SCRIPT.format(preload=tuple(preload), modules=FRAMEWORK_MODULES)
+    completed = subprocess.run(
+        [sys.executable, '-c', script], env=env, cwd=Config.BASE_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1:]}
+    # Baris terakhir stdout adalah hasil JSON; baris lain log dari create_app
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=str(Config.MODEL_PATH),
+                        help='Model path; its stem is reused for the .pth/.pt/.onnx/.keras variants')
+    parser.add_argument('--detector', default=Config.FACE_DETECTOR_BACKEND,
+                        help='Face detector backend (mtcnn imports TensorFlow)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model = Path(args.model)
+    configs = {
+        'pytorch': (model.with_suffix('.pth'), ()),
+        'torchscript': (model.with_suffix('.pt'), ()),
+        'onnx': (model.with_suffix('.onnx'), ()),
+        'keras': (model.with_suffix('.keras'), ()),
+        'eager': (model.with_suffix('.pth'), ('torch', 'tensorflow')),
+    }
+
+    report = {'detector': args.detector, 'configs': {}}
+    for name, (model_path, preload) in configs.items():
+        runs = [measure(model_path, args.detector, preload) for _ in range(max(1, args.repeat))]
+        ok = [run for run in runs if 'error' not in run]
+        if not ok:
+            report['configs'][name] = {'modelPath': str(model_path), 'error': runs[0]['error']}
+            continue
+        report['configs'][name] = {
+            'modelPath': str(model_path),
+            'modelExists': model_path.exists(),
+            'seconds': min(run['seconds'] for run in ok),
+            'maxRssMb': min(run['maxRssMb'] for run in ok),
+            'frameworks': ok[0]['frameworks'],
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
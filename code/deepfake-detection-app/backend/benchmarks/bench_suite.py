@@ -0,0 +1,287 @@
+"""
+Reproducible latency/throughput suite for the detection pipeline
+
+Everything runs on synthetic faces and clips generated locally (see
+benchmarks/synthetic.py), with fixed seeds. The suite measures
+
+- every stage in isolation: image decode, face detection (single frame and
+  batched), crop preprocessing, model forward pass per batch size and video
+  frame decoding
+- the processors end to end: single image, batched images and videos of
+  several lengths and resolutions
+- the full POST /api/analyze path through the Flask test client
+
+and writes latency percentiles and throughput per case to JSON. Pass an
+earlier result file with --compare to print the p50 change per case.
+
+The result cache and crop store are disabled so repeated runs measure the
+pipeline and not the caches.
+
+Usage (from the backend folder):
+    python -m benchmarks.bench_suite --output bench-results.json
+    python -m benchmarks.bench_suite --quick --compare bench-results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import make_frames, make_image, write_video
+
+
+def summarize(seconds, items=1):
+    """Latency percentiles (ms) and throughput of a list of run durations"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {
+        'runs': len(ms),
+        'itemsPerRun': items,
+        'meanMs': float(ms.mean()),
+        'p50Ms': float(np.percentile(ms, 50)),
+        'p90Ms': float(np.percentile(ms, 90)),
+        'p99Ms': float(np.percentile(ms, 99)),
+        'itemsPerSec': float(items * len(ms) / (ms.sum() / 1000.0)) if ms.sum() > 0 else None,
+    }
+
+
+def measure(fn, repeat, warmup=1, items=1):
+    """Run `fn` warmup + repeat times and summarize the timed runs"""
+    for _ in range(warmup):
+        fn()
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return summarize(seconds, items)
+
+
+def encode_jpeg(image_rgb):
+    ok, data = cv2.imencode('.jpg', cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise RuntimeError('Cannot encode synthetic image')
+    return data.tobytes()
+
+
+def environment():
+    """Host, library and git revision information stored with the results"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'gitCommit': commit,
+    }
+
+
+def bench_stages(results, config, backend, face_detector, resolutions, batch_sizes, repeat):
+    """Each pipeline stage on its own"""
+    detection_batch = config.DETECTION_BATCH_SIZE
+    for width, height in resolutions:
+        size = f"{width}x{height}"
+        image = make_image(width, height)
+        encoded = encode_jpeg(image)
+        frames = make_frames(detection_batch, width, height)
+
+        results[f"stage.decode_image.{size}"] = measure(
+            lambda: cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR), repeat
+        )
+        results[f"stage.detect.{size}"] = measure(lambda: face_detector.detect_batch([image]), repeat)
+        results[f"stage.detect_batch{detection_batch}.{size}"] = measure(
+            lambda: face_detector.detect_batch(frames), max(1, repeat // 4), items=len(frames)
+        )
+
+        box = face_detector.detect_batch([image])[0]
+        if box is not None:
+            face = face_detector.crop_face(image, box)
+            results[f"stage.preprocess.{size}"] = measure(
+                lambda: face_detector.preprocess_face(face, config.IMG_SIZE), repeat
+            )
+
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.integers(0, 256, size=(batch_size, *config.IMG_SIZE, 3), dtype=np.uint8)
+        results[f"stage.infer.batch{batch_size}"] = measure(
+            lambda: backend.predict_batch(batch), max(1, repeat // 2), items=batch_size
+        )
+
+
+def bench_video_decode(results, video_processor, videos, repeat):
+    """Sequential frame sampling and decoding of each clip, without detection"""
+    for name, path in videos.items():
+        def decode():
+            cap = cv2.VideoCapture(str(path))
+            try:
+                total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                return sum(1 for _ in video_processor.frame_sampler.iter_frames(cap, total))
+            finally:
+                cap.release()
+        results[f"stage.decode_video.{name}"] = measure(decode, repeat, items=decode())
+
+
+def bench_processors(results, image_processor, video_processor, resolutions, videos, batch_images, repeat, video_repeat):
+    """ImageProcessor and VideoProcessor end to end"""
+    for width, height in resolutions:
+        size = f"{width}x{height}"
+        image_bgr = cv2.cvtColor(make_image(width, height), cv2.COLOR_RGB2BGR)
+        results[f"e2e.image.{size}"] = measure(lambda: image_processor.predict_image_array(image_bgr), repeat)
+
+        encoded = [encode_jpeg(make_image(width, height, seed=seed)) for seed in range(batch_images)]
+        readers = [lambda data=data: data for data in encoded]
+        results[f"e2e.image_batch{batch_images}.{size}"] = measure(
+            lambda: list(image_processor.predict_images(readers)), max(1, repeat // 4), items=batch_images
+        )
+        # Biaya TTA dibanding kasus di atas (seharusnya ~linear terhadap jumlah view)
+        results[f"e2e.image_batch{batch_images}.tta.{size}"] = measure(
+            lambda: list(image_processor.predict_images(readers, 'on')), max(1, repeat // 4), items=batch_images
+        )
+
+    for name, path in videos.items():
+        results[f"e2e.video.{name}"] = measure(lambda: video_processor.predict_video(path), video_repeat)
+
+
+def bench_api(results, resolutions, videos, repeat, video_repeat):
+    """POST /api/analyze through the Flask test client"""
+    from app.main import create_app
+
+    client = create_app().test_client()
+
+    def post(data, filename):
+        response = client.post(
+            '/api/analyze', data={'file': (io.BytesIO(data), filename)}, content_type='multipart/form-data'
+        )
+        if response.status_code >= 500:
+            raise RuntimeError(f"/api/analyze returned {response.status_code}: {response.get_data(as_text=True)}")
+
+    for width, height in resolutions:
+        encoded = encode_jpeg(make_image(width, height))
+        results[f"api.image.{width}x{height}"] = measure(lambda: post(encoded, 'face.jpg'), repeat)
+
+    for name, path in videos.items():
+        data = Path(path).read_bytes()
+        results[f"api.video.{name}"] = measure(lambda: post(data, 'clip.mp4'), video_repeat)
+
+
+def compare(results, baseline_path):
+    """p50 of every case relative to an earlier result file"""
+    baseline = json.loads(Path(baseline_path).read_text())['results']
+    changes = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and previous.get('p50Ms'):
+            changes[name] = {
+                'baselineP50Ms': previous['p50Ms'],
+                'p50Ms': current['p50Ms'],
+                'change': current['p50Ms'] / previous['p50Ms'] - 1.0,
+            }
+    return changes
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=None, help='JSON result file (default: print only)')
+    parser.add_argument('--compare', default=None, help='Earlier result file to compare against')
+    parser.add_argument('--model', default=None, help='Model path (default: MODEL_PATH from .env)')
+    parser.add_argument('--detector', default=None, help='Face detector backend (default: FACE_DETECTOR_BACKEND)')
+    parser.add_argument('--resolutions', nargs='+', type=parse_size, default=[(640, 480), (1280, 720)])
+    parser.add_argument('--video-lengths', nargs='+', type=int, default=[30, 90, 300], help='Frames per clip')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32], help='Forward pass batch sizes')
+    parser.add_argument('--batch-images', type=int, default=32, help='Images per batched request')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per image case')
+    parser.add_argument('--video-repeat', type=int, default=3, help='Timed runs per video case')
+    parser.add_argument('--skip', nargs='*', default=[], choices=['stages', 'processors', 'api'])
+    parser.add_argument('--quick', action='store_true', help='Small sizes and few runs (smoke test)')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.resolutions, args.video_lengths, args.batch_sizes = [(640, 480)], [30], [1, 8]
+        args.batch_images, args.repeat, args.video_repeat = 8, 5, 1
+
+    # Config membaca environment saat di-import, jadi diset sebelum import app
+    os.environ['RESULT_CACHE_ENABLED'] = 'False'
+    os.environ['CROP_STORE_DIR'] = ''
+    # TTA hanya dipakai oleh kasus *.tta; kasus lain memakai mode 'off'
+    os.environ['TTA_MODE'] = 'off'
+    if not os.environ.get('TTA_VIEWS', 'flip').strip(','):
+        os.environ['TTA_VIEWS'] = 'flip'
+    if args.model:
+        os.environ['MODEL_PATH'] = str(Path(args.model).resolve())
+        os.environ['MODEL_PRECISION'] = 'fp32'
+    if args.detector:
+        os.environ['FACE_DETECTOR_BACKEND'] = args.detector
+
+    from app.config import Config
+    from app.services.factory import build_services
+
+    # Wiring yang sama dengan create_app(), tanpa result cache
+    services = build_services(Config, result_cache=False)
+    backend, face_detector = services.backend, services.face_detector
+    scheduler = services.inference_scheduler
+    image_processor, video_processor = services.image_processor, services.video_processor
+    report = {
+        'environment': environment(),
+        'settings': {
+            'model': str(Config.MODEL_PATH),
+            'framework': backend.framework,
+            'detector': Config.FACE_DETECTOR_BACKEND,
+            'detectionSize': Config.FACE_DETECTION_SIZE,
+            'imgSize': list(Config.IMG_SIZE),
+            'framesPerVideo': Config.FRAMES_PER_VIDEO,
+            'frameSkip': Config.FRAME_SKIP,
+            'inferenceMaxBatchSize': Config.INFERENCE_MAX_BATCH_SIZE,
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        'results': {},
+    }
+    results = report['results']
+
+    with tempfile.TemporaryDirectory(prefix='bench-suite-') as tmp:
+        videos = {}
+        for width, height in args.resolutions:
+            for length in args.video_lengths:
+                name = f"{length}f.{width}x{height}"
+                videos[name] = write_video(Path(tmp) / f"{name}.mp4", length, width, height)
+
+        started = time.perf_counter()
+        if 'stages' not in args.skip:
+            bench_stages(results, Config, backend, face_detector, args.resolutions, args.batch_sizes, args.repeat)
+            bench_video_decode(results, video_processor, videos, args.video_repeat)
+        if 'processors' not in args.skip:
+            bench_processors(results, image_processor, video_processor, args.resolutions, videos,
+                             args.batch_images, args.repeat, args.video_repeat)
+        if 'api' not in args.skip:
+            bench_api(results, args.resolutions, videos, args.repeat, args.video_repeat)
+        report['seconds'] = time.perf_counter() - started
+
+    scheduler.shutdown()
+    report['inference'] = scheduler.get_stats()
+    if args.compare:
+        report['comparison'] = compare(results, args.compare)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Synthetic face images and clips for benchmarks (no downloads needed)"""
+import cv2
+import numpy as np
+
+
+def draw_face(frame, center, size, rng=None):
+    """Draw a simple frontal face (skin ellipse, eyes, nose, mouth) in place"""
+    rng = rng or np.random.default_rng(0)
+    cx, cy = int(center[0]), int(center[1])
+    w, h = int(size * 0.8), int(size)
+
+    skin = tuple(int(c) for c in rng.integers([150, 110, 90], [230, 180, 150]))
+    cv2.ellipse(frame, (cx, cy), (w // 2, h // 2), 0, 0, 360, skin, -1)
+
+    eye_y = cy - h // 8
+    for dx in (-w // 5, w // 5):
+        cv2.ellipse(frame, (cx + dx, eye_y), (w // 10, h // 22), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(frame, (cx + dx, eye_y), max(1, h // 28), (40, 30, 20), -1)
+        cv2.line(frame, (cx + dx - w // 9, eye_y - h // 12), (cx + dx + w // 9, eye_y - h // 12), (60, 40, 30), max(1, h // 60))
+
+    cv2.line(frame, (cx, eye_y + h // 20), (cx - w // 16, cy + h // 10), (120, 80, 70), max(1, h // 80))
+    cv2.ellipse(frame, (cx, cy + h // 4), (w // 6, h // 20), 0, 0, 180, (150, 50, 60), max(1, h // 40))
+    return frame
+
+
+def make_image(width=640, height=480, face_size=None, seed=0):
+    """Return one RGB uint8 image with a synthetic face on a noisy background"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 80, size=(height, width, 3), dtype=np.uint8)
+    face_size = face_size or int(min(width, height) * 0.5)
+    draw_face(frame, (width // 2, height // 2), face_size, rng)
+    return frame
+
+
+def make_frames(num_frames=90, width=640, height=480, seed=0):
+    """Return a list of RGB frames of a slowly moving talking-head style clip"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 80, size=(height, width, 3), dtype=np.uint8)
+    face_size = int(min(width, height) * 0.5)
+    face_rng_seed = int(rng.integers(0, 2 ** 31))
+
+    frames = []
+    for i in range(num_frames):
+        frame = background.copy()
+        dx = np.sin(i / 15.0) * width * 0.05
+        dy = np.cos(i / 20.0) * height * 0.03
+        draw_face(frame, (width / 2 + dx, height / 2 + dy), face_size, np.random.default_rng(face_rng_seed))
+        frames.append(frame)
+    return frames
+
+
+def write_video(path, num_frames=90, width=640, height=480, fps=30, seed=0):
+    """Write a synthetic clip to `path` (mp4v) and return the path"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for frame in make_frames(num_frames, width, height, seed):
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    writer.release()
+    return path
@@ -0,0 +1,48 @@
+"""
+Export the classifier to ONNX / TorchScript for serving
+
+Usage:
+    python export_model.py --model app/models/efficientnet-ariq.pth
+    python export_model.py --model app/models/ResNet50_final.keras --formats onnx
+
+Set MODEL_PATH to the written .onnx (ONNX Runtime) or .pt (TorchScript) file
+to serve it. Exits with status 1 when an exported graph fails the parity check.
+"""
+import argparse
+import json
+import sys
+
+from app.config import Config
+from app.utils.model_export import export_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the deepfake classifier to ONNX and TorchScript')
+    parser.add_argument('--model', default=str(Config.MODEL_PATH), help='Path to the .pth or .keras model')
+    parser.add_argument('--output-dir', default=None, help='Output folder (default: next to the model)')
+    parser.add_argument('--formats', nargs='+', default=['onnx', 'torchscript'], choices=['onnx', 'torchscript'])
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset version')
+    parser.add_argument('--atol', type=float, default=1e-4, help='Maximum allowed score difference')
+    args = parser.parse_args()
+
+    report = export_model(
+        args.model,
+        output_dir=args.output_dir,
+        img_size=Config.IMG_SIZE,
+        formats=args.formats,
+        opset=args.opset,
+        atol=args.atol
+    )
+    print(json.dumps(report, indent=2))
+
+    failed = [fmt for fmt, result in report.items() if not result['parity']['passed']]
+    if failed:
+        print(f"❌ Parity check failed for: {', '.join(failed)}")
+        return 1
+
+    print("✅ All exported models match the original model")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
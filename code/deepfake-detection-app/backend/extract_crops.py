@@ -0,0 +1,163 @@
+"""
+Extract face crops of video datasets once into a CropStore
+
+Usage:
+    python extract_crops.py data/FaceForensics data/Celeb-DF --store crops/ --workers 4
+
+Frames are sampled and faces detected exactly like the API does (same .env
+settings), and every video is keyed by its content hash. With
+CROP_STORE_DIR=<store> the server reuses these crops instead of decoding the
+videos again (the list of extracted videos is read at server start, restart
+the server after extracting more), and training code reads them
+memory-mapped (see code/experiment/util/crop_dataset.py). Labels come from a `real`/`fake`
+parent folder. Videos already in the store are skipped, so the command can
+be re-run after an interruption.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app.config import Config
+from app.utils.bulk_scan import collect_files
+from app.utils.crop_store import CropStore, CropStoreWriter, crop_namespace
+
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+
+# Nama folder -> label (1 = real, sama dengan arti skor model)
+LABELS = {'real': 1, 'fake': 0}
+
+_pipeline = {}
+
+
+def init_worker():
+    from app.services.face_detector import FaceDetector
+    from app.services.video_pipeline import VideoPipeline
+    from app.utils.video_processor import SequentialFrameSampler
+
+    face_detector = FaceDetector(
+        confidence_threshold=Config.FACE_DETECTION_CONFIDENCE,
+        detection_size=Config.FACE_DETECTION_SIZE,
+        backend=Config.FACE_DETECTOR_BACKEND,
+        backend_options={
+            'prototxt': Config.FACE_DNN_PROTOTXT,
+            'model': Config.FACE_DNN_MODEL
+        },
+        crop_size=Config.IMG_SIZE
+    )
+    # Hanya tahap deteksi yang dipakai, tanpa classifier
+    _pipeline['pipeline'] = VideoPipeline(
+        face_detector,
+        None,
+        detection_batch_size=Config.DETECTION_BATCH_SIZE,
+        tracking=Config.FACE_TRACKING,
+        redetect_interval=Config.TRACKING_REDETECT_INTERVAL,
+        min_tracking_confidence=Config.TRACKING_MIN_CONFIDENCE,
+        max_tracking_gap=Config.TRACKING_MAX_FRAME_GAP,
+        multi_face=Config.MULTI_FACE,
+        max_faces=Config.MAX_FACES_PER_FRAME
+    )
+    _pipeline['sampler'] = SequentialFrameSampler(Config.FRAME_SKIP, Config.FRAMES_PER_VIDEO)
+
+
+def extract_video(path, video_id):
+    """Sample, detect and crop one video; returns (video_id, path, frame counts, frame_indices, boxes, crops)"""
+    import cv2
+
+    pipeline = _pipeline['pipeline']
+    cap = cv2.VideoCapture(path)
+    frame_indices, boxes, crops = [], [], []
+    total_frames = sampled = 0
+    try:
+        if not cap.isOpened():
+            return video_id, path, (total_frames, sampled), frame_indices, boxes, crops
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        tracking_state = pipeline.new_tracking_state()
+        stats = {'detectionsRun': 0, 'detectionsSkipped': 0}
+        chunk = []
+
+        def detect():
+            positions, chunk_boxes, chunk_crops = pipeline.detect_chunk(
+                [frame for _, frame in chunk], stats, tracking_state, [frame_idx for frame_idx, _ in chunk]
+            )
+            frame_indices.extend(chunk[position][0] for position in positions)
+            boxes.extend(chunk_boxes)
+            if len(chunk_crops):
+                crops.append(chunk_crops)
+            chunk.clear()
+
+        for frame_idx, frame in _pipeline['sampler'].iter_frames(cap, total_frames):
+            chunk.append((frame_idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+            sampled += 1
+            if len(chunk) >= pipeline.detection_batch_size:
+                detect()
+        if chunk:
+            detect()
+    finally:
+        cap.release()
+    return video_id, path, (total_frames, sampled), frame_indices, boxes, crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract face crops of videos into a crop store')
+    parser.add_argument('paths', nargs='+', help='Video files or directories (scanned recursively)')
+    parser.add_argument('--store', default=str(Config.CROP_STORE_DIR or 'crops'), help='Crop store folder')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--chunk-size', type=int, default=512, help='Crops per chunk file')
+    args = parser.parse_args()
+
+    store = CropStore(args.store, crop_namespace(Config))
+    # Loader training mengumpulkan batch ke satu buffer, ukuran crop harus sama
+    expected = (Config.IMG_SIZE[1], Config.IMG_SIZE[0], 3)
+    other = [shape for shape in store.crop_shapes() if shape != expected]
+    if other:
+        print(f"❌ {args.store} already holds {other[0]} crops, IMG_SIZE gives {expected}; use another --store")
+        return 1
+    known = {str(video_id) for video_id in np.unique(store.index[0]['video_id'])}
+    files = collect_files(args.paths, VIDEO_EXTENSIONS)
+
+    todo = []
+    for path in files:
+        video_id = store.key_for_file(path)
+        if video_id not in known and store.get_video(video_id) is None:
+            todo.append((path, video_id))
+    print(f"{len(files)} videos found, {len(files) - len(todo)} already in {args.store}, {len(todo)} to extract")
+
+    writer = CropStoreWriter(store, args.chunk_size)
+    started = time.perf_counter()
+    faces = 0
+    # Video tanpa wajah tidak punya baris di store dan akan dicoba lagi saat dijalankan ulang
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        paths = [path for path, _ in todo]
+        video_ids = [video_id for _, video_id in todo]
+        for done, (video_id, path, (total_frames, sampled), frame_indices, boxes, crops) in enumerate(
+                executor.map(extract_video, paths, video_ids, chunksize=4), start=1):
+            if crops:
+                label = next((LABELS[p.name.lower()] for p in Path(path).parents if p.name.lower() in LABELS), -1)
+                boxes = np.asarray(boxes, dtype=np.float64)
+                writer.add_video(
+                    video_id, np.concatenate(crops), frame_indices, boxes[:, :4].round(),
+                    confidences=boxes[:, 4], label=label, frames_total=total_frames, frames_sampled=sampled
+                )
+                faces += len(frame_indices)
+            if done % 50 == 0:
+                print(f"  {done}/{len(todo)} videos")
+    writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'videosExtracted': len(todo),
+        'facesStored': faces,
+        'cropsInStore': len(store),
+        'seconds': elapsed,
+        'videosPerSec': len(todo) / elapsed if elapsed else 0.0,
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Gunicorn settings for serving the API with several worker processes
+
+    gunicorn -c gunicorn.conf.py run:app
+
+With GUNICORN_PRELOAD=True (default) the app is created once in the master
+and the workers are forked from it, so the model weights (memory-mapped for
+.pth models, see MODEL_MMAP) and the rest of the app are shared copy-on-write
+instead of being loaded by every worker. TensorFlow and ONNX Runtime cannot
+be forked once they are running; Keras/ONNX models and the MTCNN detector
+are therefore created inside each worker (FORK_SERVING).
+
+Every worker gets its own slice of the CPU cores (INTRA_OP_THREADS) so the
+workers do not oversubscribe the host.
+
+Each worker writes its metrics to METRICS_DIR and GET /metrics returns the
+sum over all workers; the folder is cleared when the server starts.
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+# Bagi core ke semua worker; INTRA_OP_THREADS dari .env tetap diutamakan
+threads_per_worker = max(1, multiprocessing.cpu_count() // max(1, workers))
+if int(os.getenv('INTRA_OP_THREADS', 0)) <= 0:
+    os.environ['INTRA_OP_THREADS'] = str(threads_per_worker)
+threads_per_worker = int(os.environ['INTRA_OP_THREADS'])
+
+# Harus diset sebelum torch/tensorflow/onnxruntime di-import oleh app
+for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+    os.environ.setdefault(variable, str(threads_per_worker))
+
+if preload_app:
+    os.environ['FORK_SERVING'] = 'True'
+
+# Folder metrics bersama; harus di-set sebelum app dibuat (preload)
+if not os.getenv('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = os.path.join(tempfile.gettempdir(), f"deepfake-metrics-{bind.replace(':', '_')}")
+
+
+def on_starting(server):
+    # Snapshot dari run sebelumnya tidak ikut dijumlah
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Thread pool dibuat ulang di worker dengan jatah core-nya sendiri
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(threads_per_worker)
+    cv2 = sys.modules.get('cv2')
+    if cv2 is not None:
+        cv2.setNumThreads(threads_per_worker)
+    server.log.info(f"Worker {worker.pid} using {threads_per_worker} intra-op threads")
@@ -0,0 +1,91 @@
+"""
+Build an INT8 variant of the classifier and compare it with fp32
+
+Usage:
+    python quantize_model.py --calibration-dir data/calib --eval-dir data/heldout
+    python quantize_model.py --model app/models/efficientnet-ariq.onnx --mode dynamic --eval-dir data/heldout
+
+The eval folder must contain `real/` and `fake/` subfolders of face crops.
+Serve the result with MODEL_PRECISION=int8 and QUANTIZED_MODEL_PATH=<output>.
+Exits with status 1 when the AUC drop exceeds --max-auc-drop.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.config import Config
+from app.services.inference_backend import load_backend
+from app.utils.model_quantization import evaluate_backend, load_face_folder, quantize_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize the deepfake classifier to INT8')
+    parser.add_argument('--model', default=str(Config.MODEL_PATH), help='fp32 .pth model or exported .onnx graph')
+    parser.add_argument('--output', default=None, help='Output path (default: <model>.int8.pt / .int8.onnx)')
+    parser.add_argument('--mode', choices=['dynamic', 'static'], default='static')
+    parser.add_argument('--calibration-dir', default=None, help='Face crops used to calibrate static quantization')
+    parser.add_argument('--calibration-limit', type=int, default=512)
+    parser.add_argument('--eval-dir', required=True, help='Held-out face crops in real/ and fake/ subfolders')
+    parser.add_argument('--eval-limit', type=int, default=None, help='Evaluate on a stratified sample of this size')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the calibration and eval samples')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-auc-drop', type=float, default=0.01)
+    args = parser.parse_args()
+
+    model_path = Path(args.model)
+    suffix = '.int8.onnx' if model_path.suffix.lower() == '.onnx' else '.int8.pt'
+    output_path = Path(args.output) if args.output else model_path.with_suffix(suffix)
+
+    calibration_faces = None
+    if args.calibration_dir:
+        calibration_faces, _ = load_face_folder(
+            args.calibration_dir, Config.IMG_SIZE, args.calibration_limit, args.seed
+        )
+        print(f"Loaded {len(calibration_faces)} calibration crops")
+
+    # AUC butuh kedua kelas; dicek sebelum kuantisasi yang lama
+    faces, labels = load_face_folder(args.eval_dir, Config.IMG_SIZE, args.eval_limit, args.seed)
+    real, fake = int((labels == 1).sum()), int((labels == 0).sum())
+    if real == 0 or fake == 0:
+        print(f"❌ The eval set needs real/ and fake/ crops for the AUC gate (real: {real}, fake: {fake})")
+        return 1
+
+    quantize_model(model_path, output_path, args.mode, calibration_faces, Config.IMG_SIZE)
+    print(f"✅ INT8 model written to {output_path}")
+
+    print(f"Evaluating on {len(faces)} held-out crops ({real} real, {fake} fake)")
+
+    # strict: model yang gagal dimuat tidak boleh dinilai dengan skor dummy
+    try:
+        fp32_backend = load_backend(model_path, strict=True)
+        int8_backend = load_backend(output_path, strict=True)
+    except Exception as e:
+        print(f"❌ Cannot load the models to compare: {e}")
+        return 1
+
+    fp32 = evaluate_backend(fp32_backend, faces, labels, args.batch_size)
+    int8 = evaluate_backend(int8_backend, faces, labels, args.batch_size)
+
+    auc_drop = fp32['auc'] - int8['auc']
+    report = {
+        'mode': args.mode,
+        'output': str(output_path),
+        'fp32': fp32,
+        'int8': int8,
+        'speedup': int8['facesPerSec'] / fp32['facesPerSec'] if fp32['facesPerSec'] else None,
+        'aucDrop': auc_drop,
+    }
+    print(json.dumps(report, indent=2))
+
+    # NaN (AUC tidak terdefinisi) juga gagal
+    if not auc_drop <= args.max_auc_drop:
+        print(f"❌ AUC drop {auc_drop:.4f} exceeds {args.max_auc_drop}, do not ship this model")
+        return 1
+
+    print("✅ INT8 model passes the accuracy gate")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Scan files or directory trees for deepfakes without the HTTP API
+
+Usage:
+    python scan_files.py data/videos data/images --output scans/run1.jsonl --workers 4
+    python scan_files.py --file-list todo.txt --output scans/run1.csv --parquet scans/run1.parquet
+
+Results are appended to --output (JSONL, or CSV when it ends in .csv) after
+every file. Running the same command again skips the files already in it, so
+a killed scan resumes where it stopped. Model and detector settings come from
+the same environment/.env as the API.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import Config
+from app.utils.bulk_scan import ScanCheckpoint, init_worker, collect_files, scan_file, worker_threads, write_parquet
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan images and videos for deepfakes')
+    parser.add_argument('paths', nargs='*', help='Files or directories (scanned recursively)')
+    parser.add_argument('--file-list', default=None, help='Text file with one path per line')
+    parser.add_argument('--output', required=True, help='Checkpoint/result file (.jsonl or .csv)')
+    parser.add_argument('--parquet', default=None, help='Also write all results to this Parquet file at the end')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes')
+    parser.add_argument('--threads', type=int, default=0, help='Intra-op threads per worker (0 = cores / workers)')
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    if args.file_list:
+        with open(args.file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    files = collect_files(paths, Config.ALLOWED_EXTENSIONS)
+    checkpoint = ScanCheckpoint(args.output)
+    done = checkpoint.completed_paths()
+    todo = [path for path in files if path not in done]
+    print(f"{len(files)} files found, {len(files) - len(todo)} already in {args.output}, {len(todo)} to scan")
+
+    threads = args.threads or worker_threads(args.workers)
+    scanned = 0
+    failed = 0
+    faces = 0
+    started = time.perf_counter()
+    interrupted = False
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(threads,)) as executor:
+        pending = set()
+        queue = iter(todo)
+        try:
+            while True:
+                # Batasi jumlah future supaya daftar file besar tidak disubmit sekaligus
+                for path in queue:
+                    pending.add(executor.submit(scan_file, path))
+                    if len(pending) >= args.workers * 2:
+                        break
+                if not pending:
+                    break
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    row = future.result()
+                    checkpoint.append(row)
+                    scanned += 1
+                    faces += row['faces']
+                    failed += not row['success']
+                    if scanned % 50 == 0:
+                        print(f"  {scanned}/{len(todo)} files")
+        except KeyboardInterrupt:
+            interrupted = True
+            executor.shutdown(wait=False, cancel_futures=True)
+        except BrokenProcessPool:
+            # init_worker gagal (misalnya model tidak bisa dimuat); checkpoint tidak disentuh
+            print('Error: the worker processes could not start, see the error above (e.g. MODEL_PATH)')
+            executor.shutdown(wait=False, cancel_futures=True)
+            return 1
+        finally:
+            checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'filesScanned': scanned,
+        'filesFailed': failed,
+        'filesSkipped': len(files) - len(todo),
+        'facesAnalyzed': faces,
+        'seconds': elapsed,
+        'filesPerSec': scanned / elapsed if elapsed else 0.0,
+        'facesPerSec': faces / elapsed if elapsed else 0.0,
+        'workers': args.workers,
+        'threadsPerWorker': threads,
+    }
+    print(json.dumps(report, indent=2))
+
+    if interrupted:
+        print(f"⚠️ Interrupted; run the same command again to resume from {args.output}")
+        return 130
+
+    if args.parquet:
+        write_parquet(checkpoint.load(), args.parquet)
+        print(f"✅ Results written to {args.parquet}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Jalankan dari folder mana pun: paket `app` ada di folder backend
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
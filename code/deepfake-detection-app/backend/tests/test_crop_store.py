@@ -0,0 +1,110 @@
+import os
+import time
+
+import numpy as np
+
+from app.utils.content_hash import file_content_hash
+from app.utils.crop_store import CropStore, CropStoreWriter
+
+
+def crops(count, value=0):
+    return np.full((count, 8, 8, 3), value, dtype=np.uint8)
+
+
+def put(store, video_id, count=4):
+    store.put_video(video_id, crops(count), np.arange(count) * 10, np.zeros((count, 4)), frames_total=100,
+                    frames_sampled=count)
+
+
+def test_key_for_file_matches_the_content_hash(tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'video bytes')
+    store = CropStore(tmp_path / 'store', namespace='a')
+    assert store.key_for_file(path) == store.key_for_hash(file_content_hash(path))
+    assert CropStore(tmp_path / 'store', namespace='b').key_for_file(path) != store.key_for_file(path)
+
+
+def test_put_video_is_found_by_name_without_the_index(tmp_path):
+    store = CropStore(tmp_path)
+    put(store, 'a' * 64)
+    # Index global belum pernah dibangun dan tidak dibangun oleh lookup
+    stored, index = store.get_video('a' * 64, indexed=False)
+    assert store._index is None
+    assert stored.shape == (4, 8, 8, 3)
+    np.testing.assert_array_equal(index['frame_idx'], [0, 10, 20, 30])
+
+
+def test_writer_chunks_are_only_found_through_the_index(tmp_path):
+    store = CropStore(tmp_path)
+    writer = CropStoreWriter(store, chunk_size=100)
+    writer.add_video('b' * 64, crops(3, 7), [0, 1, 2], np.zeros((3, 4)), label=1)
+    writer.close()
+
+    assert store.get_video('b' * 64, indexed=False) is None
+    stored, index = store.get_video('b' * 64)
+    assert stored[0, 0, 0, 0] == 7
+    assert index['label'][0] == 1
+
+
+def test_prune_keeps_the_recently_used_videos_within_max_bytes(tmp_path):
+    store = CropStore(tmp_path, prune_interval=0)
+    for number in range(3):
+        put(store, str(number) * 64)
+        # mtime berurutan: video 0 paling lama
+        used_at = time.time() - 100 + number
+        os.utime(tmp_path / f"video-{str(number) * 64}.index.npy", (used_at, used_at))
+
+    writer = CropStoreWriter(store)
+    writer.add_video('w' * 64, crops(50), np.arange(50), np.zeros((50, 4)))
+    writer.close()
+
+    chunk_bytes = sum(path.stat().st_size for path in tmp_path.glob(f"video-{'0' * 64}*"))
+    store.max_bytes = 2 * chunk_bytes
+    assert store.prune() == 1
+    assert store.get_video('0' * 64) is None
+    assert store.get_video('1' * 64, indexed=False) is not None
+    # Chunk offline tidak ikut dihapus meskipun lebih besar
+    assert store.get_video('w' * 64) is not None
+
+
+def test_put_video_drops_expired_videos(tmp_path):
+    store = CropStore(tmp_path, max_age=60, prune_interval=0)
+    put(store, 'a' * 64)
+    expired = time.time() - 120
+    os.utime(tmp_path / f"video-{'a' * 64}.index.npy", (expired, expired))
+
+    put(store, 'b' * 64)
+    assert store.get_video('a' * 64, indexed=False) is None
+    assert store.get_video('b' * 64, indexed=False) is not None
+
+
+def test_offline_videos_are_found_without_rescanning_the_store(tmp_path, monkeypatch):
+    store = CropStore(tmp_path)
+    writer = CropStoreWriter(store, chunk_size=100)
+    writer.add_video('b' * 64, crops(3, 7), [0, 1, 2], np.zeros((3, 4)))
+    writer.close()
+
+    builds = []
+    build = store._build_offline_videos
+    monkeypatch.setattr(store, '_build_offline_videos', lambda: builds.append(1) or build())
+
+    assert store.load_offline_videos() == 1
+    for number in range(3):
+        # Video yang ditulis server tidak membuat peta offline dibaca ulang
+        put(store, str(number) * 64)
+        assert store.get_video('b' * 64)[0][0, 0, 0, 0] == 7
+        assert store.get_video(str(number) * 64) is not None
+    assert store.get_video('c' * 64) is None
+    assert len(builds) == 1
+
+
+def test_crop_shapes_lists_the_chunks_of_every_size(tmp_path):
+    store = CropStore(tmp_path)
+    put(store, 'small')
+    store.put_video('large', np.zeros((2, 16, 16, 3), dtype=np.uint8), np.arange(2), np.zeros((2, 4)))
+    store.refresh()
+
+    shapes = store.crop_shapes()
+
+    assert sorted(shapes) == [(8, 8, 3), (16, 16, 3)]
+    assert store.crop_shapes(np.flatnonzero(store.index[0]['video_id'] == 'small')) == {(8, 8, 3): shapes[(8, 8, 3)]}
@@ -0,0 +1,121 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.services.video_pipeline import VideoPipeline
+from app.utils.early_exit import SequentialMeanTest
+
+
+class FakeDetector:
+    """One face per frame, crops are tiny zero images"""
+
+    def detect_batch(self, frames):
+        return [(0, 0, 4, 4, 0.99) for _ in frames]
+
+    def crop_faces(self, frames, boxes, target_size=(224, 224), margin=5):
+        return np.zeros((len(frames), 8, 8, 3), dtype=np.uint8), list(range(len(frames)))
+
+
+class FakeScheduler:
+    """Scores every submitted batch immediately with the next scores of `scores`"""
+
+    def __init__(self, scores, max_batch_size=32):
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = []
+
+    def submit(self, faces, tta=None, embeddings=False):
+        start = sum(self.batch_sizes)
+        self.batch_sizes.append(len(faces))
+        future = Future()
+        future.set_result(self.scores[start:start + len(faces)])
+        return future
+
+
+def frames(count):
+    for frame_idx in range(count):
+        yield frame_idx * 3, np.zeros((8, 8, 3), dtype=np.uint8)
+
+
+def run(scores, count, stop_rule=None, detection_batch_size=8):
+    scheduler = FakeScheduler(scores)
+    pipeline = VideoPipeline(FakeDetector(), scheduler, detection_batch_size=detection_batch_size, detection_workers=1)
+    predictions, frames_extracted, stats, faces = pipeline.run(frames(count), stop_rule=stop_rule)
+    stats['framesExtracted'] = frames_extracted
+    return predictions, stats, faces, scheduler
+
+
+def test_sequential_mean_test_settles_clear_mean():
+    test = SequentialMeanTest(confidence=0.95, min_samples=4)
+    assert not test.update([0.9, 0.92])
+    assert test.update([0.91, 0.93])
+
+
+def test_sequential_mean_test_keeps_going_when_ambiguous():
+    test = SequentialMeanTest(confidence=0.95, min_samples=4)
+    assert not test.update([0.1, 0.9, 0.2, 0.8])
+
+
+def test_early_exit_fires_before_a_full_inference_batch():
+    # 30 wajah < max_batch_size 32: dulu batch pertama baru dikirim di akhir
+    scores = 0.9 + np.random.default_rng(0).uniform(-0.02, 0.02, 30)
+    predictions, stats, faces, scheduler = run(scores, 30, SequentialMeanTest(0.95, 16))
+
+    assert stats['earlyExit']
+    assert scheduler.batch_sizes[0] == 16
+    # Wajah yang sudah dideteksi tetap dinilai, metadata sejajar dengan skor
+    assert len(predictions) == stats['framesExtracted']
+    assert len(faces[0]) == len(predictions)
+
+
+def test_early_exit_stops_decoding_and_detection():
+    scores = 0.9 + np.random.default_rng(1).uniform(-0.02, 0.02, 300)
+    predictions, stats, faces, scheduler = run(scores, 300, SequentialMeanTest(0.95, 4), detection_batch_size=16)
+
+    assert stats['earlyExit']
+    # Decode hanya mendahului skor dua batch, jadi video tidak didecode sampai habis
+    assert stats['framesExtracted'] <= 16
+    assert stats['detectionsRun'] == stats['framesExtracted']
+    # Satu wajah per frame: semua frame yang dipakai punya wajah yang dinilai
+    assert len(predictions) == stats['framesExtracted']
+    np.testing.assert_array_equal(faces[0], np.arange(len(predictions)) * 3)
+
+
+def test_no_early_exit_on_ambiguous_scores():
+    scores = np.tile([0.2, 0.8], 15)
+    predictions, stats, _, _ = run(scores, 30, SequentialMeanTest(0.95, 16))
+
+    assert not stats['earlyExit']
+    np.testing.assert_allclose(predictions, scores)
+
+
+def test_without_stop_rule_every_face_is_scored_in_full_batches():
+    scores = np.linspace(0, 1, 40)
+    predictions, stats, faces, scheduler = run(scores, 40)
+
+    assert not stats['earlyExit']
+    assert scheduler.batch_sizes == [32, 8]
+    np.testing.assert_allclose(predictions, scores.astype(np.float32))
+    np.testing.assert_array_equal(faces[0], np.arange(40) * 3)
+
+
+def test_stored_crops_are_scored_one_batch_at_a_time(tmp_path):
+    from app.services.video_processor import VideoProcessor
+    from app.utils.crop_store import CropStore
+
+    store = CropStore(tmp_path)
+    store.put_video('a' * 64, np.zeros((60, 8, 8, 3), dtype=np.uint8), np.arange(60) * 3, np.zeros((60, 4)),
+                    frames_total=200, frames_sampled=60)
+    scores = 0.9 + np.random.default_rng(2).uniform(-0.02, 0.02, 60)
+    scheduler = FakeScheduler(scores)
+    processor = VideoProcessor(FakeDetector(), scheduler, early_exit=True, early_exit_confidence=0.95,
+                               early_exit_min_faces=4, crop_store=store)
+
+    predictions, _, frames_used, stats, faces = processor._score_stored('a' * 64)
+
+    assert stats['earlyExit']
+    # Batch berikutnya baru dikirim setelah skor batch sebelumnya dicek
+    assert scheduler.batch_sizes == [4] * len(scheduler.batch_sizes)
+    assert sum(scheduler.batch_sizes) == len(predictions) < 60
+    assert frames_used == len(predictions)
+    assert len(faces[0]) == len(predictions)
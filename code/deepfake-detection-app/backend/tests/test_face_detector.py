@@ -0,0 +1,14 @@
+import numpy as np
+
+from app.services.face_detector import FaceDetector
+
+
+def test_crops_use_the_configured_size():
+    # per_process: backend dibuat saat deteksi pertama, tidak dibutuhkan di sini
+    detector = FaceDetector(backend='haar', per_process=True, crop_size=(96, 128))
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    crops, kept = detector.crop_faces([frame], [(10, 10, 50, 60, 0.9)])
+    assert crops.shape == (1, 128, 96, 3)
+    assert kept == [0]
+    assert detector.preprocess_face(frame[:50, :50]).shape == (128, 96, 3)
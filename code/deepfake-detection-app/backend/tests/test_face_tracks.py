@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.utils.face_tracks import assign_tracks, box_iou
+
+
+def test_box_iou():
+    iou = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 10, 10], [20, 20, 5, 5]])
+    np.testing.assert_allclose(iou, [[1.0, 50 / 150, 0.0]])
+
+
+def test_two_faces_keep_their_tracks():
+    frame_indices = [0, 0, 10, 10, 20, 20]
+    # Urutan wajah per frame sengaja ditukar di frame 10
+    boxes = [
+        [0, 0, 50, 50, 0.9], [200, 0, 50, 50, 0.9],
+        [202, 1, 50, 50, 0.9], [2, 1, 50, 50, 0.9],
+        [4, 2, 50, 50, 0.9], [204, 2, 50, 50, 0.9],
+    ]
+    np.testing.assert_array_equal(assign_tracks(frame_indices, boxes), [0, 1, 1, 0, 0, 1])
+
+
+def test_gap_larger_than_max_gap_starts_a_new_track():
+    boxes = [[0, 0, 50, 50]] * 3
+    np.testing.assert_array_equal(assign_tracks([0, 10, 100], boxes, max_gap=20), [0, 0, 1])
+    np.testing.assert_array_equal(assign_tracks([0, 10, 100], boxes), [0, 0, 0])
+
+
+def test_empty_input():
+    assert len(assign_tracks([], np.empty((0, 5)))) == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from app.config import Config
+from app.services.factory import build_services
+from app.services.inference_backend import DummyBackend
+from app.utils import bulk_scan
+
+
+@pytest.fixture
+def missing_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'MODEL_PATH', tmp_path / 'missing.pth')
+    monkeypatch.setattr(Config, 'MODEL_PRECISION', 'fp32')
+    monkeypatch.setattr(Config, 'TEMPORAL_HEAD_PATH', None)
+    monkeypatch.setattr(Config, 'FACE_DETECTOR_BACKEND', 'haar')
+    monkeypatch.setattr(Config, 'CROP_STORE_DIR', None)
+    return Config
+
+
+def test_server_falls_back_to_the_dummy_backend(missing_model):
+    services = build_services(missing_model, result_cache=False)
+    assert isinstance(services.backend, DummyBackend)
+
+
+def test_strict_build_raises_when_the_model_cannot_be_loaded(missing_model):
+    with pytest.raises(Exception):
+        build_services(missing_model, result_cache=False, strict=True)
+
+
+def test_bulk_scan_worker_fails_instead_of_scanning_with_dummy_scores(missing_model, monkeypatch):
+    monkeypatch.setattr(bulk_scan, '_worker', {})
+    with pytest.raises(Exception):
+        bulk_scan.init_worker(1)
+    assert 'video' not in bulk_scan._worker
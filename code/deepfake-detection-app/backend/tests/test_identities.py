@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app.services.video_processor import VideoProcessor
+
+
+def make_processor():
+    # Detector dan scheduler tidak dipakai oleh _build_result
+    return VideoProcessor(None, None, frames_per_video=30, frame_skip=3, multi_face=True, min_identity_faces=3)
+
+
+def faces_of(frame_indices, boxes):
+    return np.asarray(frame_indices), np.asarray(boxes, dtype=np.float32), None
+
+
+def test_identities_follow_the_sample_spacing():
+    # Video panjang: 30 frame sampel berjarak 62 frame, jauh di atas frame_skip
+    frame_indices = np.arange(30) * 62
+    faces = faces_of(frame_indices, [[10, 10, 50, 50, 0.9]] * 30)
+    identities = make_processor()._identities(np.full(30, 0.8), faces)
+    assert len(identities) == 1
+    assert identities[0]['faces'] == 30
+
+
+def test_short_identities_do_not_decide_the_verdict():
+    # Satu wajah real di semua frame, satu deteksi palsu sekali dengan skor fake
+    frame_indices = list(np.arange(10) * 62) + [124]
+    boxes = [[10, 10, 50, 50, 0.9]] * 10 + [[300, 300, 40, 40, 0.6]]
+    predictions = np.array([0.9] * 10 + [0.1])
+    result = make_processor()._build_result(predictions, 620, 10, {}, faces_of(frame_indices, boxes))
+    assert result['isFake'] is False
+    assert len(result['details']['identities']) == 2
+    assert result['details']['mostSuspiciousIdentity'] == 0
+
+
+def test_no_long_identity_falls_back_to_the_mean():
+    frame_indices = [0, 62]
+    boxes = [[10, 10, 50, 50, 0.9], [300, 300, 40, 40, 0.9]]
+    predictions = np.array([0.9, 0.3])
+    result = make_processor()._build_result(predictions, 124, 2, {}, faces_of(frame_indices, boxes))
+    assert result['isFake'] is False
+    assert result['confidence'] == pytest.approx(60.0)
+    assert result['details']['mostSuspiciousIdentity'] is None
@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+import time
+
+from app.services.job_manager import JobManager
+
+
+def wait_for(manager, job_id, status='done'):
+    deadline = time.time() + 5
+    while manager.get(job_id)['status'] != status:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_progress_ticks_are_not_all_written(tmp_path, monkeypatch):
+    manager = JobManager(state_dir=tmp_path)
+    writes = []
+    persist = manager._persist
+    monkeypatch.setattr(manager, '_persist', lambda job: (writes.append(job.status), persist(job)))
+    release = threading.Event()
+
+    def work(job):
+        for frame in range(100):
+            job.set_progress(framesDecoded=frame)
+        release.wait(5)
+        return {'isFake': False}
+
+    job = manager.submit(work, 'clip.mp4', 'video')
+    release.set()
+    wait_for(manager, job.id)
+
+    # queued, running, satu tick progress, done
+    assert writes.count('running') <= 2
+    assert writes[-1] == 'done'
+    assert json.loads((tmp_path / f"{job.id}.json").read_text())['status'] == 'done'
+
+
+def test_evicted_jobs_lose_their_state_file(tmp_path):
+    manager = JobManager(result_ttl=0, state_dir=tmp_path)
+    first = manager.create_finished('a.jpg', 'image', {'isFake': True})
+    assert (tmp_path / f"{first.id}.json").exists()
+
+    time.sleep(0.01)
+    manager.create_finished('b.jpg', 'image', {'isFake': True})
+
+    assert not (tmp_path / f"{first.id}.json").exists()
+
+
+def test_expired_files_of_earlier_runs_are_swept_at_startup(tmp_path):
+    old = time.time() - 7200
+    (tmp_path / 'expired.json').write_text(json.dumps({'status': 'done', 'finishedAt': old}))
+    (tmp_path / 'abandoned.json').write_text(json.dumps({'status': 'running', 'finishedAt': None}))
+    os.utime(tmp_path / 'abandoned.json', (old, old))
+    (tmp_path / 'recent.json').write_text(json.dumps({'status': 'done', 'finishedAt': time.time()}))
+
+    JobManager(result_ttl=3600, state_dir=tmp_path)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['recent.json']
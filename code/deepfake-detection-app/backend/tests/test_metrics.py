@@ -0,0 +1,42 @@
+from app.utils.metrics import MetricsRegistry, SharedMetricsDir
+
+
+def make_registry():
+    registry = MetricsRegistry()
+    lookups = registry.counter('lookups_total', 'Lookups', ('result',))
+    latency = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+    return registry, lookups, latency
+
+
+def test_snapshots_of_two_registries_are_summed():
+    first, first_lookups, first_latency = make_registry()
+    second, second_lookups, second_latency = make_registry()
+    first_lookups.inc(result='hit')
+    first_lookups.inc(result='miss')
+    second_lookups.inc(2, result='hit')
+    first_latency.observe(0.05, stage='detect')
+    second_latency.observe(0.5, stage='detect')
+    second_latency.observe(5.0, stage='detect')
+
+    text = first.render([first.snapshot(), second.snapshot()])
+
+    assert 'lookups_total{result="hit"} 3' in text
+    assert 'lookups_total{result="miss"} 1' in text
+    assert 'latency_seconds_bucket{stage="detect",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="detect",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="detect",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{stage="detect"} 5.55' in text
+    assert 'latency_seconds_count{stage="detect"} 3' in text
+
+
+def test_shared_dir_sums_the_processes_and_keeps_exited_ones(tmp_path):
+    worker, lookups, _ = make_registry()
+    lookups.inc(result='hit')
+    (tmp_path / '1-exited.json').write_text('{"lookups_total": [[["hit"], 4]]}')
+
+    shared = SharedMetricsDir(tmp_path, worker, flush_interval=60)
+
+    assert 'lookups_total{result="hit"} 5' in shared.render()
+    lookups.inc(result='hit')
+    assert 'lookups_total{result="hit"} 6' in shared.render()
+    assert len(list(tmp_path.glob('*.json'))) == 2
@@ -0,0 +1,24 @@
+import math
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('torch')
+
+from app.utils.model_quantization import roc_auc, sample_paths
+
+
+def test_limited_sample_keeps_both_classes():
+    paths = sorted([Path(f'eval/fake/{i:03d}.jpg') for i in range(50)] +
+                   [Path(f'eval/real/{i:03d}.jpg') for i in range(50)])
+
+    sample = sample_paths(paths, 10, seed=3)
+
+    assert len(sample) == 10
+    assert sum(path.parent.name == 'real' for path in sample) == 5
+    assert sample == sample_paths(paths, 10, seed=3)
+    assert sample != sample_paths(paths, 10, seed=4)
+
+
+def test_auc_of_a_single_class_is_undefined():
+    assert math.isnan(roc_auc([1, 1, 1], [0.2, 0.5, 0.9]))
@@ -0,0 +1,52 @@
+import hashlib
+import io
+
+from app.utils.result_cache import ResultCache
+
+
+def test_set_and_get():
+    cache = ResultCache()
+    cache.set('a', {'isFake': True})
+    assert cache.get('a') == {'isFake': True}
+    assert cache.get('b') is None
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = ResultCache(ttl_seconds=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    ResultCache(disk_dir=tmp_path).set('a', {'confidence': 91.5})
+    cache = ResultCache(disk_dir=tmp_path)
+    assert cache.get('a') == {'confidence': 91.5}
+    assert cache.get_stats()['diskHits'] == 1
+
+
+def test_keys_depend_on_content_kind_and_namespace():
+    cache = ResultCache(namespace='model-a')
+    stream = io.BytesIO(b'video bytes')
+    key = cache.make_key(stream, 'video')
+
+    # Stream dikembalikan ke awal untuk dibaca processor
+    assert stream.read() == b'video bytes'
+    # Key bisa diturunkan dari hash isi yang sudah dihitung di tempat lain
+    assert cache.key_for_hash(hashlib.sha256(b'video bytes').hexdigest(), 'video') == key
+
+    assert cache.make_key(io.BytesIO(b'video bytes'), 'image') != key
+    assert ResultCache(namespace='model-b').make_key(io.BytesIO(b'video bytes'), 'video') != key
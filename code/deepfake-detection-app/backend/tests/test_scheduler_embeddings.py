@@ -0,0 +1,55 @@
+import numpy as np
+
+from app.services.inference_scheduler import InferenceScheduler
+from app.utils.tta import TestTimeAugmentation as TTA
+
+
+class MeanBackend:
+    """Score = mean pixel / 255 of the left half, embedding = [mean of left half, mean of right half]"""
+
+    framework = 'fake'
+    supports_embeddings = True
+
+    def predict_batch(self, faces):
+        return self.predict_batch_with_embeddings(faces)[0]
+
+    def predict_batch_with_embeddings(self, faces):
+        faces = np.asarray(faces, dtype=np.float32)
+        half = faces.shape[2] // 2
+        left = faces[:, :, :half].mean(axis=(1, 2, 3)) / 255.0
+        right = faces[:, :, half:].mean(axis=(1, 2, 3)) / 255.0
+        return left.astype(np.float32), np.stack([left, right], axis=1).astype(np.float32)
+
+
+def make_faces():
+    faces = np.zeros((3, 4, 4, 3), dtype=np.uint8)
+    faces[:, :, :2] = np.array([40, 128, 200], dtype=np.uint8)[:, None, None, None]
+    return faces
+
+
+def test_tta_scores_with_embeddings_of_the_original_crops():
+    scheduler = InferenceScheduler(MeanBackend(), max_batch_size=64, max_wait_ms=0, tta=TTA(('flip',)))
+    faces = make_faces()
+    try:
+        scores, embeddings = scheduler.submit(faces, 'on', embeddings=True).result(timeout=5)
+        plain_scores, plain_embeddings = scheduler.submit(faces, 'off', embeddings=True).result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+    # Flip memindahkan piksel ke kanan, jadi skor TTA = rata-rata asli dan 0
+    np.testing.assert_allclose(scores, plain_scores / 2, rtol=1e-6)
+    np.testing.assert_allclose(embeddings, plain_embeddings)
+
+
+def test_borderline_rescoring_keeps_the_embeddings():
+    scheduler = InferenceScheduler(MeanBackend(), max_batch_size=64, max_wait_ms=0, tta=TTA(('flip',), borderline_margin=0.1))
+    faces = make_faces()
+    try:
+        scores, embeddings = scheduler.submit(faces, 'borderline', embeddings=True).result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+    original = np.array([40, 128, 200], dtype=np.float32) / 255.0
+    # Hanya crop kedua (~0.5) yang dinilai ulang dengan flip
+    np.testing.assert_allclose(scores, [original[0], original[1] / 2, original[2]], rtol=1e-6)
+    np.testing.assert_allclose(embeddings[:, 0], original, rtol=1e-6)
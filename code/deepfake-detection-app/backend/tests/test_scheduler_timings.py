@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+from app.services.inference_scheduler import InferenceScheduler
+from app.utils.metrics import request_timer
+from app.utils.tta import TestTimeAugmentation as TTA
+
+
+class SlowBackend:
+    """Takes 1 ms per crop"""
+
+    framework = 'fake'
+
+    def predict_batch(self, faces):
+        time.sleep(0.001 * len(faces))
+        return np.full(len(faces), 0.5, dtype=np.float32)
+
+
+def test_infer_time_is_added_to_the_request_timer():
+    scheduler = InferenceScheduler(SlowBackend(), max_batch_size=64, max_wait_ms=0, tta=TTA(('flip',)))
+    try:
+        with request_timer('test') as plain:
+            scheduler.predict(np.zeros((20, 4, 4, 3), dtype=np.uint8), tta='off')
+        # Skor 0.5 selalu borderline, jadi view flip dikirim dari callback worker
+        with request_timer('test') as borderline:
+            scheduler.predict(np.zeros((20, 4, 4, 3), dtype=np.uint8), tta='borderline')
+    finally:
+        scheduler.shutdown()
+
+    assert plain.as_dict()['infer'] >= 20.0
+    assert borderline.as_dict()['infer'] >= 40.0
+
+
+def test_shared_batch_time_is_split_between_requests():
+    # Kedua request masuk antrian sebelum batch pertama diambil (max_wait 200 ms)
+    scheduler = InferenceScheduler(SlowBackend(), max_batch_size=64, max_wait_ms=200)
+    try:
+        with request_timer('test') as small:
+            small_future = scheduler.submit(np.zeros((10, 4, 4, 3), dtype=np.uint8))
+        with request_timer('test') as large:
+            large_future = scheduler.submit(np.zeros((30, 4, 4, 3), dtype=np.uint8))
+        small_future.result(timeout=5)
+        large_future.result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+    stats = scheduler.get_stats()
+    assert stats['batchesTotal'] == 1
+    # Request besar menanggung tiga kali bagian request kecil dari forward pass yang sama
+    small_ms, large_ms = small.as_dict()['infer'], large.as_dict()['infer']
+    assert abs(large_ms / small_ms - 3.0) < 0.01
+    assert abs(small_ms + large_ms - stats['lastBatch']['inferenceMs']) < 0.1
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_importing_the_module_does_not_import_torch():
+    # Proses baru: torch mungkin sudah di-import oleh test lain
+    code = "import sys, app.services.temporal_head; print('torch' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).resolve().parents[1],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.utils.tta import TestTimeAugmentation as TTA
+
+
+def test_merge_averages_views_per_crop():
+    # 3 view x 2 crop, view demi view
+    scores = [0.2, 0.8, 0.4, 0.6, 0.6, 1.0]
+    np.testing.assert_allclose(TTA.merge(scores, 2), [0.4, 0.8], rtol=1e-6)
+
+
+def test_merge_with_separate_original_scores():
+    merged = TTA.merge([0.2, 0.4], 2, original=np.array([0.8, 0.6], dtype=np.float32))
+    np.testing.assert_allclose(merged, [0.5, 0.5], rtol=1e-6)
+
+
+def test_expand_stacks_views_and_flips():
+    faces = np.arange(2 * 4 * 4 * 3, dtype=np.uint8).reshape(2, 4, 4, 3)
+    tta = TTA(views=('flip', 'zoom'))
+    expanded = tta.expand(faces)
+
+    assert expanded.shape == (3 * 2, 4, 4, 3)
+    np.testing.assert_array_equal(expanded[:2], faces)
+    np.testing.assert_array_equal(expanded[2:4], faces[:, :, ::-1])
+    assert tta.num_views == 3
+
+
+def test_zoom_of_one_is_identity():
+    faces = np.random.default_rng(0).integers(0, 256, (2, 6, 6, 3), dtype=np.uint8)
+    np.testing.assert_array_equal(TTA(views=('zoom',), zoom=1.0).expand(faces, False), faces)
+
+
+def test_borderline_selects_scores_near_half():
+    tta = TTA(borderline_margin=0.1)
+    np.testing.assert_array_equal(tta.borderline([0.05, 0.45, 0.55, 0.95]), [1, 2])
+
+
+def test_unknown_view_is_rejected():
+    with pytest.raises(ValueError):
+        TTA(views=('rotate',))
@@ -0,0 +1,211 @@
+"""
+Train the temporal head of the video verdict on a CropStore
+
+Usage:
+    python train_temporal_head.py --store crops/ --out app/models/temporal-head.pt
+
+Every labelled video of the store (see extract_crops.py) is embedded once
+with the served backbone (MODEL_PATH, same preprocessing as the API); the
+embeddings are cached next to the output file, so re-training only runs the
+small head. The head is trained on random subsets of a video's faces (in
+frame order) so it also works when only a few frames are sampled, and is
+compared on the held-out videos with the mean of the per-face scores at
+several frame counts. Serve it with TEMPORAL_HEAD_PATH=<out>.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from app.config import Config
+from app.services.inference_backend import load_backend
+from app.services.temporal_head import TemporalHead, TemporalHeadScorer, save_head
+from app.utils.crop_store import CropStore, crop_namespace
+
+# Jumlah wajah per video saat evaluasi (None = semua)
+EVAL_FACES = (4, 8, 16, None)
+
+
+def embed_store(store, backend, batch_size):
+    """
+    Embed the crops of every labelled video
+
+    Returns:
+        List of (video_id, label, embeddings (T, D), scores (T,)) in frame order
+    """
+    index = store.index[0]
+    video_ids = np.unique(index['video_id'][index['label'] >= 0])
+    videos = []
+    started = time.perf_counter()
+    for done, video_id in enumerate(video_ids, start=1):
+        crops, video_index = store.get_video(video_id)
+        order = np.argsort(video_index['frame_idx'], kind='stable')
+        scores, embeddings = [], []
+        for start in range(0, len(order), batch_size):
+            # Crop dari memmap disalin per batch sesuai urutan frame
+            batch_scores, batch_embeddings = backend.predict_batch_with_embeddings(crops[order[start:start + batch_size]])
+            scores.append(batch_scores)
+            embeddings.append(batch_embeddings)
+        videos.append((str(video_id), int(video_index['label'][0]), np.concatenate(embeddings), np.concatenate(scores)))
+        if done % 50 == 0:
+            print(f"  {done}/{len(video_ids)} videos embedded ({time.perf_counter() - started:.0f}s)")
+    return videos
+
+
+def load_embeddings(path, identity):
+    """Cached embeddings of embed_store(), or None when missing or from another backbone"""
+    if not path.exists():
+        return None
+    cached = np.load(path, allow_pickle=False)
+    if str(cached['backbone']) != identity:
+        return None
+    lengths = np.cumsum(cached['lengths'])[:-1]
+    return list(zip(
+        cached['video_ids'].tolist(),
+        cached['labels'].tolist(),
+        np.split(cached['embeddings'], lengths),
+        np.split(cached['scores'], lengths),
+    ))
+
+
+def save_embeddings(path, identity, videos):
+    np.savez(
+        path,
+        backbone=identity,
+        video_ids=np.array([video[0] for video in videos]),
+        labels=np.array([video[1] for video in videos], dtype=np.int8),
+        lengths=np.array([len(video[3]) for video in videos], dtype=np.int64),
+        embeddings=np.concatenate([video[2] for video in videos]),
+        scores=np.concatenate([video[3] for video in videos]),
+    )
+
+
+def make_batch(videos, length, rng):
+    """Random sorted subsets of `length` faces per video, zero-padded, with their mask"""
+    dim = videos[0][2].shape[1]
+    embeddings = np.zeros((len(videos), length, dim), dtype=np.float32)
+    mask = np.zeros((len(videos), length), dtype=bool)
+    for row, (_, _, video_embeddings, _) in enumerate(videos):
+        count = min(length, len(video_embeddings))
+        picked = np.sort(rng.choice(len(video_embeddings), count, replace=False))
+        embeddings[row, :count] = video_embeddings[picked]
+        mask[row, :count] = True
+    labels = np.array([video[1] for video in videos], dtype=np.float32)
+    return torch.from_numpy(embeddings), torch.from_numpy(mask), torch.from_numpy(labels)
+
+
+def evenly_spaced(count, faces):
+    """Indices of `faces` faces spread over a video of `count` faces, like frame sampling does"""
+    if faces is None or faces >= count:
+        return np.arange(count)
+    return np.linspace(0, count - 1, faces).round().astype(np.int64)
+
+
+def evaluate(scorer, videos):
+    """Accuracy of the head and of the mean of the face scores per number of faces"""
+    report = {}
+    for faces in EVAL_FACES:
+        head_correct = mean_correct = 0
+        for _, label, embeddings, scores in videos:
+            picked = evenly_spaced(len(scores), faces)
+            head_correct += (scorer.score(embeddings[picked]) > 0.5) == bool(label)
+            mean_correct += (float(np.mean(scores[picked])) > 0.5) == bool(label)
+        report['all' if faces is None else str(faces)] = {
+            'temporalHead': head_correct / len(videos),
+            'meanScore': mean_correct / len(videos),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the temporal head on the embeddings of a crop store')
+    parser.add_argument('--store', default=str(Config.CROP_STORE_DIR or 'crops'), help='Crop store folder')
+    parser.add_argument('--out', default=str(Config.TEMPORAL_HEAD_PATH or Config.BASE_DIR / 'app/models/temporal-head.pt'))
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=32, help='Videos per training step')
+    parser.add_argument('--seq-len', type=int, default=16, help='Maximum faces per training sequence')
+    parser.add_argument('--min-len', type=int, default=4, help='Minimum faces per training sequence')
+    parser.add_argument('--hidden-dim', type=int, default=128)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--embed-batch-size', type=int, default=Config.INFERENCE_MAX_BATCH_SIZE)
+    parser.add_argument('--threads', type=int, default=Config.INTRA_OP_THREADS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # strict: embedding dummy tidak boleh dipakai untuk melatih head
+    try:
+        backend = load_backend(Config.MODEL_PATH, intra_op_threads=args.threads, mmap=Config.MODEL_MMAP, strict=True)
+    except Exception as e:
+        print(f"Error: cannot load {Config.MODEL_PATH}: {e}")
+        return 1
+    if not backend.supports_embeddings:
+        print(f"Error: {backend.framework} models do not expose embeddings, use the .pth or Keras model")
+        return 1
+
+    out = Path(args.out)
+    cache_path = out.with_suffix('.embeddings.npz')
+    videos = load_embeddings(cache_path, backend.identity)
+    if videos is None:
+        store = CropStore(args.store, crop_namespace(Config))
+        print(f"Embedding the labelled videos of {args.store} with {backend.identity}")
+        videos = embed_store(store, backend, args.embed_batch_size)
+        if not videos:
+            print(f"Error: no labelled videos in {args.store}")
+            return 1
+        out.parent.mkdir(parents=True, exist_ok=True)
+        save_embeddings(cache_path, backend.identity, videos)
+    else:
+        print(f"Using cached embeddings {cache_path}")
+
+    # Split per video, supaya wajah satu video tidak ada di train dan val sekaligus
+    rng = np.random.default_rng(args.seed)
+    torch.manual_seed(args.seed)
+    order = rng.permutation(len(videos))
+    val_count = max(1, int(len(videos) * args.val_fraction))
+    val_videos = [videos[i] for i in order[:val_count]]
+    train_videos = [videos[i] for i in order[val_count:]]
+    if not train_videos:
+        print('Error: not enough videos to hold out a validation split')
+        return 1
+
+    head = TemporalHead(videos[0][2].shape[1], hidden_dim=args.hidden_dim)
+    optimizer = torch.optim.Adam(head.parameters(), lr=args.lr)
+    loss_fn = torch.nn.BCEWithLogitsLoss()
+    started = time.perf_counter()
+    for epoch in range(1, args.epochs + 1):
+        head.train()
+        total_loss = 0.0
+        permutation = rng.permutation(len(train_videos))
+        for start in range(0, len(permutation), args.batch_size):
+            batch = [train_videos[i] for i in permutation[start:start + args.batch_size]]
+            # Panjang urutan acak: head juga harus yakin dari sedikit frame
+            length = int(rng.integers(args.min_len, args.seq_len + 1))
+            embeddings, mask, labels = make_batch(batch, length, rng)
+            logits, _ = head(embeddings, mask)
+            loss = loss_fn(logits, labels)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        print(f"  epoch {epoch}/{args.epochs}: loss {total_loss / len(train_videos):.4f}")
+
+    save_head(head, out, backbone=backend.identity)
+    report = evaluate(TemporalHeadScorer(head, out), val_videos)
+    print(json.dumps({
+        'trainVideos': len(train_videos),
+        'valVideos': len(val_videos),
+        'embeddingDim': int(videos[0][2].shape[1]),
+        'seconds': time.perf_counter() - started,
+        'valAccuracy': report,
+        'output': str(out),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+
+
+
+#######################################################################
+############ This file reads the face crops stored by the backend (CropStore)
+############ as a training dataset, without decoding the videos again
+############
+############ Fill the store with:
+############     python extract_crops.py data/videos --store data/crops   (from the backend folder)
+############ with the videos in `real` / `fake` folders to get labels
+
+#####################################################################################################
+###### Import Libraries
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+# CropStore tinggal di backend aplikasi
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'deepfake-detection-app' / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.utils.crop_store import CropStore
+#####################################################################################################
+
+
+
+class CropStoreDataset(Dataset):
+    """
+    Labelled face crops of a CropStore (1 real, 0 fake), read from memory-mapped chunks
+
+    All crops must have the same size (`crop_shape`); a store filled with
+    different IMG_SIZE / --size settings raises a ValueError naming the chunks.
+    """
+
+    def __init__(self, root, video_ids=None, transform=None):
+        self.store = CropStore(root)
+        self.transform = transform
+
+        index, _, _ = self.store.index
+        keep = index['label'] >= 0
+        if video_ids is not None:
+            keep &= np.isin(index['video_id'], list(video_ids))
+        self.rows = np.flatnonzero(keep)
+        self.labels = index['label'][self.rows].astype(np.int64)
+
+        # Batch dikumpulkan ke satu buffer, jadi ukuran crop harus sama di semua shard
+        shapes = self.store.crop_shapes(self.rows)
+        if len(shapes) > 1:
+            found = '; '.join(f"{shape}: {', '.join(names[:3])}{' ...' if len(names) > 3 else ''}"
+                              for shape, names in sorted(shapes.items()))
+            raise ValueError(f"CropStore {root} mixes crop sizes ({found}); "
+                             f"pack each size into its own store or re-extract with one size")
+        self.crop_shape = next(iter(shapes), None)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        # Crop uint8 HWC dari memmap; hanya crop ini yang dibaca dari disk
+        crop = np.array(self.store.crop(self.rows[i]))
+        if self.transform is not None:
+            crop = self.transform(crop)
+        else:
+            crop = torch.from_numpy(crop).permute(2, 0, 1).float().div_(255)
+        return crop, int(self.labels[i])
+
+    def video_ids(self):
+        """Video ids in the dataset, e.g. to split train/validation by video"""
+        index, _, _ = self.store.index
+        return sorted(set(index['video_id'][self.rows].tolist()))
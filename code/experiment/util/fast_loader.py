@@ -0,0 +1,448 @@
+
+
+
+#######################################################################
+############ Fast training data pipeline without a DataLoader bottleneck
+############
+############ - Face crops are decoded and resized once into CropStore shards
+############   (memory-mapped uint8 arrays), either by extract_crops.py from
+############   videos or by pack_image_folder() from an ImageFolder tree
+############ - Whole batches are gathered from the memmaps by a few threads,
+############   pinned and prefetched, and augmented as one tensor (BatchAugment)
+############ - The loader reports samples/sec and how long training waited for data
+############
+############ Usage:
+############     python fast_loader.py pack data/faceforensics/train data/shards/train
+############     python fast_loader.py bench data/shards/train --batch-size 64 --augment
+############
+############     train_dl = FastCropLoader(CropStoreDataset('data/shards/train'), 64,
+############                               transform=BatchAugment(224), device=get_default_device())
+############     for images, labels in train_dl: ...
+############     print(train_dl.stats())
+
+#####################################################################################################
+###### Import Libraries
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+try:
+    from .crop_dataset import CropStoreDataset
+except ImportError:
+    from crop_dataset import CropStoreDataset
+
+from app.utils.crop_store import CropStore, make_index
+#####################################################################################################
+
+
+# Statistik normalisasi ImageNet, sama dengan notebook training
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def pack_image_folder(folder, store_root, image_size=224, chunk_size=4096, workers=8):
+    """
+    Decode and resize the images of an ImageFolder tree once into CropStore chunks
+
+    Labels are the ImageFolder class indices (sorted folder names), so
+    `fake`/`real` folders give 0/1 like the crops of extract_crops.py.
+    A store that already holds crops of another size is refused (ValueError),
+    the loader gathers every batch into one fixed-size buffer.
+
+    Returns:
+        Number of images packed
+    """
+    from torchvision.datasets import ImageFolder
+
+    samples = ImageFolder(folder).samples
+    store = CropStore(store_root)
+
+    expected = (image_size, image_size, 3)
+    other = {shape: names for shape, names in store.crop_shapes().items() if shape != expected}
+    if other:
+        shape, names = next(iter(other.items()))
+        raise ValueError(f"{store_root} already holds {shape} crops (e.g. chunk {names[0]}), "
+                         f"cannot pack {expected} crops into it; use --size {shape[0]} or another store")
+
+    def load(path):
+        with Image.open(path) as image:
+            return np.asarray(image.convert('RGB').resize((image_size, image_size), Image.BILINEAR))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(samples), chunk_size):
+            chunk = samples[start:start + chunk_size]
+            crops = np.stack(list(executor.map(load, [path for path, _ in chunk])))
+            index = make_index(
+                np.array([Path(path).stem[:64] for path, _ in chunk]),
+                np.zeros(len(chunk), dtype=np.int32),
+                np.zeros((len(chunk), 4)),
+                label=np.array([label for _, label in chunk], dtype=np.int8)
+            )
+            store.write_chunk(crops, index)
+            print(f"  {start + len(chunk)}/{len(samples)} images packed")
+    return len(samples)
+
+
+class BatchTransform:
+    """uint8 NHWC batch -> normalized float NCHW batch of `output_size` (evaluation)"""
+
+    def __init__(self, output_size=224, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.output_size = output_size
+        self.mean = torch.tensor(mean).view(1, 3, 1, 1)
+        self.std = torch.tensor(std).view(1, 3, 1, 1)
+
+    def __call__(self, images):
+        x = self.to_float(images)
+        if x.shape[-2:] != (self.output_size, self.output_size):
+            x = F.interpolate(x, size=(self.output_size, self.output_size), mode='bilinear', align_corners=False)
+        return self.normalize(x)
+
+    @staticmethod
+    def to_float(images):
+        return images.permute(0, 3, 1, 2).float().div_(255)
+
+    def normalize(self, x):
+        return x.sub_(self.mean.to(x.device)).div_(self.std.to(x.device))
+
+
+class BatchAugment(BatchTransform):
+    def __init__(self, output_size=224, scale=(0.6, 1.0), ratio=(3 / 4, 4 / 3), flip=0.5,
+                 jitter=0.2, cutout=0.2, cutout_size=0.25, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        """
+        Training augmentations computed for the whole batch at once
+
+        Every sample gets its own random parameters, but all of them are
+        applied with a few tensor ops: random resized crop and horizontal flip
+        as one affine grid_sample, brightness/contrast/saturation jitter, and
+        cutout. Runs on the device of the batch (CPU threads or GPU).
+
+        Args:
+            output_size: Side of the output crops
+            scale: Range of the crop area relative to the image
+            ratio: Range of the crop aspect ratio
+            flip: Probability of a horizontal flip
+            jitter: Maximum relative brightness/contrast/saturation change
+            cutout: Probability of a cutout square
+            cutout_size: Side of the cutout square relative to the output
+        """
+        super().__init__(output_size, mean, std)
+        self.scale = scale
+        self.ratio = ratio
+        self.flip = flip
+        self.jitter = jitter
+        self.cutout = cutout
+        self.cutout_size = cutout_size
+
+    def __call__(self, images):
+        x = self.to_float(images)
+        n, device = len(x), x.device
+
+        def uniform(low, high):
+            return torch.empty(n, device=device).uniform_(low, high)
+
+        # Random resized crop + flip dalam satu affine grid (koordinat -1..1)
+        area = uniform(*self.scale)
+        log_ratio = uniform(math.log(self.ratio[0]), math.log(self.ratio[1]))
+        width = torch.sqrt(area * torch.exp(log_ratio)).clamp_(max=1.0)
+        height = torch.sqrt(area / torch.exp(log_ratio)).clamp_(max=1.0)
+        center_x = (torch.rand(n, device=device) * 2 - 1) * (1 - width)
+        center_y = (torch.rand(n, device=device) * 2 - 1) * (1 - height)
+        flip = 1 - 2 * (torch.rand(n, device=device) < self.flip).float()
+
+        theta = torch.zeros(n, 2, 3, device=device)
+        theta[:, 0, 0] = width * flip
+        theta[:, 0, 2] = center_x
+        theta[:, 1, 1] = height
+        theta[:, 1, 2] = center_y
+        grid = F.affine_grid(theta, (n, 3, self.output_size, self.output_size), align_corners=False)
+        x = F.grid_sample(x, grid, mode='bilinear', padding_mode='reflection', align_corners=False)
+
+        # Color jitter per sampel
+        factors = 1 + (torch.rand(3, n, 1, 1, 1, device=device) * 2 - 1) * self.jitter
+        x = x * factors[0]
+        mean = x.mean(dim=(1, 2, 3), keepdim=True)
+        x = (x - mean) * factors[1] + mean
+        gray = x.mean(dim=1, keepdim=True)
+        x = ((x - gray) * factors[2] + gray).clamp_(0, 1)
+        x = self.normalize(x)
+
+        # Cutout: kotak berisi 0 (= rata-rata setelah normalisasi)
+        if self.cutout > 0:
+            half = self.cutout_size / 2
+            positions = torch.linspace(0, 1, self.output_size, device=device)
+            centers = torch.rand(2, n, 1, device=device)
+            inside_y = (positions[None] - centers[0]).abs() < half
+            inside_x = (positions[None] - centers[1]).abs() < half
+            mask = inside_y[:, :, None] & inside_x[:, None, :]
+            mask &= (torch.rand(n, device=device) < self.cutout)[:, None, None]
+            x = x.masked_fill(mask[:, None], 0.0)
+        return x
+
+
+class FastCropLoader:
+    def __init__(self, dataset, batch_size=64, shuffle=True, drop_last=False, transform=None,
+                 device=None, workers=2, prefetch=4, pin_memory=None, seed=0):
+        """
+        Batched loader over a CropStoreDataset
+
+        `workers` threads gather whole batches from the memory-mapped shards
+        (CropStore.crops) into reusable, optionally pinned buffers and keep up
+        to `prefetch` batches ready. On CPU the transform runs on the worker
+        threads; with a CUDA device the uint8 batch is copied asynchronously
+        and transformed on the GPU.
+
+        Args:
+            dataset: CropStoreDataset
+            batch_size: Samples per batch
+            shuffle: Reshuffle every epoch
+            drop_last: Skip the last incomplete batch
+            transform: Callable on a uint8 (N, H, W, 3) tensor, e.g. BatchAugment;
+                None yields the uint8 batch
+            device: Device of the yielded batches (default CPU)
+            workers: Gathering threads
+            prefetch: Batches kept ready ahead of the training loop
+            pin_memory: Pin the batch buffers (default: when device is CUDA)
+            seed: Seed of the shuffling (epoch number is added)
+        """
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.transform = transform
+        self.device = torch.device(device) if device is not None else torch.device('cpu')
+        self.workers = max(1, workers)
+        self.prefetch = max(1, prefetch)
+        self.pin_memory = self.device.type == 'cuda' if pin_memory is None else pin_memory
+        self.seed = seed
+        self.epoch = 0
+        self._stats = LoaderStats()
+
+    def __len__(self):
+        """Number of batches"""
+        count = len(self.dataset)
+        return count // self.batch_size if self.drop_last else math.ceil(count / self.batch_size)
+
+    def stats(self):
+        """Throughput of the batches yielded so far (see LoaderStats)"""
+        return self._stats.as_dict()
+
+    def reset_stats(self):
+        self._stats = LoaderStats()
+
+    def __iter__(self):
+        order = np.arange(len(self.dataset))
+        if self.shuffle:
+            order = np.random.default_rng(self.seed + self.epoch).permutation(len(self.dataset))
+        self.epoch += 1
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+
+        tasks = queue.Queue()
+        for batch in batches:
+            tasks.put(batch)
+        ready = queue.Queue(maxsize=self.prefetch)
+        buffers = queue.Queue()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._work, args=(tasks, ready, buffers, stop), name=f"crop-loader-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        stats = self._stats
+        stats.start()
+        try:
+            for _ in range(len(batches)):
+                waited = time.perf_counter()
+                item = ready.get()
+                stats.add_wait(time.perf_counter() - waited)
+                if isinstance(item, BaseException):
+                    raise item
+                images, labels, buffer = item
+
+                if self.device.type != 'cpu':
+                    images = images.to(self.device, non_blocking=self.pin_memory)
+                    labels = labels.to(self.device, non_blocking=self.pin_memory)
+                    event = None
+                    if self.device.type == 'cuda':
+                        # Buffer baru dipakai ulang setelah copy asinkron selesai
+                        event = torch.cuda.Event()
+                        event.record()
+                    buffers.put((buffer, event))
+                    if self.transform is not None:
+                        started = time.perf_counter()
+                        images = self.transform(images)
+                        stats.add_transform(time.perf_counter() - started)
+                stats.add_batch(len(labels))
+                yield images, labels
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _work(self, tasks, ready, buffers, stop):
+        labels = self.dataset.labels
+        store = self.dataset.store
+        transform_here = self.device.type == 'cpu' and self.transform is not None
+        while not stop.is_set():
+            try:
+                batch = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                started = time.perf_counter()
+                buffer = self._buffer(buffers)
+                images = buffer[:len(batch)]
+                store.crops(self.dataset.rows[batch], out=images.numpy())
+                batch_labels = torch.from_numpy(labels[batch])
+                self._stats.add_gather(time.perf_counter() - started)
+
+                if transform_here:
+                    started = time.perf_counter()
+                    images = self.transform(images)
+                    self._stats.add_transform(time.perf_counter() - started)
+                    # Transform membuat tensor baru, buffer bisa langsung dipakai lagi
+                    buffers.put((buffer, None))
+                    buffer = None
+                item = (images, batch_labels, buffer)
+            except Exception as e:
+                item = e
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _buffer(self, buffers):
+        try:
+            buffer, event = buffers.get_nowait()
+            if event is not None:
+                event.synchronize()
+            return buffer
+        except queue.Empty:
+            # Ukuran crop sudah dicek sama untuk semua shard (CropStoreDataset)
+            height, width = self.dataset.crop_shape[:2]
+            return torch.empty((self.batch_size, height, width, 3), dtype=torch.uint8, pin_memory=self.pin_memory)
+
+
+class LoaderStats:
+    """Counters of FastCropLoader: throughput and time the training loop waited for data"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = None
+        self.samples = 0
+        self.batches = 0
+        self.wait_seconds = 0.0
+        self.gather_seconds = 0.0
+        self.transform_seconds = 0.0
+
+    def start(self):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+
+    def add_batch(self, samples):
+        with self._lock:
+            self.samples += samples
+            self.batches += 1
+
+    def add_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds += seconds
+
+    def add_gather(self, seconds):
+        with self._lock:
+            self.gather_seconds += seconds
+
+    def add_transform(self, seconds):
+        with self._lock:
+            self.transform_seconds += seconds
+
+    def as_dict(self):
+        """
+        samplesPerSec: samples yielded per wall-clock second (loader + training)
+        waitFraction: share of that time the training loop was blocked on the
+            loader; near 0 means the loader keeps up with the model
+        gatherMsPerBatch / transformMsPerBatch: work per batch, summed over threads
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self.started if self.started is not None else 0.0
+            batches = max(self.batches, 1)
+            return {
+                'samples': self.samples,
+                'batches': self.batches,
+                'seconds': elapsed,
+                'samplesPerSec': self.samples / elapsed if elapsed else 0.0,
+                'waitFraction': self.wait_seconds / elapsed if elapsed else 0.0,
+                'gatherMsPerBatch': self.gather_seconds / batches * 1000.0,
+                'transformMsPerBatch': self.transform_seconds / batches * 1000.0,
+            }
+
+
+def benchmark_loader(loader, batches=None):
+    """
+    Iterate the loader without a model and return its stats: the upper bound
+    of samples/sec the data pipeline can feed
+    """
+    loader.reset_stats()
+    for done, _ in enumerate(loader, start=1):
+        if batches is not None and done >= batches:
+            break
+    if loader.device.type == 'cuda':
+        torch.cuda.synchronize()
+    return loader.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack face crops into shards and measure loader throughput')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pack = commands.add_parser('pack', help='Decode and resize an ImageFolder tree into CropStore shards')
+    pack.add_argument('folder')
+    pack.add_argument('store')
+    pack.add_argument('--size', type=int, default=224)
+    pack.add_argument('--chunk-size', type=int, default=4096)
+    pack.add_argument('--workers', type=int, default=8)
+
+    bench = commands.add_parser('bench', help='Samples/sec of FastCropLoader over a store')
+    bench.add_argument('store')
+    bench.add_argument('--batch-size', type=int, default=64)
+    bench.add_argument('--workers', type=int, default=2)
+    bench.add_argument('--prefetch', type=int, default=4)
+    bench.add_argument('--batches', type=int, default=200)
+    bench.add_argument('--size', type=int, default=224)
+    bench.add_argument('--augment', action='store_true', help='Apply BatchAugment (otherwise only normalization)')
+    bench.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        started = time.perf_counter()
+        count = pack_image_folder(args.folder, args.store, args.size, args.chunk_size, args.workers)
+        print(json.dumps({'images': count, 'seconds': time.perf_counter() - started}, indent=2))
+        return 0
+
+    transform = BatchAugment(args.size) if args.augment else BatchTransform(args.size)
+    loader = FastCropLoader(
+        CropStoreDataset(args.store), args.batch_size, transform=transform,
+        device=args.device, workers=args.workers, prefetch=args.prefetch
+    )
+    print(json.dumps(benchmark_loader(loader, args.batches), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())